@@ -4,7 +4,13 @@ from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
 from flask import Flask, session, redirect, url_for, flash
 from config import Config
-from db import ensure_latest_schema
+from db import engine, replica_engine
+from services.cargas import reanudar_pendientes
+from services.cliente_index import cliente_index
+from services.nombre_index import nombre_index
+from services.evidencias import es_imagen
+from services.metrics import init_metrics
+from services.migraciones import aplicar_migraciones
 
 # Blueprints
 from blueprints.auth import auth_bp
@@ -22,8 +28,18 @@ def create_app() -> Flask:
     os.makedirs(upload_dir, exist_ok=True)
     app.config["UPLOAD_FOLDER"] = upload_dir  # fijamos el valor final
 
-    # --- Migraciones mínimas / esquema ---
-    ensure_latest_schema()
+    # --- Migraciones pendientes (sql/migraciones) ---
+    aplicar_migraciones()
+
+    # --- Índice del autocomplete (se construye en segundo plano) ---
+    cliente_index.rebuild_async()
+    nombre_index.rebuild_async()
+
+    # --- Cargas de base_general que quedaron en cola ---
+    reanudar_pendientes()
+
+    # --- Métricas (latencia por ruta, SQL por petición, pool) en /metrics ---
+    init_metrics(app, engine, replica_engine)
 
     # --- Blueprints ---
     app.register_blueprint(auth_bp)       # /auth
@@ -51,6 +67,11 @@ def create_app() -> Flask:
         formatted = f"{quantized:,.2f}"
         return f"$ {formatted}"
 
+    # --- Evidencias con miniatura ({% if fname is imagen %}) ---
+    @app.template_test("imagen")
+    def imagen(fname):
+        return es_imagen(fname)
+
     # --- Rutas base / utilidades ---
     @app.route("/")
     def home():
@@ -0,0 +1,11 @@
+# bench/__init__.py
+"""
+Benchmarks de las rutas calientes con datos sintéticos.
+
+    python -m bench.run --db sqlite:////tmp/bench.db --base 100000 --registros 50000
+    python -m bench.run --baseline bench-main.json      # falla si algo empeoró
+
+`bench.run` fija SQLALCHEMY_DATABASE_URI *antes* de importar la app (Config lo
+lee al importarse), así que nunca apunta a la base configurada en el entorno
+salvo que se pase explícitamente con --db.
+"""
@@ -0,0 +1,271 @@
+# bench/carga.py
+"""
+Reproducción de carga concurrente contra la app completa (WSGI, multi-hilo).
+
+Simula N agentes escribiendo en el autocomplete (una petición por tecla, con
+tiempo de tecleo), consultando datos del cliente y el listado, mientras un
+admin sube la base diaria (la carga real en segundo plano) y exporta semanas.
+Todo comparte el pool de `db.engine` (pool_size=3, max_overflow=2).
+
+    python -m bench.carga --db sqlite:////tmp/bench.db --agentes 150 --duracion 60
+    python -m bench.carga --db mysql+pymysql://... --out carga.json
+
+Reporta p50/p95/p99 y errores por endpoint, y la espera por un lugar libre en el
+pool (sin contar la apertura de conexiones nuevas; ver db.PoolMedido).
+Con SQLite las escrituras se serializan; para cifras representativas del pool
+usar un MySQL local.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from bench.run import DEFAULT_DB, cliente_sesion, percentil, preparar
+
+
+def _args(argv=None):
+    p = argparse.ArgumentParser(prog="python -m bench.carga", description=__doc__,
+                                formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--db", default=DEFAULT_DB)
+    p.add_argument("--base", type=int, default=100_000, help="filas de base_general (al poblar)")
+    p.add_argument("--registros", type=int, default=50_000, help="filas de registros (al poblar)")
+    p.add_argument("--agentes", type=int, default=150, help="sesiones de agente concurrentes")
+    p.add_argument("--admins", type=int, default=1, help="sesiones de admin concurrentes")
+    p.add_argument("--duracion", type=float, default=60.0, help="segundos de carga")
+    p.add_argument("--tecla-ms", type=float, default=150.0, help="tiempo medio entre teclas")
+    p.add_argument("--pausa-ms", type=float, default=2000.0, help="pausa media entre clientes")
+    p.add_argument("--csv", type=int, default=None, help="filas del CSV que sube el admin")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--fresh", action="store_true", help="borra y recrea las tablas (¡sólo pruebas!)")
+    p.add_argument("--out", default=None, help="archivo JSON de salida (default stdout)")
+    return p.parse_args(argv)
+
+
+class Resultados:
+    """Latencias y errores por endpoint, compartidos entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias: dict[str, list[float]] = defaultdict(list)
+        self.errores: dict[str, int] = defaultdict(int)
+        self.detalle_errores: dict[str, int] = defaultdict(int)
+
+    def registrar(self, endpoint: str, ms: float, error: str | None = None) -> None:
+        with self._lock:
+            self.latencias[endpoint].append(ms)
+            if error:
+                self.errores[endpoint] += 1
+                self.detalle_errores[f"{endpoint}: {error}"] += 1
+
+    def resumen(self, duracion: float) -> dict:
+        out = {}
+        with self._lock:
+            for endpoint, valores in sorted(self.latencias.items()):
+                out[endpoint] = {
+                    "n": len(valores),
+                    "rps": round(len(valores) / duracion, 2),
+                    "p50_ms": round(percentil(valores, 50), 2),
+                    "p95_ms": round(percentil(valores, 95), 2),
+                    "p99_ms": round(percentil(valores, 99), 2),
+                    "max_ms": round(max(valores), 2),
+                    "errores": self.errores.get(endpoint, 0),
+                    "tasa_error": round(self.errores.get(endpoint, 0) / len(valores), 4),
+                }
+        return out
+
+
+def _medir_pool() -> list[float]:
+    """
+    Guarda cada espera por un lugar libre del pool principal (ms). Usa el mismo
+    gancho que /metrics (db.observar_espera_pool): el pool no se parcha.
+    """
+    from db import observar_espera_pool
+
+    esperas: list[float] = []
+
+    def observar(nombre: str, segundos: float) -> None:
+        if nombre == "principal":
+            esperas.append(segundos * 1000)  # list.append es atómico
+
+    observar_espera_pool(observar)
+    return esperas
+
+
+def _pedir(res: Resultados, client, endpoint: str, method: str, url: str, ok=(200,), **kw):
+    t0 = time.perf_counter()
+    error = None
+    resp = None
+    try:
+        resp = client.open(url, method=method, **kw)
+        resp.get_data()  # consume streams (export)
+        if resp.status_code not in ok:
+            error = f"HTTP {resp.status_code}"
+    except Exception as exc:
+        error = type(exc).__name__
+    res.registrar(endpoint, (time.perf_counter() - t0) * 1000, error)
+    return resp
+
+
+def _dormir(rnd: random.Random, media_ms: float, fin: float) -> None:
+    time.sleep(max(0.0, min(rnd.expovariate(1000 / media_ms), fin - time.monotonic())))
+
+
+def sesion_agente(app, uid: int, ctx: dict, args, res: Resultados, fin: float, seed: int) -> None:
+    from bench import datos
+
+    rnd = random.Random(seed)
+    client = cliente_sesion(app, uid, "agente")
+    while time.monotonic() < fin:
+        cu = datos.cliente_unico(rnd.randrange(ctx["base_n"]))
+        # teclea el cliente_unico: una consulta al autocomplete por tecla
+        for largo in range(3, len(cu) + 1):
+            if time.monotonic() >= fin:
+                return
+            _pedir(res, client, "api_search_cliente", "GET",
+                   f"/registros/api/search_cliente?term={cu[:largo]}")
+            _dormir(rnd, args.tecla_ms, fin)
+        _pedir(res, client, "api_datos_cliente", "GET", f"/registros/api/datos_cliente?cu={cu}")
+        r = rnd.random()
+        if r < 0.2:
+            _pedir(res, client, "listado", "GET", "/registros/")
+        elif r < 0.25:
+            _pedir(res, client, "resumen", "GET", f"/registros/resumen?semana={rnd.randint(1, 52)}")
+        _dormir(rnd, args.pausa_ms, fin)
+
+
+def sesion_admin(app, uid: int, csv_path: str, args, res: Resultados, fin: float, seed: int) -> None:
+    from db import SessionLocal
+    from models import CargaBase
+
+    rnd = random.Random(seed)
+    client = cliente_sesion(app, uid, "admin")
+
+    with open(csv_path, "rb") as fh:
+        contenido = fh.read()
+    t_carga = time.perf_counter()
+    _pedir(
+        res, client, "base_general_upload", "POST", "/admin/base_general", ok=(302,),
+        data={"mode": "upsert", "archivo": (io.BytesIO(contenido), "base_diaria.csv")},
+        content_type="multipart/form-data",
+    )
+    with SessionLocal() as db:
+        carga = (
+            db.query(CargaBase.id)
+            .filter(CargaBase.creado_por == uid)
+            .order_by(CargaBase.id.desc())
+            .first()
+        )
+    carga_id = carga[0] if carga else None
+
+    # exporta semanas mientras la carga corre; consulta el avance como la página
+    while time.monotonic() < fin:
+        _pedir(res, client, "export_semana", "GET", f"/admin/export/semana?semana={rnd.randint(1, 52)}")
+        if carga_id is not None:
+            resp = _pedir(res, client, "base_general_carga_estado", "GET",
+                          f"/admin/base_general/cargas/{carga_id}")
+            if resp is not None and resp.status_code == 200:
+                estado = resp.get_json()["data"]["estado"]
+                if estado in ("terminado", "error"):
+                    # duración de la carga completa, de la subida al estado final
+                    res.registrar("carga_base_completa", (time.perf_counter() - t_carga) * 1000,
+                                  None if estado == "terminado" else "error")
+                    carga_id = None
+        _dormir(rnd, 1000, fin)
+
+
+def main(argv=None) -> int:
+    args = _args(argv)
+    os.environ["SQLALCHEMY_DATABASE_URI"] = args.db
+    os.environ.pop("DATABASE_URL", None)
+
+    ctx = preparar(args)
+
+    from app import app
+    from bench import datos
+    from db import engine
+    from services.cliente_index import cliente_index
+
+    cliente_index.rebuild()
+    esperas = _medir_pool()
+    res = Resultados()
+
+    agentes = ctx["agentes"][: args.agentes]
+    if len(agentes) < args.agentes:
+        print(f"[WARN] sólo hay {len(agentes)} agentes en la base", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory(prefix="carga_") as tmpdir:
+        n_csv = args.csv or min(ctx["base_n"], 100_000)
+        csv_path = datos.escribir_csv(os.path.join(tmpdir, "base.csv"), n_csv, args.seed, variacion=0.05)
+
+        inicio = time.monotonic()
+        fin = inicio + args.duracion
+        hilos = [
+            threading.Thread(target=sesion_agente, name=f"agente-{uid}", daemon=True,
+                             args=(app, uid, ctx, args, res, fin, args.seed + k))
+            for k, uid in enumerate(agentes)
+        ]
+        hilos += [
+            threading.Thread(target=sesion_admin, name=f"admin-{k}", daemon=True,
+                             args=(app, ctx["admin_id"], csv_path, args, res, fin, args.seed + 10_000 + k))
+            for k in range(args.admins)
+        ]
+        print(f"[bench] {len(agentes)} agentes + {args.admins} admin(s) durante {args.duracion:.0f}s ...",
+              file=sys.stderr)
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join(timeout=max(0.0, fin - time.monotonic()) + 60)
+        duracion = time.monotonic() - inicio
+
+    total = sum(len(v) for v in res.latencias.values())
+    errores = sum(res.errores.values())
+    pool = engine.pool
+    salida = {
+        "meta": {
+            "fecha": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "dialecto": ctx["dialecto"],
+            "base_general": ctx["base_n"],
+            "registros": ctx["registros_n"],
+            "agentes": len(agentes),
+            "admins": args.admins,
+            "duracion_s": round(duracion, 1),
+            "pool_size": pool.size() if hasattr(pool, "size") else None,
+            "max_overflow": getattr(pool, "_max_overflow", None),
+        },
+        "total": {
+            "peticiones": total,
+            "rps": round(total / duracion, 2),
+            "errores": errores,
+            "tasa_error": round(errores / total, 4) if total else 0.0,
+        },
+        "endpoints": res.resumen(duracion),
+        "pool_espera": {
+            "checkouts": len(esperas),
+            "p50_ms": round(percentil(esperas, 50), 3) if esperas else None,
+            "p95_ms": round(percentil(esperas, 95), 3) if esperas else None,
+            "p99_ms": round(percentil(esperas, 99), 3) if esperas else None,
+            "max_ms": round(max(esperas), 3) if esperas else None,
+            "total_s": round(sum(esperas) / 1000, 3),
+        },
+        "errores": dict(sorted(res.detalle_errores.items(), key=lambda kv: -kv[1])),
+    }
+    texto = json.dumps(salida, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(texto + "\n")
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
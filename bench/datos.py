@@ -0,0 +1,206 @@
+# bench/datos.py
+"""
+Generador de datos sintéticos (deterministas por semilla) para base_general,
+catálogos, agentes y registros.
+
+Las distribuciones imitan la operación: pocos tipos de convenio concentran la
+mayoría de los registros, y la actividad por agente es desigual (pocos agentes
+capturan mucho y la cola larga captura poco).
+"""
+from __future__ import annotations
+
+import csv
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Iterator
+
+from sqlalchemy import func, select
+
+from models import BaseGeneral, BocaCobranza, Registro, TipoConvenio, Usuario
+from services.csv_ingest import CSV_COLUMNS, hash_contenido
+from utils.claves import normalizar_cliente_unico
+
+NOMBRES = [
+    "JUAN", "MARIA", "JOSE", "GUADALUPE", "FRANCISCO", "ANA", "LUIS", "PATRICIA",
+    "CARLOS", "ROSA", "MIGUEL", "LETICIA", "JORGE", "ELENA", "PEDRO", "SOFIA",
+]
+APELLIDOS = [
+    "HERNANDEZ", "GARCIA", "MARTINEZ", "LOPEZ", "GONZALEZ", "PEREZ", "RODRIGUEZ",
+    "SANCHEZ", "RAMIREZ", "CRUZ", "FLORES", "GOMEZ", "MORALES", "VAZQUEZ", "REYES",
+]
+GERENCIAS = [f"GERENCIA {n:02d}" for n in range(1, 41)]
+PRODUCTOS = ["CONSUMO", "MOTOS", "TELEFONIA", "MUEBLES", "PRESTAMO PERSONAL"]
+FIDIAPAGO = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO"]
+GESTIONES = [
+    "PROMESA DE PAGO", "SIN CONTACTO", "NUMERO EQUIVOCADO", "CONVENIO VIGENTE",
+    "SOLICITA LLAMAR DESPUES", "PAGO PARCIAL",
+]
+
+# (nombre, peso relativo)
+TIPOS_CONVENIO = [
+    ("INTENCIÓN DE PAGO", 45), ("RMD", 25), ("CONVENIO", 15),
+    ("LIQUIDACIÓN", 10), ("REESTRUCTURA", 5),
+]
+BOCAS_COBRANZA = [
+    ("MANUAL", 40), ("SMS", 25), ("IVR", 15), ("WHATSAPP", 15), ("CAMPO", 5),
+]
+
+BATCH = 5_000
+
+
+def cliente_unico(i: int) -> str:
+    return f"CU{i:09d}"
+
+
+def filas_base_general(n: int, seed: int = 1, inicio: int = 0, variacion: float = 0.0) -> Iterator[dict]:
+    """
+    Filas de base_general con las columnas del CSV diario. Con la misma semilla
+    las filas son idénticas; `variacion` cambia gestion_desc en esa fracción de
+    filas (simula la base del día siguiente para medir upserts con cambios).
+    """
+    rnd = random.Random(seed)
+    cambio = random.Random(seed + 1)
+    for i in range(inicio, inicio + n):
+        fila = {
+            "cliente_unico": cliente_unico(i),
+            "nombre_cte": f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+            "gerencia": rnd.choice(GERENCIAS),
+            "producto": rnd.choice(PRODUCTOS),
+            "fidiapago": rnd.choice(FIDIAPAGO),
+            "gestion_desc": rnd.choice(GESTIONES),
+        }
+        if variacion and cambio.random() < variacion:
+            fila["gestion_desc"] = f"{fila['gestion_desc']} *"
+        yield fila
+
+
+def escribir_csv(path: str, n: int, seed: int = 1, variacion: float = 0.0) -> str:
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(filas_base_general(n, seed, variacion=variacion))
+    return path
+
+
+def escribir_xlsx(path: str, n: int, seed: int = 1, variacion: float = 0.0) -> str:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("BASE")
+    ws.append([c.upper() for c in CSV_COLUMNS])
+    for fila in filas_base_general(n, seed, variacion=variacion):
+        ws.append([fila[c] for c in CSV_COLUMNS])
+    wb.save(path)
+    return path
+
+
+def poblar_base_general(engine, n: int, seed: int = 1) -> int:
+    """Inserta `n` filas en base_general (tabla vacía) con INSERT por lotes."""
+    table = BaseGeneral.__table__
+    now = datetime.utcnow()
+    lote: list[dict] = []
+    with engine.begin() as conn:
+        for fila in filas_base_general(n, seed):
+            fila["cliente_unico_norm"] = normalizar_cliente_unico(fila["cliente_unico"])
+            fila["hash_contenido"] = hash_contenido(fila)
+            fila["actualizado_en"] = now
+            lote.append(fila)
+            if len(lote) >= BATCH:
+                conn.execute(table.insert(), lote)
+                lote = []
+        if lote:
+            conn.execute(table.insert(), lote)
+    return n
+
+
+def poblar_catalogos(db) -> tuple[list[int], list[int]]:
+    """Crea (si faltan) tipos de convenio y bocas. Devuelve sus ids en orden de peso."""
+    ids = []
+    for modelo, items in ((TipoConvenio, TIPOS_CONVENIO), (BocaCobranza, BOCAS_COBRANZA)):
+        existentes = {n: i for i, n in db.execute(select(modelo.id, modelo.nombre))}
+        for nombre, _ in items:
+            if nombre not in existentes:
+                obj = modelo(nombre=nombre, activo=1)
+                db.add(obj)
+                db.flush()
+                existentes[nombre] = obj.id
+        ids.append([existentes[n] for n, _ in items])
+    db.commit()
+    return ids[0], ids[1]
+
+
+def poblar_usuarios(db, agentes: int) -> tuple[int, list[int]]:
+    """Un admin `bench_admin` y `agentes` agentes `bench_agente_NNN`. Devuelve (admin_id, ids)."""
+    existentes = {u: i for i, u in db.execute(select(Usuario.id, Usuario.username))}
+
+    def _usuario(username: str, role: str) -> int:
+        if username not in existentes:
+            obj = Usuario(username=username, password_hash="!bench", role=role, activo=1)
+            db.add(obj)
+            db.flush()
+            existentes[username] = obj.id
+        return existentes[username]
+
+    admin_id = _usuario("bench_admin", "admin")
+    ids = [_usuario(f"bench_agente_{k:03d}", "agente") for k in range(1, agentes + 1)]
+    db.commit()
+    return admin_id, ids
+
+
+def _fecha_de_semana(anio: int, semana: int, rnd: random.Random) -> date:
+    lunes = date.fromisocalendar(anio, semana, 1)
+    return lunes + timedelta(days=rnd.randrange(7))
+
+
+def poblar_registros(engine, n: int, agentes: list[int], tipos: list[int], bocas: list[int],
+                     base_n: int, seed: int = 1, semanas: int = 52) -> int:
+    """
+    Inserta `n` registros. Actividad por agente ~ 1/rango^0.8, tipos y bocas
+    según sus pesos, semanas uniformes en 1..`semanas`, clientes de base_general.
+    """
+    rnd = random.Random(seed)
+    table = Registro.__table__
+    anio = date.today().year
+    pesos_agente = [1 / (k ** 0.8) for k in range(1, len(agentes) + 1)]
+    pesos_tipo = [p for _, p in TIPOS_CONVENIO]
+    pesos_boca = [p for _, p in BOCAS_COBRANZA]
+    now = datetime.utcnow()
+
+    hechos = 0
+    with engine.begin() as conn:
+        while hechos < n:
+            k = min(BATCH, n - hechos)
+            creadores = rnd.choices(agentes, weights=pesos_agente, k=k)
+            tipos_k = rnd.choices(tipos, weights=pesos_tipo, k=k)
+            bocas_k = rnd.choices(bocas, weights=pesos_boca, k=k)
+            lote = []
+            for j in range(k):
+                semana = rnd.randint(1, semanas)
+                pago_inicial = Decimal(rnd.randrange(100, 500_000)) / 100
+                lote.append({
+                    "cliente_unico": cliente_unico(rnd.randrange(base_n)),
+                    "nombre_cte_snap": f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}",
+                    "gerencia_snap": rnd.choice(GERENCIAS),
+                    "producto_snap": rnd.choice(PRODUCTOS),
+                    "fidiapago_snap": rnd.choice(FIDIAPAGO),
+                    "gestion_desc_snap": rnd.choice(GESTIONES),
+                    "tipo_convenio_id": tipos_k[j],
+                    "boca_cobranza_id": bocas_k[j],
+                    "fecha_promesa": _fecha_de_semana(anio, semana, rnd),
+                    "telefono": f"55{rnd.randrange(10**8):08d}",
+                    "semana": semana,
+                    "pago_inicial": pago_inicial,
+                    "pago_semanal": (pago_inicial / 4).quantize(Decimal("0.01")),
+                    "duracion_semanas": rnd.choice((4, 8, 12, 16, 26)),
+                    "notas": None,
+                    "creado_por": creadores[j],
+                    "creado_en": now,
+                })
+            conn.execute(table.insert(), lote)
+            hechos += k
+    return hechos
+
+
+def contar(db, modelo) -> int:
+    return db.execute(select(func.count()).select_from(modelo)).scalar_one()
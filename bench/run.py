@@ -0,0 +1,308 @@
+# bench/run.py
+"""
+Mide las rutas calientes contra una base local (SQLite por defecto o un MySQL
+de pruebas) y guarda los resultados en JSON comparables entre commits.
+
+    python -m bench.run --db sqlite:////tmp/bench.db --base 100000 --registros 50000 \
+        --out bench-$(git rev-parse --short HEAD).json
+    python -m bench.run --baseline bench-main.json --tolerancia 0.25
+
+Casos: load_base_general_xlsx, carga CSV (cuerpo del job de cargas_base),
+api_search_cliente, listado, resumen, export_semana y _parse_currency.
+Con --baseline, el proceso termina con código 1 si algún p50 empeora más que
+la tolerancia.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DEFAULT_DB = "sqlite:///" + os.path.join(tempfile.gettempdir(), "bench_registros.db")
+
+
+def _args(argv=None):
+    p = argparse.ArgumentParser(prog="python -m bench.run", description=__doc__,
+                                formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--db", default=DEFAULT_DB, help=f"URL de la base de pruebas (default {DEFAULT_DB})")
+    p.add_argument("--base", type=int, default=100_000, help="filas de base_general")
+    p.add_argument("--registros", type=int, default=50_000, help="filas de registros")
+    p.add_argument("--agentes", type=int, default=150)
+    p.add_argument("--csv", type=int, default=None, help="filas del CSV de carga (default min(base, 100k))")
+    p.add_argument("--xlsx", type=int, default=None, help="filas del XLSX de carga (default min(base, 20k))")
+    p.add_argument("--repeat", type=int, default=5, help="repeticiones medidas por caso")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--solo", action="append", default=[], help="ejecutar sólo estos casos (repetible)")
+    p.add_argument("--fresh", action="store_true",
+                   help="borra y recrea las tablas antes de poblar (¡sólo bases de prueba!)")
+    p.add_argument("--out", default=None, help="archivo JSON de salida (default stdout)")
+    p.add_argument("--baseline", default=None, help="JSON previo contra el cual comparar")
+    p.add_argument("--tolerancia", type=float, default=0.20,
+                   help="empeoramiento relativo del p50 permitido (default 0.20)")
+    return p.parse_args(argv)
+
+
+# ---------------------------------------------------------------------------
+# Medición
+# ---------------------------------------------------------------------------
+def percentil(valores: list[float], p: float) -> float:
+    orden = sorted(valores)
+    k = max(0, min(len(orden) - 1, int(round(p / 100 * len(orden) + 0.5)) - 1))
+    return orden[k]
+
+
+def medir(fn, repeat: int, warmup: int = 1) -> dict:
+    """Corre `fn` warmup + repeat veces; tiempos en ms. `info` = último valor devuelto."""
+    for _ in range(warmup):
+        fn()
+    tiempos = []
+    info = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        info = fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    res = {
+        "n": len(tiempos),
+        "min_ms": round(min(tiempos), 3),
+        "p50_ms": round(percentil(tiempos, 50), 3),
+        "p95_ms": round(percentil(tiempos, 95), 3),
+        "max_ms": round(max(tiempos), 3),
+        "mean_ms": round(sum(tiempos) / len(tiempos), 3),
+    }
+    if info is not None:
+        res["info"] = info
+    return res
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def comparar(actual: dict, base: dict, tolerancia: float) -> list[str]:
+    """Casos cuyo p50 empeoró más que `tolerancia` respecto a `base`."""
+    regresiones = []
+    for caso, r in actual["resultados"].items():
+        b = base.get("resultados", {}).get(caso)
+        if not b or not b.get("p50_ms"):
+            continue
+        ratio = r["p50_ms"] / b["p50_ms"]
+        marca = "REGRESIÓN" if ratio > 1 + tolerancia else "ok"
+        print(f"{caso:28s} {b['p50_ms']:>10.2f} -> {r['p50_ms']:>10.2f} ms  x{ratio:5.2f}  {marca}",
+              file=sys.stderr)
+        if marca != "ok":
+            regresiones.append(caso)
+    return regresiones
+
+
+# ---------------------------------------------------------------------------
+# Preparación de datos
+# ---------------------------------------------------------------------------
+def preparar(args) -> dict:
+    from db import Base, SessionLocal, engine
+    from models import BaseGeneral, Registro
+    from bench import datos
+    from services.resumen_semanal import reconstruir
+
+    if args.fresh:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    with SessionLocal() as db:
+        tipos, bocas = datos.poblar_catalogos(db)
+        admin_id, agentes = datos.poblar_usuarios(db, args.agentes)
+        base_n = datos.contar(db, BaseGeneral)
+        reg_n = datos.contar(db, Registro)
+
+    if base_n == 0:
+        t0 = time.perf_counter()
+        base_n = datos.poblar_base_general(engine, args.base, args.seed)
+        print(f"[bench] base_general: {base_n} filas en {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    elif base_n != args.base:
+        print(f"[WARN] base_general ya tiene {base_n} filas (se pidieron {args.base}); usa --fresh",
+              file=sys.stderr)
+    if reg_n == 0:
+        t0 = time.perf_counter()
+        reg_n = datos.poblar_registros(engine, args.registros, agentes, tipos, bocas, base_n, args.seed)
+        print(f"[bench] registros: {reg_n} filas en {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        # las filas se insertan por fuera de crear(): el resumen se arma de una vez
+        with engine.begin() as conn:
+            reconstruir(conn)
+    elif reg_n != args.registros:
+        print(f"[WARN] registros ya tiene {reg_n} filas (se pidieron {args.registros}); usa --fresh",
+              file=sys.stderr)
+
+    return {
+        "admin_id": admin_id,
+        "agentes": agentes,
+        "base_n": base_n,
+        "registros_n": reg_n,
+        "dialecto": engine.dialect.name,
+    }
+
+
+def cliente_sesion(app, uid: int, role: str):
+    c = app.test_client()
+    with c.session_transaction() as s:
+        s["user_id"] = uid
+        s["role"] = role
+        s["username"] = "bench"
+    return c
+
+
+# ---------------------------------------------------------------------------
+# Casos
+# ---------------------------------------------------------------------------
+def casos(args, ctx: dict, tmpdir: str) -> dict:
+    from app import app
+    from bench import datos
+    from blueprints.registros.routes import _parse_currency
+    from services.base_general_loader import load_base_general_xlsx
+    from services.cliente_index import cliente_index
+    from services.csv_ingest import cargar_base_general_csv
+
+    rnd = random.Random(args.seed)
+    cliente_index.rebuild()
+    agente = cliente_sesion(app, ctx["agentes"][0], "agente")  # el agente más activo
+    admin = cliente_sesion(app, ctx["admin_id"], "admin")
+
+    def _get(client, url):
+        resp = client.get(url)
+        body = resp.get_data()  # consume el stream completo
+        if resp.status_code != 200:
+            raise RuntimeError(f"{url} -> {resp.status_code}")
+        return len(body)
+
+    def _alternando(archivos, cargar):
+        # archivos con y sin variación: cada corrida reescribe la misma fracción de filas
+        estado = {"i": 0}
+
+        def fn():
+            path = archivos[estado["i"] % 2]
+            estado["i"] += 1
+            return cargar(path)
+        return fn
+
+    def api_search_cliente():
+        largo = rnd.randint(5, 9)
+        prefijo = datos.cliente_unico(rnd.randrange(ctx["base_n"]))[:largo]
+        _get(agente, f"/registros/api/search_cliente?term={prefijo}")
+
+    def listado():
+        _get(agente, "/registros/")
+
+    def listado_semana():
+        _get(agente, f"/registros/?semana={rnd.randint(1, 52)}")
+
+    def resumen():
+        _get(agente, f"/registros/resumen?semana={rnd.randint(1, 52)}")
+
+    def export_semana():
+        return {"bytes": _get(admin, f"/admin/export/semana?semana={rnd.randint(1, 52)}")}
+
+    montos = ["$1,234.50", "MXN 2 500", "1.234,56", "950", "$ 12,000.00", "", "0.5"] * 1500
+
+    def parse_currency():
+        for m in montos:
+            _parse_currency(m)
+        return {"llamadas": len(montos)}
+
+    todos = {
+        "api_search_cliente": api_search_cliente,
+        "listado": listado,
+        "listado_semana": listado_semana,
+        "resumen": resumen,
+        "export_semana": export_semana,
+        "parse_currency": parse_currency,
+    }
+
+    # las cargas se preparan sólo si se van a medir (generar el archivo cuesta)
+    quiere = lambda caso: not args.solo or caso in args.solo  # noqa: E731
+    if quiere("carga_csv"):
+        n = args.csv or min(ctx["base_n"], 100_000)
+        archivos = [
+            datos.escribir_csv(os.path.join(tmpdir, "base_var.csv"), n, args.seed, variacion=0.05),
+            datos.escribir_csv(os.path.join(tmpdir, "base.csv"), n, args.seed),
+        ]
+        todos["carga_csv"] = _alternando(archivos, lambda p: cargar_base_general_csv(p, "upsert"))
+    if quiere("load_base_general_xlsx"):
+        n = args.xlsx or min(ctx["base_n"], 20_000)
+        archivos = [
+            datos.escribir_xlsx(os.path.join(tmpdir, "base_var.xlsx"), n, args.seed, variacion=0.05),
+            datos.escribir_xlsx(os.path.join(tmpdir, "base.xlsx"), n, args.seed),
+        ]
+        todos["load_base_general_xlsx"] = _alternando(archivos, load_base_general_xlsx)
+
+    resultados = {}
+    for nombre, fn in todos.items():
+        if not quiere(nombre):
+            continue
+        print(f"[bench] {nombre} ...", file=sys.stderr)
+        resultados[nombre] = medir(fn, args.repeat)
+    if "parse_currency" in resultados:
+        r = resultados["parse_currency"]
+        r["por_llamada_us"] = round(r["p50_ms"] * 1000 / len(montos), 3)
+    return resultados
+
+
+def main(argv=None) -> int:
+    args = _args(argv)
+    # Config lee la URL al importarse: fijarla antes de importar db/app
+    os.environ["SQLALCHEMY_DATABASE_URI"] = args.db
+    os.environ.pop("DATABASE_URL", None)
+
+    ctx = preparar(args)
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmpdir:
+        resultados = casos(args, ctx, tmpdir)
+
+    import sqlalchemy
+
+    salida = {
+        "meta": {
+            "fecha": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "plataforma": platform.platform(),
+            "dialecto": ctx["dialecto"],
+            "base_general": ctx["base_n"],
+            "registros": ctx["registros_n"],
+            "agentes": len(ctx["agentes"]),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "resultados": resultados,
+    }
+    texto = json.dumps(salida, indent=2, ensure_ascii=False, default=str)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            base = json.load(fh)
+        if base.get("meta", {}).get("dialecto") != ctx["dialecto"]:
+            print("[WARN] la línea base usa otro dialecto; la comparación no es fiable", file=sys.stderr)
+        if comparar(salida, base, args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,7 @@
 import io
 import csv
 import os
-import time
+import uuid
 
 from flask import (
     render_template,
@@ -11,15 +11,19 @@ from flask import (
     url_for,
     flash,
     session as _session,
-    send_file,
     current_app,
+    Response,
+    stream_with_context,
+    jsonify,
 )
+from sqlalchemy import func
 from werkzeug.security import generate_password_hash
 
-from sqlalchemy import text
-
-from db import SessionLocal, engine
-from models import BaseGeneral, TipoConvenio, BocaCobranza, Usuario, Registro
+from db import SessionLocal
+from models import TipoConvenio, BocaCobranza, Usuario, Registro, CargaBase, ResumenSemanal
+from services.cargas import encolar_carga, carga_a_dict, colgada, recuperar_colgadas
+from services.catalogos_cache import catalogo_cache
+from services.lecturas import session_lectura
 
 # Usa el blueprint ya creado en __init__.py
 from . import admin_bp
@@ -48,7 +52,59 @@ def export_semana():
         flash("Parámetro 'semana' inválido.", "warning")
         return redirect(url_for("admin.index"))
 
-    with SessionLocal() as db:
+    filename = f"registros_semana_{semana}.csv"
+    return Response(
+        stream_with_context(_export_semana_csv(semana)),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+EXPORT_HEADER = [
+    "ID",
+    "CLIENTE_UNICO",
+    "NOMBRE_SNAP",
+    "GERENCIA_SNAP",
+    "PRODUCTO_SNAP",
+    "FIDIAPAGO_SNAP",
+    "GESTION_DESC_SNAP",
+    "FECHA_PROMESA",
+    "TELEFONO",
+    "SEMANA",
+    "PAGO_INICIAL",
+    "PAGO_SEMANAL",
+    "DURACION_SEMANAS",
+    "NOTAS",
+    "CREADO_POR",
+    "CREADO_EN",
+    "TIPO_CONVENIO",
+    "BOCA_COBRANZA",
+]
+
+# filas por lote leído del cursor del servidor / por chunk enviado
+EXPORT_BATCH = 1000
+
+
+def _export_semana_csv(semana: int):
+    """
+    Genera el CSV (BOM + UTF-8 para Excel) por chunks. La consulta se lee con
+    cursor del lado del servidor (yield_per), así que la memoria no crece con
+    el número de registros de la semana.
+    """
+    sio = io.StringIO(newline="")
+    w = csv.writer(sio, lineterminator="\n")
+
+    def flush() -> bytes:
+        chunk = sio.getvalue().encode("utf-8")
+        sio.seek(0)
+        sio.truncate(0)
+        return chunk
+
+    sio.write("\ufeff")
+    w.writerow(EXPORT_HEADER)
+    yield flush()
+
+    with session_lectura() as db:
         rows = (
             db.query(
                 Registro.id,
@@ -75,66 +131,85 @@ def export_semana():
             .outerjoin(BocaCobranza, BocaCobranza.id == Registro.boca_cobranza_id)
             .filter(Registro.semana == semana)
             .order_by(Registro.id.asc())
-            .all()
+            .execution_options(yield_per=EXPORT_BATCH)
         )
 
-    # CSV en memoria (BOM + UTF-8 para Excel)
-    sio = io.StringIO(newline="")
-    w = csv.writer(sio, lineterminator="\n")
-    w.writerow(
-        [
-            "ID",
-            "CLIENTE_UNICO",
-            "NOMBRE_SNAP",
-            "GERENCIA_SNAP",
-            "PRODUCTO_SNAP",
-            "FIDIAPAGO_SNAP",
-            "GESTION_DESC_SNAP",
-            "FECHA_PROMESA",
-            "TELEFONO",
-            "SEMANA",
-            "PAGO_INICIAL",
-            "PAGO_SEMANAL",
-            "DURACION_SEMANAS",
-            "NOTAS",
-            "CREADO_POR",
-            "CREADO_EN",
-            "TIPO_CONVENIO",
-            "BOCA_COBRANZA",
-        ]
-    )
-    for r in rows:
-        w.writerow(
-            [
-                r.id or "",
-                r.cliente_unico or "",
-                r.nombre_cte_snap or "",
-                r.gerencia_snap or "",
-                r.producto_snap or "",
-                r.fidiapago_snap or "",
-                (r.gestion_desc_snap or "").replace("\r", " ").replace("\n", " "),
-                r.fecha_promesa or "",
-                r.telefono or "",
-                r.semana or "",
-                r.pago_inicial or "",
-                r.pago_semanal or "",
-                r.duracion_semanas or "",
-                (r.notas or "").replace("\r", " ").replace("\n", " "),
-                r.creado_por_username or "",
-                r.creado_en or "",
-                r.tipo_convenio_nombre or "",
-                r.boca_cobranza_nombre or "",
-            ]
-        )
+        pending = 0
+        for r in rows:
+            w.writerow(
+                [
+                    r.id or "",
+                    r.cliente_unico or "",
+                    r.nombre_cte_snap or "",
+                    r.gerencia_snap or "",
+                    r.producto_snap or "",
+                    r.fidiapago_snap or "",
+                    (r.gestion_desc_snap or "").replace("\r", " ").replace("\n", " "),
+                    r.fecha_promesa or "",
+                    r.telefono or "",
+                    r.semana or "",
+                    r.pago_inicial or "",
+                    r.pago_semanal or "",
+                    r.duracion_semanas or "",
+                    (r.notas or "").replace("\r", " ").replace("\n", " "),
+                    r.creado_por_username or "",
+                    r.creado_en or "",
+                    r.tipo_convenio_nombre or "",
+                    r.boca_cobranza_nombre or "",
+                ]
+            )
+            pending += 1
+            if pending >= EXPORT_BATCH:
+                yield flush()
+                pending = 0
 
-    csv_bytes = ("\ufeff" + sio.getvalue()).encode("utf-8")
-    filename = f"registros_semana_{semana}.csv"
-    return send_file(
-        io.BytesIO(csv_bytes),
-        mimetype="text/csv",
-        as_attachment=True,
-        download_name=filename,
-    )
+    if pending:
+        yield flush()
+
+
+# --- RESUMEN POR SEMANA (JSON, desde resumen_semanal) ---
+@admin_bp.get("/resumen/semana")
+def resumen_semana():
+    """Totales de la semana por agente; lee resumen_semanal, no registros."""
+    if _session.get("role") != "admin":
+        return jsonify({"ok": False, "error": "no-auth"}), 401
+    semana = request.args.get("semana", type=int)
+    if semana is None or not (1 <= semana <= 53):
+        return jsonify({"ok": False, "error": "semana-invalida"}), 400
+    anio = request.args.get("anio", type=int)
+
+    with session_lectura() as db:
+        q = (
+            db.query(
+                Usuario.username,
+                func.sum(ResumenSemanal.registros),
+                func.sum(ResumenSemanal.suma_pago_inicial),
+                func.sum(ResumenSemanal.suma_pago_semanal),
+            )
+            .select_from(ResumenSemanal)
+            .outerjoin(Usuario, Usuario.id == ResumenSemanal.creado_por)
+            .filter(ResumenSemanal.semana == semana)
+        )
+        if anio:
+            q = q.filter(ResumenSemanal.anio == anio)
+        filas = q.group_by(Usuario.username).order_by(Usuario.username).all()
+
+    agentes = [
+        {
+            "agente": username or "(sin usuario)",
+            "registros": int(n or 0),
+            "pagos_inicial": str(inicial or 0),
+            "pagos_semanal": str(semanal or 0),
+        }
+        for username, n, inicial, semanal in filas
+    ]
+    return jsonify({
+        "ok": True,
+        "semana": semana,
+        "anio": anio,
+        "total": sum(a["registros"] for a in agentes),
+        "agentes": agentes,
+    })
 
 
 # (opcional) portada del admin
@@ -150,17 +225,21 @@ def index():
 def base_general():
     if not require_admin():
         return redirect(url_for("auth.login"))
-    return render_template("admin_base_general.html")
+    with SessionLocal() as db:
+        cargas = db.query(CargaBase).order_by(CargaBase.id.desc()).limit(10).all()
+    return render_template(
+        "admin_base_general.html",
+        cargas=[carga_a_dict(c) for c in cargas],
+    )
 
 
-# --------- Carga CSV → staging → UPSERT a destino (sin CTE ni CTAS, compatible TiDB) ----------
+# --------- Carga CSV → cola en segundo plano (LOAD DATA o motor por lotes) ----------
 @admin_bp.post("/base_general")
 def base_general_upload():
     """
     Carga SOLO CSV. Inserta nuevos y actualiza existentes por UNIQUE(cliente_unico).
-    Requisitos previos (una sola vez en la BD):
-      - base_general: SOLO un índice UNIQUE(cliente_unico)
-      - base_general_tmp: SIN índices UNIQUE
+    La petición sólo guarda el archivo y encola la carga; el avance se consulta
+    en /admin/base_general/cargas/<id>.
     """
     if not require_admin():
         return redirect(url_for("auth.login"))
@@ -174,130 +253,44 @@ def base_general_upload():
     if not f.filename.lower().endswith(".csv"):
         flash("Solo se admite CSV (más rápido que XLSX).", "warning")
         return redirect(url_for("admin.base_general"))
+    if mode not in ("upsert", "insert"):
+        mode = "upsert"
 
-    # Guarda temporalmente para usar LOAD DATA LOCAL INFILE
-    t0 = time.time()
+    # Guarda en disco; el worker en segundo plano lo borra al terminar
     tmp_dir = os.path.join(current_app.instance_path, "uploads")
     os.makedirs(tmp_dir, exist_ok=True)
-    tmp_path = os.path.join(tmp_dir, f"bg_{int(t0)}.csv")
+    tmp_path = os.path.join(tmp_dir, f"bg_{uuid.uuid4().hex}.csv")
     f.save(tmp_path)
 
     try:
-        with engine.begin() as conn:
-            # 1) Limpia staging
-            conn.execute(text("TRUNCATE TABLE sistema_registros.base_general_tmp"))
-
-            # 2) Carga rápida a staging
-            #    Si tu CSV usa solo '\n', cambia LINES TERMINATED BY '\n'
-            conn.exec_driver_sql(
-                """
-                LOAD DATA LOCAL INFILE %s
-                INTO TABLE sistema_registros.base_general_tmp
-                CHARACTER SET utf8mb4
-                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
-                LINES  TERMINATED BY '\r\n'
-                IGNORE 1 LINES
-                (@cliente_unico,@nombre_cte,@gerencia,@producto,@fidiapago,@gestion_desc)
-                SET
-                  cliente_unico = TRIM(@cliente_unico),
-                  nombre_cte    = NULLIF(TRIM(@nombre_cte),''),
-                  gerencia      = NULLIF(TRIM(@gerencia),''),
-                  producto      = NULLIF(TRIM(@producto),''),
-                  fidiapago     = NULLIF(TRIM(@fidiapago),''),
-                  gestion_desc  = NULLIF(TRIM(@gestion_desc),''),
-                  actualizado_en = NOW();
-                """,
-                (tmp_path,),
-            )
-
-            total_tmp = conn.execute(
-                text("SELECT COUNT(*) FROM sistema_registros.base_general_tmp")
-            ).scalar_one()
-
-            # 3) Subconsulta "dedup": última fila por UPPER(TRIM(cliente_unico))
-            dedup_subq = """
-              SELECT *
-              FROM (
-                SELECT s.*,
-                       ROW_NUMBER() OVER (
-                         PARTITION BY UPPER(TRIM(cliente_unico))
-                         ORDER BY id DESC
-                       ) AS rn
-                FROM sistema_registros.base_general_tmp s
-              ) d
-              WHERE d.rn = 1
-            """
-
-            # Conteo deduplicado
-            dedup = conn.execute(
-                text(f"SELECT COUNT(*) FROM ({dedup_subq}) AS dd")
-            ).scalar_one()
-
-            # Conteo de NUEVOS (dedup LEFT JOIN destino)
-            nuevos = conn.execute(
-                text(f"""
-                  SELECT COUNT(*)
-                  FROM ({dedup_subq}) AS d
-                  LEFT JOIN sistema_registros.base_general t
-                    ON UPPER(TRIM(t.cliente_unico)) = UPPER(TRIM(d.cliente_unico))
-                  WHERE t.cliente_unico IS NULL
-                """)
-            ).scalar_one()
-
-            # 4) Inserta/Actualiza destino (normalizando cliente_unico al entrar)
-            if mode == "insert":
-                res = conn.execute(
-                    text(f"""
-                      INSERT INTO sistema_registros.base_general
-                        (cliente_unico, nombre_cte, gerencia, producto, fidiapago, gestion_desc)
-                      SELECT UPPER(TRIM(d.cliente_unico)) AS cliente_unico,
-                             d.nombre_cte, d.gerencia, d.producto, d.fidiapago, d.gestion_desc
-                      FROM ({dedup_subq}) AS d
-                      LEFT JOIN sistema_registros.base_general t
-                        ON UPPER(TRIM(t.cliente_unico)) = UPPER(TRIM(d.cliente_unico))
-                      WHERE t.cliente_unico IS NULL
-                    """)
-                )
-                insertados = res.rowcount or int(nuevos)
-                actualizados = 0
-            else:  # upsert
-                res = conn.execute(
-                    text(f"""
-                      INSERT INTO sistema_registros.base_general
-                        (cliente_unico, nombre_cte, gerencia, producto, fidiapago, gestion_desc)
-                      SELECT UPPER(TRIM(d.cliente_unico)) AS cliente_unico,
-                             d.nombre_cte, d.gerencia, d.producto, d.fidiapago, d.gestion_desc
-                      FROM ({dedup_subq}) AS d
-                      ON DUPLICATE KEY UPDATE
-                        nombre_cte = VALUES(nombre_cte),
-                        gerencia   = VALUES(gerencia),
-                        producto   = VALUES(producto),
-                        fidiapago  = VALUES(fidiapago),
-                        gestion_desc = VALUES(gestion_desc),
-                        actualizado_en = NOW()
-                    """)
-                )
-                insertados = int(nuevos)
-                actualizados = max(0, int(dedup) - insertados)
-
-        dt = time.time() - t0
-        flash(
-            f"CSV cargado: {total_tmp} filas (dedup únicas: {dedup}). "
-            f"Nuevos insertados: {insertados} | Actualizados: {actualizados}. "
-            f"Tiempo: {dt:.1f}s",
-            "success",
-        )
+        carga_id = encolar_carga(tmp_path, mode, _session.get("user_id"), f.filename)
     except Exception as e:
-        flash(f"Error al procesar CSV: {e}", "danger")
-    finally:
         try:
             os.remove(tmp_path)
         except Exception:
             pass
+        flash(f"Error al encolar CSV: {e}", "danger")
+        return redirect(url_for("admin.base_general"))
 
+    flash(f"Carga #{carga_id} en cola. Puedes seguir su avance en esta página.", "success")
     return redirect(url_for("admin.base_general"))
 
 
+@admin_bp.get("/base_general/cargas/<int:carga_id>")
+def base_general_carga_estado(carga_id: int):
+    if _session.get("role") != "admin":
+        return jsonify({"ok": False, "error": "no-auth"}), 401
+    with SessionLocal() as db:
+        carga = db.get(CargaBase, carga_id)
+        if carga and colgada(carga):
+            # su worker murió: reencolarla (o marcarla como error) en vez de esperar al próximo arranque
+            recuperar_colgadas()
+            db.refresh(carga)
+    if not carga:
+        return jsonify({"ok": False, "error": "no-encontrado"}), 404
+    return jsonify({"ok": True, "data": carga_a_dict(carga)})
+
+
 # ---------- Catálogo: TipoConvenio ----------
 @admin_bp.get("/catalogo/tipos")
 def catalogo_tipos():
@@ -324,7 +317,9 @@ def catalogo_tipos_save():
             item.activo = activo
         else:
             db.add(TipoConvenio(nombre=nombre, activo=activo))
+        catalogo_cache.bump(db)
         db.commit()
+    catalogo_cache.invalidate()
     flash("Guardado", "success")
     return redirect(url_for("admin.catalogo_tipos"))
 
@@ -355,7 +350,9 @@ def catalogo_bocas_save():
             item.activo = activo
         else:
             db.add(BocaCobranza(nombre=nombre))
+        catalogo_cache.bump(db)
         db.commit()
+    catalogo_cache.invalidate()
     flash("Guardado", "success")
     return redirect(url_for("admin.catalogo_bocas"))
 
@@ -0,0 +1,231 @@
+# blueprints/registros/importar.py
+"""
+Importación masiva de registros desde CSV (promesas capturadas fuera de línea).
+
+Columnas por nombre de encabezado (sin importar mayúsculas ni orden):
+    cliente_unico, tipo_convenio, boca_cobranza          (obligatorias)
+    fecha_promesa, telefono, semana, pago_inicial, pago_semanal,
+    duracion_semanas, notas, agente                      (opcionales)
+
+- tipo_convenio / boca_cobranza: nombre del catálogo activo (o su id).
+- agente: username del agente al que se asigna; vacío => quien importa.
+- Mismas validaciones que el formulario (parseo.py).
+
+El archivo se lee por streaming. Cada bloque de LOTE filas válidas se resuelve
+contra base_general con una sola consulta IN y se inserta en su propia
+transacción (junto con el resumen semanal); un bloque que falla no deshace los
+anteriores. Las filas con error no se insertan y se reportan con su número de
+línea para corregirlas y volver a subir sólo esas.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import unicodedata
+from datetime import date
+
+from db import SessionLocal
+from models import Registro, Usuario
+from services import bitacora, resumen_semanal
+from services.catalogos_cache import catalogo_cache
+from services.csv_ingest import SNIFF_BYTES, detect_encoding
+from utils.claves import normalizar_cliente_unico
+
+from .parseo import parse_currency, parse_duration, parse_fecha
+from .services import buscar_bases
+
+LOTE = 500
+# errores que se devuelven (el conteo total siempre es exacto)
+MAX_ERRORES = 1000
+
+REQUERIDAS = ("cliente_unico", "tipo_convenio", "boca_cobranza")
+OPCIONALES = (
+    "fecha_promesa",
+    "telefono",
+    "semana",
+    "pago_inicial",
+    "pago_semanal",
+    "duracion_semanas",
+    "notas",
+    "agente",
+)
+ALIAS = {
+    "tipo": "tipo_convenio",
+    "tipo_convenio_id": "tipo_convenio",
+    "boca": "boca_cobranza",
+    "boca_cobranza_id": "boca_cobranza",
+    "creado_por": "agente",
+    "usuario": "agente",
+}
+
+
+def _clave(texto: str | None) -> str:
+    """Nombre comparable: sin acentos, minúsculas, espacios simples."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(ch for ch in texto if not unicodedata.combining(ch))
+    return " ".join(texto.lower().split())
+
+
+def _mapa_catalogo(items) -> dict[str, int]:
+    mapa = {_clave(i.nombre): i.id for i in items}
+    mapa.update({str(i.id): i.id for i in items})
+    return mapa
+
+
+def _parse_semana(raw: str) -> int | None:
+    if not raw:
+        return None
+    try:
+        semana = int(raw)
+    except ValueError as exc:
+        raise ValueError("Semana inválida") from exc
+    if not 1 <= semana <= 53:
+        raise ValueError("La semana debe estar entre 1 y 53")
+    return semana
+
+
+class Importacion:
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.total = 0
+        self.insertados = 0
+        self.n_errores = 0
+        self.errores: list[tuple[int, str, str]] = []  # (línea, cliente_unico, mensaje)
+
+        snap = catalogo_cache.get()
+        self.tipos = _mapa_catalogo(snap.tipos)
+        self.bocas = _mapa_catalogo(snap.bocas)
+        with SessionLocal() as db:
+            self.agentes = {
+                u.lower(): uid
+                for uid, u in db.query(Usuario.id, Usuario.username).filter(Usuario.activo == 1)
+            }
+
+    def error(self, linea: int, cliente_unico: str, mensaje: str) -> None:
+        self.n_errores += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append((linea, cliente_unico, mensaje))
+
+    def resultado(self) -> dict:
+        return {
+            "total": self.total,
+            "insertados": self.insertados,
+            "n_errores": self.n_errores,
+            "errores": sorted(self.errores),
+            "truncado": self.n_errores > len(self.errores),
+        }
+
+    # -- fila -> dict de campos validados (o ValueError con el motivo) --
+    def validar(self, fila: dict) -> dict:
+        cu = normalizar_cliente_unico(fila.get("cliente_unico"))
+        if not cu:
+            raise ValueError("Cliente único es obligatorio")
+        tipo_id = self.tipos.get(_clave(fila.get("tipo_convenio")))
+        if tipo_id is None:
+            raise ValueError(f"Tipo de convenio desconocido: {fila.get('tipo_convenio') or '(vacío)'}")
+        boca_id = self.bocas.get(_clave(fila.get("boca_cobranza")))
+        if boca_id is None:
+            raise ValueError(f"Boca de cobranza desconocida: {fila.get('boca_cobranza') or '(vacío)'}")
+
+        agente = (fila.get("agente") or "").strip()
+        creado_por = self.agentes.get(agente.lower()) if agente else self.user_id
+        if creado_por is None:
+            raise ValueError(f"Agente desconocido o inactivo: {agente}")
+
+        telefono = (fila.get("telefono") or "").strip()
+        if len(telefono) > 30:
+            raise ValueError("Teléfono demasiado largo")
+
+        return {
+            "cliente_unico": cu,
+            "tipo_convenio_id": tipo_id,
+            "boca_cobranza_id": boca_id,
+            "fecha_promesa": parse_fecha(fila.get("fecha_promesa")) or date.today(),
+            "telefono": telefono or None,
+            "semana": _parse_semana(fila.get("semana") or ""),
+            "pago_inicial": parse_currency(fila.get("pago_inicial")),
+            "pago_semanal": parse_currency(fila.get("pago_semanal")),
+            "duracion_semanas": parse_duration(fila.get("duracion_semanas")),
+            "notas": (fila.get("notas") or "").strip() or None,
+            "creado_por": creado_por,
+        }
+
+    # -- bloque de filas válidas: una consulta a base_general + una transacción --
+    def insertar(self, bloque: list[tuple[int, dict]]) -> None:
+        with SessionLocal() as db:
+            bases = buscar_bases(db, (campos["cliente_unico"] for _, campos in bloque))
+            nuevos: list[Registro] = []
+            lineas: list[tuple[int, str]] = []
+            for linea, campos in bloque:
+                base = bases.get(campos["cliente_unico"])
+                if base is None:
+                    self.error(linea, campos["cliente_unico"], "Cliente no existe en la base del día")
+                    continue
+                campos["cliente_unico"] = base["cliente_unico"]
+                lineas.append((linea, base["cliente_unico"]))
+                nuevos.append(
+                    Registro(
+                        **campos,
+                        nombre_cte_snap=base["nombre_cte"] or None,
+                        gerencia_snap=base["gerencia"] or None,
+                        producto_snap=base["producto"] or None,
+                        fidiapago_snap=base["fidiapago"] or None,
+                        gestion_desc_snap=base["gestion_desc"] or None,
+                    )
+                )
+            if not nuevos:
+                return
+            try:
+                db.add_all(nuevos)
+                db.flush()
+                resumen_semanal.sumar_altas(db, nuevos)
+                cambios = [bitacora.diff(None, bitacora.snapshot(r)) for r in nuevos]
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                for linea, cu in lineas:
+                    self.error(linea, cu, f"No se guardó el bloque: {exc}")
+                return
+        self.insertados += len(nuevos)
+        for registro, c in zip(nuevos, cambios):
+            bitacora.registrar(registro.id, "CREAR", c, self.user_id)
+
+
+def importar_registros_csv(stream, user_id: int) -> dict:
+    """
+    Importa el CSV de `stream` (binario, con seek). Devuelve
+    {"total", "insertados", "n_errores", "errores": [(línea, cliente_unico, mensaje)], "truncado"}.
+    Lanza ValueError si faltan columnas obligatorias.
+    """
+    encoding = detect_encoding(stream.read(SNIFF_BYTES))
+    stream.seek(0)
+    texto = io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline="")
+    try:
+        reader = csv.reader(texto)
+        encabezado = [_clave(h).replace(" ", "_") for h in next(reader, [])]
+        encabezado = [ALIAS.get(h, h) for h in encabezado]
+        faltan = [c for c in REQUERIDAS if c not in encabezado]
+        if faltan:
+            raise ValueError(f"Faltan columnas: {', '.join(faltan)}")
+        idx = [(c, encabezado.index(c)) for c in REQUERIDAS + OPCIONALES if c in encabezado]
+
+        imp = Importacion(user_id)
+        bloque: list[tuple[int, dict]] = []
+        for raw in reader:
+            if not any(v.strip() for v in raw):
+                continue
+            imp.total += 1
+            fila = {c: (raw[i].strip() if i < len(raw) else "") for c, i in idx}
+            try:
+                bloque.append((reader.line_num, imp.validar(fila)))
+            except ValueError as exc:
+                imp.error(reader.line_num, fila.get("cliente_unico", ""), str(exc))
+                continue
+            if len(bloque) >= LOTE:
+                imp.insertar(bloque)
+                bloque = []
+        if bloque:
+            imp.insertar(bloque)
+    finally:
+        texto.detach()  # el stream lo cierra quien lo abrió
+    return imp.resultado()
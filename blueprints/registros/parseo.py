@@ -0,0 +1,49 @@
+# blueprints/registros/parseo.py
+"""Validación de los campos capturados (formulario de registro e importación CSV)."""
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+
+def parse_currency(raw: str | None) -> Decimal | None:
+    if not raw:
+        return None
+    cleaned = (
+        raw.replace("MXN", "")
+        .replace("$", "")
+        .replace("\u00a0", " ")
+        .replace(" ", "")
+    )
+    # si viene con separador europeo "1.234,56"
+    if "," in cleaned and "." not in cleaned:
+        cleaned = cleaned.replace(",", ".")
+    cleaned = cleaned.replace(",", "")
+    if not cleaned:
+        return None
+    try:
+        value = Decimal(cleaned)
+    except (InvalidOperation, ValueError) as exc:
+        raise ValueError("Formato de moneda inválido") from exc
+    return value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def parse_duration(raw: str | None) -> int | None:
+    if not raw:
+        return None
+    try:
+        weeks = int(raw)
+    except ValueError as exc:
+        raise ValueError("Duración en semanas inválida") from exc
+    if weeks < 1:
+        raise ValueError("La duración debe ser al menos de una semana")
+    return weeks
+
+
+def parse_fecha(raw: str | None) -> date | None:
+    if not raw:
+        return None
+    try:
+        return date.fromisoformat(raw)
+    except ValueError as exc:
+        raise ValueError("Fecha promesa inválida") from exc
@@ -3,12 +3,9 @@
 from __future__ import annotations
 
 import os
-import uuid
 from datetime import date
-from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from decimal import Decimal, InvalidOperation
 
-from markupsafe import Markup, escape
-from sqlalchemy.orm import selectinload
 from flask import (
     render_template,
     request,
@@ -24,8 +21,35 @@ from flask import (
 from werkzeug.utils import secure_filename
 
 from db import SessionLocal
-from models import Registro, BaseGeneral, TipoConvenio, BocaCobranza
+from models import Registro, BaseGeneral
+from services.catalogos_cache import catalogo_cache
+from services.lecturas import marcar_escritura, session_lectura
+from services.cliente_index import cliente_index
+from services.nombre_index import nombre_index
+from services import bitacora, evidencias, resumen_semanal
+from utils.claves import normalizar_cliente_unico
 from . import registros_bp
+from .importar import importar_registros_csv
+from .parseo import (
+    parse_currency as _parse_currency,
+    parse_duration as _parse_duration,
+    parse_fecha as _parse_fecha,
+)
+from .services import (
+    parse_filtros,
+    filtros_querystring,
+    aplicar_filtros,
+    paginar_keyset,
+    resumen_agregado,
+    buscar_bases,
+    consulta_listado,
+    cargar_edicion,
+    FilaListado,
+)
+
+
+# Las evidencias no cambian bajo el mismo nombre: caché de un año en el navegador
+ARCHIVO_MAX_AGE = 365 * 24 * 3600
 
 
 # ---------------------------------------------------------------------------
@@ -39,6 +63,13 @@ def require_agent() -> bool:
     return True
 
 
+def require_supervisor() -> bool:
+    if session.get("role") not in {"admin", "supervisor"}:
+        flash("Acceso restringido a supervisores y administradores.", "danger")
+        return False
+    return True
+
+
 # ---------------------------------------------------------------------------
 # Helpers de archivos / parsing / formato
 # ---------------------------------------------------------------------------
@@ -49,74 +80,29 @@ def _allowed(filename: str) -> bool:
     return ext in current_app.config.get("ALLOWED_EXTENSIONS", set())
 
 
-def _save_upload(file_storage):
-    """Guarda archivo en UPLOAD_FOLDER con nombre seguro+UUID. Devuelve nombre o None."""
+def _save_upload(file_storage, db):
+    """
+    Guarda el archivo en el almacén de evidencias (deduplicado por SHA-256) y
+    suma una referencia en la transacción de `db`. Devuelve la clave o None.
+    """
     if not file_storage or file_storage.filename == "":
         return None
     if not _allowed(file_storage.filename):
         raise ValueError("Extensión no permitida (usa pdf, png, jpg, jpeg).")
 
     base = current_app.config["UPLOAD_FOLDER"]
-    os.makedirs(base, exist_ok=True)
-
-    safe = secure_filename(file_storage.filename)
-    unique = f"{uuid.uuid4().hex}_{safe}"
-    file_storage.save(os.path.join(base, unique))
-    return unique
-
-
-def _delete_file(fname: str | None) -> None:
-    if not fname:
-        return
-    base = current_app.config["UPLOAD_FOLDER"]
-    path = os.path.join(base, fname)
-    try:
-        os.remove(path)
-    except OSError:
-        pass
-
-
-def _parse_currency(raw: str | None) -> Decimal | None:
-    if not raw:
-        return None
-    cleaned = (
-        raw.replace("MXN", "")
-        .replace("$", "")
-        .replace("\u00a0", " ")
-        .replace(" ", "")
-    )
-    # si viene con separador europeo "1.234,56"
-    if "," in cleaned and "." not in cleaned:
-        cleaned = cleaned.replace(",", ".")
-    cleaned = cleaned.replace(",", "")
-    if not cleaned:
-        return None
-    try:
-        value = Decimal(cleaned)
-    except (InvalidOperation, ValueError) as exc:
-        raise ValueError("Formato de moneda inválido") from exc
-    return value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-
-def _parse_duration(raw: str | None) -> int | None:
-    if not raw:
-        return None
-    try:
-        weeks = int(raw)
-    except ValueError as exc:
-        raise ValueError("Duración en semanas inválida") from exc
-    if weeks < 1:
-        raise ValueError("La duración debe ser al menos de una semana")
-    return weeks
+    ext = file_storage.filename.rsplit(".", 1)[1].lower()
+    clave, nuevo, tamano = evidencias.guardar_contenido(base, file_storage.stream, ext)
+    evidencias.referenciar(db, clave, tamano, secure_filename(file_storage.filename))
+    if nuevo:
+        # copia web + miniatura en segundo plano (sólo imágenes)
+        evidencias.encolar_derivados(base, clave)
+    return clave
 
 
-def _parse_fecha(raw: str | None) -> date | None:
-    if not raw:
-        return None
-    try:
-        return date.fromisoformat(raw)
-    except ValueError as exc:
-        raise ValueError("Fecha promesa inválida") from exc
+def _delete_file(fname: str | None, db) -> None:
+    """Quita la referencia; el objeto sin referencias lo borra el GC (migrar_evidencias.py --gc)."""
+    evidencias.liberar(db, current_app.config["UPLOAD_FOLDER"], fname)
 
 
 def _format_currency(value) -> str:
@@ -129,33 +115,13 @@ def _format_currency(value) -> str:
     return f"${number:,.2f}"
 
 
-def _build_select_options(items, selected_id, placeholder="Selecciona una opción") -> Markup:
-    placeholder_selected = selected_id in (None, "")
-    options: list[str] = [
-        f'<option value="" disabled{" selected" if placeholder_selected else ""}>{escape(placeholder)}</option>'
-    ]
-    for item in items:
-        value = escape(str(getattr(item, "id", "")))
-        label = escape(getattr(item, "nombre", ""))
-        selected = " selected" if selected_id == getattr(item, "id", None) else ""
-        options.append(f'<option value="{value}"{selected}>{label}</option>')
-    return Markup("\n".join(options))
-
-
-def _load_catalogos(db):
-    tipos = (
-        db.query(TipoConvenio)
-        .filter(TipoConvenio.activo == 1)
-        .order_by(TipoConvenio.nombre.asc())
-        .all()
+def _buscar_base(db, cliente_unico: str) -> BaseGeneral | None:
+    """Busca en base_general por la clave normalizada (index seek sobre uq_bg_cu_norm)."""
+    return (
+        db.query(BaseGeneral)
+        .filter(BaseGeneral.cliente_unico_norm == normalizar_cliente_unico(cliente_unico))
+        .first()
     )
-    bocas = (
-        db.query(BocaCobranza)
-        .filter(BocaCobranza.activo == 1)
-        .order_by(BocaCobranza.nombre.asc())
-        .all()
-    )
-    return tipos, bocas
 
 
 def _aplicar_snapshot(registro: Registro, base: BaseGeneral) -> None:
@@ -176,24 +142,32 @@ def listado():
 
     user_id = session.get("user_id")
     role = session.get("role")
+    filtros = parse_filtros(request.args)
 
-    with SessionLocal() as db:
-        q = (
-            db.query(Registro)
-            .options(
-                selectinload(Registro.tipo_convenio),
-                selectinload(Registro.boca_cobranza),
-            )
-        )
+    with session_lectura() as db:
+        q = consulta_listado(db)
         if role == "agente":
             q = q.filter(Registro.creado_por == user_id)
-        regs = q.order_by(Registro.id.desc()).limit(100).all()
+        q = aplicar_filtros(q, filtros)
+        regs, next_cursor, prev_cursor = paginar_keyset(
+            q,
+            after=request.args.get("after", type=int),
+            before=request.args.get("before", type=int),
+            fila=FilaListado,
+        )
 
+    catalogos = catalogo_cache.get()
     return render_template(
         "registros_listado.html",
         registros=regs,
         role=role,
         user_id=user_id,
+        filtros=filtros,
+        filtros_qs=filtros_querystring(filtros),
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        tipos=catalogos.tipos,
+        bocas=catalogos.bocas,
     )
 
 
@@ -202,14 +176,12 @@ def nuevo():
     if not require_agent():
         return redirect(url_for("auth.login"))
 
-    with SessionLocal() as db:
-        tipos, bocas = _load_catalogos(db)
-
-    # Tu template original itera sobre `tipos` y `bocas`
+    # Catálogos desde caché: <option> ya renderizados, sin consultas
+    catalogos = catalogo_cache.get()
     return render_template(
         "registros_nuevo.html",
-        tipos=tipos,
-        bocas=bocas,
+        tipos_options=catalogos.opciones("tipos"),
+        bocas_options=catalogos.opciones("bocas"),
         registro=None,
         is_edit=False,
         format_currency=_format_currency,
@@ -224,27 +196,20 @@ def editar(registro_id: int):
     user_id = session.get("user_id")
     role = session.get("role")
 
+    # de la principal: actualizar reescribe todos los campos del formulario, así
+    # que leerlo de una réplica atrasada revertiría la edición de otro usuario
     with SessionLocal() as db:
-        registro = (
-            db.query(Registro)
-            .options(
-                selectinload(Registro.tipo_convenio),
-                selectinload(Registro.boca_cobranza),
-            )
-            .filter(Registro.id == registro_id)
-            .first()
-        )
+        registro = cargar_edicion(db, registro_id)
         if not registro:
             abort(404)
         if role == "agente" and registro.creado_por != user_id:
             abort(403)
 
-        tipos, bocas = _load_catalogos(db)
-
+    catalogos = catalogo_cache.get()
     return render_template(
         "registros_nuevo.html",
-        tipos=tipos,
-        bocas=bocas,
+        tipos_options=catalogos.opciones("tipos", registro.tipo_convenio_id),
+        bocas_options=catalogos.opciones("bocas", registro.boca_cobranza_id),
         registro=registro,
         is_edit=True,
         format_currency=_format_currency,
@@ -262,17 +227,68 @@ def api_search_cliente():
     if len(term) < 2:
         return jsonify([])
 
-    with SessionLocal() as db:
+    # Índice en memoria; mientras se construye, se consulta la BD
+    rows = cliente_index.search(term, limit=10)
+    if rows is not None:
+        return jsonify([{"cliente_unico": cu, "nombre_cte": nombre} for cu, nombre in rows])
+
+    with session_lectura() as db:
         rows = (
             db.query(BaseGeneral.cliente_unico, BaseGeneral.nombre_cte)
-            .filter(BaseGeneral.cliente_unico.like(f"{term}%"))
-            .order_by(BaseGeneral.cliente_unico.asc())
+            .filter(BaseGeneral.cliente_unico_norm.like(f"{normalizar_cliente_unico(term)}%"))
+            .order_by(BaseGeneral.cliente_unico_norm.asc())
             .limit(10)
             .all()
         )
     return jsonify([{"cliente_unico": cu, "nombre_cte": nombre or ""} for cu, nombre in rows])
 
 
+@registros_bp.get("/api/search_nombre")
+def api_search_nombre():
+    """
+    Clientes por nombre o gerencia (sin acentos, tolera errores), mejor puntaje
+    primero, con el índice de services.nombre_index.
+
+    Mientras el índice no está listo (o con NOMBRE_INDEX=0) se usa la BD, que
+    NO es equivalente: sólo prefijo de nombre_cte (no gerencia ni palabras en
+    medio), tal cual en mayúsculas y distinguiendo acentos (utf8mb4_bin), sin
+    tolerar errores; score=None marca esas respuestas.
+    """
+    if not require_agent():
+        return jsonify([]), 401
+
+    term = request.args.get("q") or ""
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    if len(term.strip()) < 3:
+        return jsonify([])
+
+    rows = nombre_index.search(term, limit=limit)
+    if rows is not None:
+        return jsonify(
+            [
+                {"cliente_unico": cu, "nombre_cte": nombre, "gerencia": gerencia, "score": score}
+                for cu, nombre, gerencia, score in rows
+            ]
+        )
+
+    # índice apagado o en construcción: prefijo exacto sobre idx_bg_nombre
+    # ("MARIA" no encuentra "MARÍA"; los nombres se cargan en mayúsculas)
+    with session_lectura() as db:
+        rows = (
+            db.query(BaseGeneral.cliente_unico, BaseGeneral.nombre_cte, BaseGeneral.gerencia)
+            .filter(BaseGeneral.nombre_cte.like(f"{term.strip().upper()}%"))
+            .order_by(BaseGeneral.nombre_cte.asc())
+            .limit(limit)
+            .all()
+        )
+    return jsonify(
+        [
+            {"cliente_unico": cu, "nombre_cte": nombre or "", "gerencia": gerencia or "", "score": None}
+            for cu, nombre, gerencia in rows
+        ]
+    )
+
+
 @registros_bp.get("/api/datos_cliente")
 def api_datos_cliente():
     if not require_agent():
@@ -282,8 +298,8 @@ def api_datos_cliente():
     if not cliente_unico:
         return jsonify({"ok": False, "error": "cu-vacio"}), 400
 
-    with SessionLocal() as db:
-        base = db.query(BaseGeneral).filter(BaseGeneral.cliente_unico == cliente_unico).first()
+    with session_lectura() as db:
+        base = _buscar_base(db, cliente_unico)
 
     if not base:
         return jsonify({"ok": False, "error": "no-encontrado"}), 404
@@ -302,6 +318,38 @@ def api_datos_cliente():
     )
 
 
+@registros_bp.post("/api/datos_clientes")
+def api_datos_clientes():
+    """
+    Consulta en lote. Cuerpo JSON: {"clientes": ["CU1", "CU2", ...]} (o la lista sola).
+    Responde {"ok": true, "data": {"CU1": {...}, "CU2": null, ...}} con las claves tal
+    como llegaron; null = no existe en la base del día.
+    """
+    if not require_agent():
+        return jsonify({"ok": False, "error": "no-auth"}), 401
+
+    body = request.get_json(silent=True)
+    claves = body.get("clientes") if isinstance(body, dict) else body
+    if not isinstance(claves, list) or not all(isinstance(c, str) for c in claves):
+        return jsonify({"ok": False, "error": "se-espera-lista"}), 400
+    limite = current_app.config["DATOS_CLIENTES_MAX"]
+    if len(claves) > limite:
+        return jsonify({"ok": False, "error": "demasiadas-claves", "max": limite}), 413
+
+    with session_lectura() as db:
+        encontrados = buscar_bases(db, claves)
+
+    data = {c: encontrados.get(normalizar_cliente_unico(c)) for c in claves}
+    return jsonify(
+        {
+            "ok": True,
+            "data": data,
+            "encontrados": sum(v is not None for v in data.values()),
+            "faltantes": sum(v is None for v in data.values()),
+        }
+    )
+
+
 @registros_bp.post("/buscar_cliente")
 def buscar_cliente():
     """Compatibilidad con la búsqueda legacy via POST."""
@@ -312,8 +360,8 @@ def buscar_cliente():
     if not cliente_unico:
         return {"ok": False, "error": "cliente_unico vacío"}, 400
 
-    with SessionLocal() as db:
-        base = db.query(BaseGeneral).filter(BaseGeneral.cliente_unico == cliente_unico).first()
+    with session_lectura() as db:
+        base = _buscar_base(db, cliente_unico)
 
     if not base:
         return {"ok": False, "error": "Cliente no encontrado en base del día"}, 404
@@ -372,22 +420,22 @@ def crear():
         return redirect(url_for("registros.nuevo"))
 
     with SessionLocal() as db:
-        base = db.query(BaseGeneral).filter(BaseGeneral.cliente_unico == cliente_unico).first()
+        base = _buscar_base(db, cliente_unico)
         if not base:
             flash("Cliente no existe en la base del día", "danger")
             return redirect(url_for("registros.nuevo"))
 
         # archivos
         try:
-            archivo_convenio = _save_upload(files.get("archivo_convenio"))
-            archivo_pago = _save_upload(files.get("archivo_pago"))
-            archivo_gestion = _save_upload(files.get("archivo_gestion"))
+            archivo_convenio = _save_upload(files.get("archivo_convenio"), db)
+            archivo_pago = _save_upload(files.get("archivo_pago"), db)
+            archivo_gestion = _save_upload(files.get("archivo_gestion"), db)
         except Exception as exc:
             flash(f"Error en archivos: {exc}", "danger")
             return redirect(url_for("registros.nuevo"))
 
         registro = Registro(
-            cliente_unico=cliente_unico,
+            cliente_unico=base.cliente_unico,
             tipo_convenio_id=tipo_convenio_id_int,
             boca_cobranza_id=boca_cobranza_id_int,
             fecha_promesa=fecha_promesa or date.today(),
@@ -405,8 +453,13 @@ def crear():
         _aplicar_snapshot(registro, base)
 
         db.add(registro)
+        db.flush()  # creado_en (año del resumen)
+        resumen_semanal.mover(db, None, resumen_semanal.aporte(registro))
+        cambios = bitacora.diff(None, bitacora.snapshot(registro))
         db.commit()
 
+    bitacora.registrar(registro.id, "CREAR", cambios, user_id)
+    marcar_escritura()
     flash("Registro creado", "success")
     return redirect(url_for("registros.listado"))
 
@@ -459,45 +512,48 @@ def actualizar(registro_id: int):
             abort(404)
         if role == "agente" and registro.creado_por != user_id:
             abort(403)
+        aporte_antes = resumen_semanal.aporte(registro)
+        campos_antes = bitacora.snapshot(registro)
 
-        base = db.query(BaseGeneral).filter(BaseGeneral.cliente_unico == cliente_unico).first()
+        base = _buscar_base(db, cliente_unico)
         if not base:
             flash("Cliente no existe en la base del día", "danger")
             return redirect(url_for("registros.editar", registro_id=registro_id))
 
         # archivos nuevos
         try:
-            nuevo_convenio = _save_upload(files.get("archivo_convenio"))
-            nuevo_pago = _save_upload(files.get("archivo_pago"))
-            nueva_gestion = _save_upload(files.get("archivo_gestion"))
+            nuevo_convenio = _save_upload(files.get("archivo_convenio"), db)
+            nuevo_pago = _save_upload(files.get("archivo_pago"), db)
+            nueva_gestion = _save_upload(files.get("archivo_gestion"), db)
         except Exception as exc:
             flash(f"Error en archivos: {exc}", "danger")
             return redirect(url_for("registros.editar", registro_id=registro_id))
 
         # flags de borrado
         if form.get("eliminar_archivo_convenio") == "1":
-            _delete_file(registro.archivo_convenio)
+            _delete_file(registro.archivo_convenio, db)
             registro.archivo_convenio = None
         if form.get("eliminar_archivo_pago") == "1":
-            _delete_file(registro.archivo_pago)
+            _delete_file(registro.archivo_pago, db)
             registro.archivo_pago = None
         if form.get("eliminar_archivo_gestion") == "1":
-            _delete_file(registro.archivo_gestion)
+            _delete_file(registro.archivo_gestion, db)
             registro.archivo_gestion = None
 
         # aplicar nuevos archivos
         if nuevo_convenio:
-            _delete_file(registro.archivo_convenio)
+            _delete_file(registro.archivo_convenio, db)
             registro.archivo_convenio = nuevo_convenio
         if nuevo_pago:
-            _delete_file(registro.archivo_pago)
+            _delete_file(registro.archivo_pago, db)
             registro.archivo_pago = nuevo_pago
         if nueva_gestion:
-            _delete_file(registro.archivo_gestion)
+            _delete_file(registro.archivo_gestion, db)
             registro.archivo_gestion = nueva_gestion
 
         # campos
-        registro.cliente_unico = cliente_unico
+        registro.cliente_unico = base.cliente_unico
+        registro.cliente_unico_norm = base.cliente_unico_norm
         registro.tipo_convenio_id = tipo_convenio_id_int
         registro.boca_cobranza_id = boca_cobranza_id_int
         registro.fecha_promesa = fecha_promesa or registro.fecha_promesa
@@ -509,16 +565,64 @@ def actualizar(registro_id: int):
         registro.notas = notas or None
         _aplicar_snapshot(registro, base)
 
+        resumen_semanal.mover(db, aporte_antes, resumen_semanal.aporte(registro))
+        cambios = bitacora.diff(campos_antes, bitacora.snapshot(registro))
         db.commit()
 
+    bitacora.registrar(registro_id, "EDITAR", cambios, user_id)
+    marcar_escritura()
     flash("Registro actualizado", "success")
     return redirect(url_for("registros.listado"))
 
 
+# ----------------- Importación masiva (CSV) -----------------
+@registros_bp.get("/importar")
+def importar():
+    if not require_supervisor():
+        return redirect(url_for("auth.login"))
+    return render_template("registros_importar.html", resultado=None)
+
+
+@registros_bp.post("/importar")
+def importar_post():
+    if not require_supervisor():
+        return redirect(url_for("auth.login"))
+
+    f = request.files.get("archivo")
+    if not f or not f.filename:
+        flash("Selecciona un archivo CSV.", "warning")
+        return redirect(url_for("registros.importar"))
+    if not f.filename.lower().endswith(".csv"):
+        flash("Solo se aceptan archivos .csv", "danger")
+        return redirect(url_for("registros.importar"))
+
+    try:
+        resultado = importar_registros_csv(f.stream, session.get("user_id"))
+    except ValueError as exc:
+        flash(str(exc), "danger")
+        return redirect(url_for("registros.importar"))
+
+    if resultado["insertados"]:
+        marcar_escritura()
+    flash(
+        f"Importados {resultado['insertados']} de {resultado['total']} registros; "
+        f"{resultado['n_errores']} con error.",
+        "success" if not resultado["n_errores"] else "warning",
+    )
+    return render_template("registros_importar.html", resultado=resultado)
+
+
 # ----------------- Servir archivo (protegido) -----------------
 @registros_bp.get("/file/<string:fname>")
 def get_file(fname: str):
-    """Sirve un archivo desde UPLOAD_FOLDER; requiere sesión activa."""
+    """
+    Sirve un archivo desde UPLOAD_FOLDER; requiere sesión activa.
+    ?v=web|thumb sirve la copia liviana si ya existe (si no, el original).
+
+    Los archivos nunca cambian bajo el mismo nombre (clave SHA-256 o uuid), así
+    que se cachean como `private, immutable` con ETag fuerte; send_file
+    responde 304 a If-None-Match y 206 a peticiones Range (PDFs grandes).
+    """
     if not session.get("user_id"):
         return redirect(url_for("auth.login"))
 
@@ -526,10 +630,40 @@ def get_file(fname: str):
         abort(400)
 
     base = current_app.config["UPLOAD_FOLDER"]
-    full = os.path.join(base, fname)
+    full = evidencias.ruta(base, fname)
     if not os.path.isfile(full):
         abort(404)
-    return send_from_directory(base, fname, as_attachment=False)
+
+    # clave del almacén => el hash ya es un ETag fuerte; nombres viejos: el de werkzeug
+    etag = fname.split(".", 1)[0] if evidencias.es_clave(fname) else True
+    immutable = True
+
+    variante = request.args.get("v")
+    if variante in evidencias.VARIANTES:
+        derivado = evidencias.ruta_variante(base, fname, variante)
+        if os.path.isfile(derivado):
+            full = derivado
+            if etag is not True:
+                etag = f"{etag}-{variante}"
+        else:
+            # aún no hay copia: se sirve el original sin fijarlo en caché bajo esta URL
+            immutable = False
+
+    resp = send_from_directory(
+        os.path.dirname(full),
+        os.path.basename(full),
+        as_attachment=False,
+        etag=etag,
+        conditional=True,
+        max_age=ARCHIVO_MAX_AGE if immutable else 0,
+    )
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    if immutable:
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
 
 
 # ----------------- Resumen por semana (agente) -----------------
@@ -541,44 +675,27 @@ def resumen():
     semana = request.args.get("semana", type=int)
     user_id = session.get("user_id")
 
-    with SessionLocal() as db:
-        q = (
-            db.query(Registro)
-            .options(
-                selectinload(Registro.tipo_convenio),
-                selectinload(Registro.boca_cobranza),
-            )
-            .filter(Registro.creado_por == user_id)
-        )
+    with session_lectura() as db:
+        totales = resumen_agregado(db, user_id=user_id, semana=semana)
+
+        # detalle paginado aparte (mismo cursor que el listado)
+        q = consulta_listado(db).filter(Registro.creado_por == user_id)
         if semana:
             q = q.filter(Registro.semana == semana)
-        registros = q.order_by(Registro.id.desc()).all()
-
-    total = len(registros)
-    total_pagos_inicial = Decimal("0")
-    total_pagos_semanal = Decimal("0")
-    por_tipo: dict[str, int] = {}
-    por_boca: dict[str, int] = {}
-
-    for r in registros:
-        t = r.tipo_convenio.nombre if r.tipo_convenio else "(s/tipo)"
-        b = r.boca_cobranza.nombre if r.boca_cobranza else "(s/boca)"
-        por_tipo[t] = por_tipo.get(t, 0) + 1
-        por_boca[b] = por_boca.get(b, 0) + 1
-        if r.pago_inicial:
-            total_pagos_inicial += r.pago_inicial
-        if r.pago_semanal:
-            total_pagos_semanal += r.pago_semanal
+        registros, next_cursor, prev_cursor = paginar_keyset(
+            q,
+            after=request.args.get("after", type=int),
+            before=request.args.get("before", type=int),
+            fila=FilaListado,
+        )
 
     return render_template(
         "registros_resumen.html",
         registros=registros,
         semana=semana,
-        total=total,
-        por_tipo=por_tipo,
-        por_boca=por_boca,
-        total_pagos_inicial=total_pagos_inicial,
-        total_pagos_semanal=total_pagos_semanal,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
         role=session.get("role"),
         user_id=user_id,
+        **totales,
     )
@@ -0,0 +1,250 @@
+# blueprints/registros/services.py
+"""Consultas de lectura del blueprint de registros (filtros + paginación)."""
+from __future__ import annotations
+
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from models import BaseGeneral, Registro, ResumenSemanal, TipoConvenio, BocaCobranza
+from services.upsert import batch_rows
+from utils.claves import normalizar_cliente_unico
+
+# Tamaño de página del listado
+PAGE_SIZE = 50
+
+
+def _int_arg(args, name: str) -> int | None:
+    try:
+        return int(args.get(name) or "")
+    except ValueError:
+        return None
+
+
+def _date_arg(args, name: str) -> date | None:
+    raw = (args.get(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        return None
+
+
+def parse_filtros(args) -> dict:
+    """Lee los filtros del querystring; los valores inválidos se ignoran."""
+    semana = _int_arg(args, "semana")
+    if semana is not None and not (1 <= semana <= 53):
+        semana = None
+    return {
+        "semana": semana,
+        "fecha_desde": _date_arg(args, "fecha_desde"),
+        "fecha_hasta": _date_arg(args, "fecha_hasta"),
+        "tipo_convenio_id": _int_arg(args, "tipo_convenio_id"),
+        "boca_cobranza_id": _int_arg(args, "boca_cobranza_id"),
+        "cliente_unico": normalizar_cliente_unico(args.get("cliente_unico")) or None,
+    }
+
+
+def filtros_querystring(filtros: dict) -> dict:
+    """Filtros activos como parámetros para url_for (fechas en ISO)."""
+    qs = {}
+    for key, value in filtros.items():
+        if value is None:
+            continue
+        qs[key] = value.isoformat() if isinstance(value, date) else value
+    return qs
+
+
+def aplicar_filtros(q, filtros: dict):
+    if filtros.get("semana") is not None:
+        q = q.filter(Registro.semana == filtros["semana"])
+    if filtros.get("fecha_desde") is not None:
+        q = q.filter(Registro.fecha_promesa >= filtros["fecha_desde"])
+    if filtros.get("fecha_hasta") is not None:
+        q = q.filter(Registro.fecha_promesa <= filtros["fecha_hasta"])
+    if filtros.get("tipo_convenio_id") is not None:
+        q = q.filter(Registro.tipo_convenio_id == filtros["tipo_convenio_id"])
+    if filtros.get("boca_cobranza_id") is not None:
+        q = q.filter(Registro.boca_cobranza_id == filtros["boca_cobranza_id"])
+    if filtros.get("cliente_unico"):
+        q = q.filter(Registro.cliente_unico_norm == filtros["cliente_unico"])
+    return q
+
+
+# ---------------------------------------------------------------------------
+# Proyecciones de lectura: sólo las columnas que pinta cada vista, en tuplas
+# con nombre (sin identity map ni relaciones) y los nombres de catálogo en el
+# mismo SELECT => una consulta por página.
+# ---------------------------------------------------------------------------
+_COLS_LISTADO = (
+    "id",
+    "cliente_unico",
+    "nombre_cte_snap",
+    "fecha_promesa",
+    "semana",
+    "pago_inicial",
+    "pago_semanal",
+    "duracion_semanas",
+    "archivo_convenio",
+    "archivo_pago",
+    "archivo_gestion",
+    "creado_por",
+    "creado_en",
+)
+FilaListado = namedtuple("FilaListado", _COLS_LISTADO + ("tipo_convenio_nombre", "boca_cobranza_nombre"))
+
+# Formulario de edición: todo lo que pinta registros_nuevo.html
+_COLS_EDICION = (
+    "id",
+    "cliente_unico",
+    "nombre_cte_snap",
+    "gerencia_snap",
+    "producto_snap",
+    "fidiapago_snap",
+    "gestion_desc_snap",
+    "tipo_convenio_id",
+    "boca_cobranza_id",
+    "fecha_promesa",
+    "telefono",
+    "semana",
+    "pago_inicial",
+    "pago_semanal",
+    "duracion_semanas",
+    "notas",
+    "archivo_convenio",
+    "archivo_pago",
+    "archivo_gestion",
+    "creado_por",
+)
+FilaEdicion = namedtuple("FilaEdicion", _COLS_EDICION)
+
+
+def consulta_listado(db):
+    """Query de FilaListado para listado/resumen (aplicar filtros y paginar_keyset encima)."""
+    return (
+        db.query(
+            *(getattr(Registro, c) for c in _COLS_LISTADO),
+            TipoConvenio.nombre,
+            BocaCobranza.nombre,
+        )
+        .select_from(Registro)
+        .outerjoin(TipoConvenio, TipoConvenio.id == Registro.tipo_convenio_id)
+        .outerjoin(BocaCobranza, BocaCobranza.id == Registro.boca_cobranza_id)
+    )
+
+
+def cargar_edicion(db, registro_id: int) -> FilaEdicion | None:
+    row = (
+        db.query(*(getattr(Registro, c) for c in _COLS_EDICION))
+        .filter(Registro.id == registro_id)
+        .first()
+    )
+    return FilaEdicion._make(row) if row else None
+
+
+def paginar_keyset(q, *, after: int | None = None, before: int | None = None,
+                   limit: int = PAGE_SIZE, fila=None):
+    """
+    Paginación por cursor sobre Registro.id (más recientes primero).
+    - after:  ids menores al cursor (página siguiente)
+    - before: ids mayores al cursor (página anterior)
+    Devuelve (filas, cursor_siguiente, cursor_anterior); un cursor es None si no hay más.
+    Cada página cuesta lo mismo sin importar qué tan atrás esté (sin OFFSET).
+    fila: namedtuple a la que se convierte cada fila (consultas por columnas).
+    """
+    if before is not None:
+        rows = q.filter(Registro.id > before).order_by(Registro.id.asc()).limit(limit + 1).all()
+        hay_mas_nuevos = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        if fila is not None:
+            rows = [fila._make(r) for r in rows]
+        prev_cursor = rows[0].id if (rows and hay_mas_nuevos) else None
+        next_cursor = rows[-1].id if rows else None
+        return rows, next_cursor, prev_cursor
+
+    if after is not None:
+        q = q.filter(Registro.id < after)
+    rows = q.order_by(Registro.id.desc()).limit(limit + 1).all()
+    hay_mas_viejos = len(rows) > limit
+    rows = rows[:limit]
+    if fila is not None:
+        rows = [fila._make(r) for r in rows]
+    next_cursor = rows[-1].id if (rows and hay_mas_viejos) else None
+    prev_cursor = rows[0].id if (rows and after is not None) else None
+    return rows, next_cursor, prev_cursor
+
+
+def resumen_agregado(db, *, user_id: int, semana: int | None = None) -> dict:
+    """
+    Totales del resumen leídos de resumen_semanal (ver services.resumen_semanal):
+    a lo más una fila por (año, tipo, boca) de la semana, sin tocar registros.
+    """
+    q = (
+        db.query(
+            TipoConvenio.nombre,
+            BocaCobranza.nombre,
+            func.sum(ResumenSemanal.registros),
+            func.sum(ResumenSemanal.suma_pago_inicial),
+            func.sum(ResumenSemanal.suma_pago_semanal),
+        )
+        .select_from(ResumenSemanal)
+        .outerjoin(TipoConvenio, TipoConvenio.id == ResumenSemanal.tipo_convenio_id)
+        .outerjoin(BocaCobranza, BocaCobranza.id == ResumenSemanal.boca_cobranza_id)
+        .filter(ResumenSemanal.creado_por == user_id)
+    )
+    if semana:
+        q = q.filter(ResumenSemanal.semana == semana)
+    q = q.group_by(TipoConvenio.nombre, BocaCobranza.nombre)
+
+    total = 0
+    total_pagos_inicial = Decimal("0")
+    total_pagos_semanal = Decimal("0")
+    por_tipo: dict[str, int] = {}
+    por_boca: dict[str, int] = {}
+    for tipo, boca, n, suma_inicial, suma_semanal in q.all():
+        t = tipo or "(s/tipo)"
+        b = boca or "(s/boca)"
+        n = int(n or 0)
+        por_tipo[t] = por_tipo.get(t, 0) + n
+        por_boca[b] = por_boca.get(b, 0) + n
+        total += n
+        total_pagos_inicial += Decimal(suma_inicial or 0)
+        total_pagos_semanal += Decimal(suma_semanal or 0)
+
+    return {
+        "total": total,
+        "total_pagos_inicial": total_pagos_inicial,
+        "total_pagos_semanal": total_pagos_semanal,
+        "por_tipo": dict(sorted(por_tipo.items())),
+        "por_boca": dict(sorted(por_boca.items())),
+    }
+
+
+# Columnas que devuelven las APIs de datos del cliente
+CAMPOS_CLIENTE = ("nombre_cte", "gerencia", "producto", "fidiapago", "gestion_desc")
+
+
+def buscar_bases(db, claves) -> dict[str, dict]:
+    """
+    Datos de varios clientes con consultas IN por bloques (index seek sobre
+    uq_bg_cu_norm, sólo las columnas necesarias). Devuelve {clave normalizada: datos};
+    las claves que no existen no aparecen.
+    """
+    normas = sorted({normalizar_cliente_unico(c) for c in claves} - {""})
+    cols = [getattr(BaseGeneral, c) for c in CAMPOS_CLIENTE]
+    tam = batch_rows(db.get_bind().dialect.name, 1)
+    out: dict[str, dict] = {}
+    for i in range(0, len(normas), tam):
+        bloque = normas[i:i + tam]
+        filas = (
+            db.query(BaseGeneral.cliente_unico_norm, BaseGeneral.cliente_unico, *cols)
+            .filter(BaseGeneral.cliente_unico_norm.in_(bloque))
+        )
+        for norm, cu, *valores in filas:
+            datos = {"cliente_unico": cu}
+            datos.update((c, v or "") for c, v in zip(CAMPOS_CLIENTE, valores))
+            out[norm] = datos
+    return out
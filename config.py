@@ -35,6 +35,17 @@ class Config:
     # --- SQLAlchemy ---
     SQLALCHEMY_DATABASE_URI = _db_url()
 
+    # Réplica de lectura opcional (listado, resumen, export, autocomplete).
+    # Sin definir, todo va a la base principal.
+    SQLALCHEMY_REPLICA_URI = os.getenv("SQLALCHEMY_REPLICA_URI") or os.getenv("DATABASE_REPLICA_URL")
+    # Segundos tras una escritura del usuario en que sus lecturas van a la
+    # principal (lee lo que acaba de escribir aunque la réplica tenga retraso).
+    REPLICA_RYW_SEGUNDOS = int(os.getenv("REPLICA_RYW_SEGUNDOS", "10"))
+
+    # Aplica sql/migraciones pendientes al arrancar (services.migraciones).
+    # Con AUTO_MIGRAR=0 se corren a mano: python scripts/apply_schema.py
+    AUTO_MIGRAR = os.getenv("AUTO_MIGRAR", "1").lower() not in ("0", "false", "no")
+
     # --- Uploads ---
     # Si existe UPLOAD_FOLDER en el entorno (p. ej. /var/tmp/uploads en Render), se usa.
     # Si no, cae a static/uploads dentro del proyecto.
@@ -48,3 +59,45 @@ class Config:
 
     # Extensiones permitidas (ajústalas si necesitas otras)
     ALLOWED_EXTENSIONS = {"pdf", "jpg", "jpeg", "png"}
+
+    # Copias web / miniaturas de evidencias (lado mayor en px, calidad JPEG)
+    EVIDENCIA_WEB_MAX = int(os.getenv("EVIDENCIA_WEB_MAX", "1600"))
+    EVIDENCIA_THUMB_MAX = int(os.getenv("EVIDENCIA_THUMB_MAX", "240"))
+    EVIDENCIA_JPEG_QUALITY = int(os.getenv("EVIDENCIA_JPEG_QUALITY", "80"))
+
+    # --- Autocomplete ---
+    # Cada cuántos segundos un worker revisa si cambió la versión de base_general
+    # para reconstruir su índice en memoria de cliente_unico (cada worker de
+    # gunicorn tiene su propia copia).
+    CLIENTE_INDEX_CHECK = int(os.getenv("CLIENTE_INDEX_CHECK", "30"))
+    # Búsqueda por nombre/gerencia (índice de trigramas en memoria, services.nombre_index).
+    # Ocupa más RAM que el de cliente_unico; NOMBRE_INDEX=0 lo apaga (la búsqueda cae a
+    # la BD: sólo prefijo exacto de nombre_cte; distingue acentos y no tolera errores).
+    NOMBRE_INDEX = os.getenv("NOMBRE_INDEX", "1").lower() not in ("0", "false", "no")
+    # Cada cuántos segundos revisa la versión de base_general (como CLIENTE_INDEX_CHECK).
+    NOMBRE_INDEX_CHECK = int(os.getenv("NOMBRE_INDEX_CHECK", "30"))
+    # Máximo de claves por petición a /registros/api/datos_clientes (consulta en lote).
+    DATOS_CLIENTES_MAX = int(os.getenv("DATOS_CLIENTES_MAX", "5000"))
+
+    # --- Cargas de base_general ---
+    # Hilos por proceso que procesan cargas en segundo plano.
+    CARGAS_WORKERS = int(os.getenv("CARGAS_WORKERS", "1"))
+    # Cada cuántos segundos la carga en proceso marca que sigue viva, y tras
+    # cuántos sin latido se considera huérfana (su worker murió) y se reencola.
+    CARGAS_LATIDO_SEGUNDOS = int(os.getenv("CARGAS_LATIDO_SEGUNDOS", "30"))
+    CARGAS_COLGADA_SEGUNDOS = int(os.getenv("CARGAS_COLGADA_SEGUNDOS", "300"))
+
+    # --- Bitácora de registros (services.bitacora) ---
+    # Cambios en cola por proceso; si se llena, los nuevos se descartan con aviso.
+    BITACORA_MAX_PENDIENTES = int(os.getenv("BITACORA_MAX_PENDIENTES", "10000"))
+    # Filas por INSERT y segundos máximos que un cambio espera en la cola.
+    BITACORA_LOTE = int(os.getenv("BITACORA_LOTE", "200"))
+    BITACORA_INTERVALO = float(os.getenv("BITACORA_INTERVALO", "2.0"))
+
+    # --- Catálogos ---
+    # Cada cuántos segundos un worker revisa si cambió la versión de catálogos.
+    CATALOGO_CACHE_CHECK = int(os.getenv("CATALOGO_CACHE_CHECK", "30"))
+
+    # --- Métricas ---
+    # Si se define, /metrics exige "Authorization: Bearer <METRICS_TOKEN>".
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
@@ -1,8 +1,11 @@
 # db.py
 import os
-from sqlalchemy import create_engine, inspect, text
-from sqlalchemy.exc import SQLAlchemyError
+import threading
+import time
+
+from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 from config import Config
 
 # ----- TLS / CA -----
@@ -17,14 +20,13 @@ CA_PATH = os.getenv("DB_SSL_CA", DEFAULT_CA)
 def _with_local_infile(url: str) -> str:
     return url + ("&" if "?" in url else "?") + "local_infile=1"
 
-engine = create_engine(
-    Config.SQLALCHEMY_DATABASE_URI,
-    pool_pre_ping=True,          # verifica conexiones antes de usarlas
-    pool_recycle=280,            # recicla antes de que el server cierre por inactividad
-    pool_size=3,                 # pools pequeños para serverless
-    max_overflow=2,              # picos controlados
-    future=True,                 # estilo 2.0
-    connect_args={
+
+def _connect_args(url: str) -> dict:
+    """Argumentos del driver; TLS/timeouts sólo aplican a PyMySQL (MySQL/TiDB)."""
+    if not url.startswith("mysql"):
+        # SQLite/Postgres (p. ej. DATABASE_URL local o de Render)
+        return {}
+    return {
         # TLS obligatorio para TiDB Serverless:
         "ssl": {"ca": CA_PATH},
         # (Opcional) timeouts de PyMySQL:
@@ -32,7 +34,82 @@ engine = create_engine(
         "read_timeout": 60,
         "write_timeout": 60,
         "local_infile": 1,
-    },
+    }
+
+
+# ----- Espera por conexión del pool (la leen services.metrics y bench/carga.py) -----
+_medicion = threading.local()
+
+
+class PoolMedido(QueuePool):
+    """
+    QueuePool que mide cuánto espera cada checkout por un lugar libre en el
+    pool, SIN contar la apertura de conexiones DBAPI nuevas (handshake TLS con
+    TiDB), y se lo pasa a las funciones registradas con observar_espera_pool()
+    como fn(nombre_engine, segundos). Es una subclase (no un parche sobre la
+    instancia), así que sobrevive a engine.dispose() / pool.recreate().
+    """
+    observadores: list = []
+
+    def _do_get(self):
+        if getattr(_medicion, "activa", False):
+            return super()._do_get()  # reintento interno de QueuePool
+        _medicion.activa = True
+        _medicion.abrir = 0.0
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            espera = max(0.0, time.perf_counter() - t0 - _medicion.abrir)
+            _medicion.activa = False
+            for fn in self.observadores:
+                try:
+                    fn(self._orig_logging_name, espera)
+                except Exception as exc:
+                    print("[WARN] Observador de espera del pool falló:", exc)
+
+    def _create_connection(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            _medicion.abrir = getattr(_medicion, "abrir", 0.0) + time.perf_counter() - t0
+
+
+def observar_espera_pool(fn) -> None:
+    """Registra fn(nombre_engine, segundos) para cada checkout de un PoolMedido."""
+    if fn not in PoolMedido.observadores:
+        PoolMedido.observadores.append(fn)
+
+
+def _poolclass(url: str):
+    """SQLite en memoria usa SingletonThreadPool; todo lo demás, el QueuePool medido."""
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        return None
+    return PoolMedido
+
+
+def _make_engine(url: str, nombre: str):
+    poolclass = _poolclass(url)
+    extra = {"poolclass": poolclass} if poolclass else {}
+    return create_engine(
+        url,
+        pool_logging_name=nombre,    # etiqueta `engine` de las métricas del pool
+        pool_pre_ping=True,          # verifica conexiones antes de usarlas
+        pool_recycle=280,            # recicla antes de que el server cierre por inactividad
+        pool_size=3,                 # pools pequeños para serverless
+        max_overflow=2,              # picos controlados
+        future=True,                 # estilo 2.0
+        connect_args=_connect_args(url),
+        **extra,
+    )
+
+
+engine = _make_engine(Config.SQLALCHEMY_DATABASE_URI, "principal")
+
+# Réplica de lectura opcional (ver services.lecturas); None => sólo principal
+replica_engine = (
+    _make_engine(Config.SQLALCHEMY_REPLICA_URI, "replica") if Config.SQLALCHEMY_REPLICA_URI else None
 )
 
 # Fábrica de sesiones para usar con "with SessionLocal() as db:"
@@ -44,36 +121,15 @@ SessionLocal = sessionmaker(
     future=True,
 )
 
+# Sesiones de sólo lectura contra la réplica (o la principal si no hay réplica)
+ReplicaSessionLocal = sessionmaker(
+    bind=replica_engine or engine,
+    expire_on_commit=False,
+    autoflush=False,
+    autocommit=False,
+    future=True,
+)
+
 # Base declarativa para tus modelos
 Base = declarative_base()
 
-
-def ensure_latest_schema() -> None:
-    """Aplica ajustes mínimos al esquema si faltan columnas nuevas."""
-    try:
-        with engine.begin() as conn:
-            inspector = inspect(conn)
-            if "registros" not in inspector.get_table_names():
-                return
-
-            existing = {col["name"] for col in inspector.get_columns("registros")}
-            statements: list[str] = []
-
-            if "pago_inicial" not in existing:
-                statements.append(
-                    "ALTER TABLE registros ADD COLUMN pago_inicial DECIMAL(12,2) NULL"
-                )
-            if "pago_semanal" not in existing:
-                statements.append(
-                    "ALTER TABLE registros ADD COLUMN pago_semanal DECIMAL(12,2) NULL"
-                )
-            if "duracion_semanas" not in existing:
-                statements.append(
-                    "ALTER TABLE registros ADD COLUMN duracion_semanas INT NULL"
-                )
-
-            for statement in statements:
-                conn.execute(text(statement))
-    except SQLAlchemyError as exc:
-        # Deja el warning pero ahora irá por TLS y no debería fallar por transporte inseguro
-        print("[WARN] No se pudo aplicar la migración automática de registros:", exc)
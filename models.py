@@ -1,10 +1,11 @@
 from datetime import datetime, date
 from decimal import Decimal
 
-from sqlalchemy import Integer, String, Date, DateTime, Text, ForeignKey, Numeric
+from sqlalchemy import BigInteger, Integer, String, Date, DateTime, Text, ForeignKey, Numeric, Index, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from db import Base
+from utils.claves import normalizar_cliente_unico
 
 # --- Usuarios ---
 class Usuario(Base):
@@ -29,22 +30,104 @@ class BocaCobranza(Base):
     nombre: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
     activo: Mapped[int] = mapped_column(Integer, default=1)
 
+# --- Versiones de cachés por proceso (catálogos, etc.) ---
+class CacheVersion(Base):
+    __tablename__ = "cache_versiones"
+    clave: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
 # --- Base General ---
 class BaseGeneral(Base):
     __tablename__ = "base_general"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     cliente_unico: Mapped[str] = mapped_column(String(100), index=True, nullable=False, unique=True)
+    # UPPER(TRIM(cliente_unico)); clave de todas las búsquedas y joins
+    cliente_unico_norm: Mapped[str] = mapped_column(
+        String(100),
+        nullable=False,
+        unique=True,
+        default=lambda ctx: normalizar_cliente_unico(ctx.get_current_parameters().get("cliente_unico")),
+    )
     nombre_cte: Mapped[str | None] = mapped_column(String(255), nullable=True)
     gerencia: Mapped[str | None] = mapped_column(String(255), nullable=True)
     producto: Mapped[str | None] = mapped_column(String(255), nullable=True)
     fidiapago: Mapped[str | None] = mapped_column(String(255), nullable=True)
     gestion_desc: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # MD5 del contenido (ver services.csv_ingest.hash_contenido) para upserts sólo-cambios
+    hash_contenido: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    actualizado_en: Mapped[datetime | None] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True
+    )
+
+# --- Cargas de base_general en segundo plano ---
+class CargaBase(Base):
+    __tablename__ = "cargas_base"
+    __table_args__ = (Index("idx_cargas_estado", "estado"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    archivo: Mapped[str] = mapped_column(String(500), nullable=False)
+    nombre_original: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    modo: Mapped[str] = mapped_column(String(20), nullable=False, default="upsert")
+    # pendiente | procesando | terminado | error
+    estado: Mapped[str] = mapped_column(String(20), nullable=False, default="pendiente")
+    total_estimado: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    procesadas: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    insertados: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    actualizados: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    sin_cambios: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    mensaje: Mapped[str | None] = mapped_column(Text, nullable=True)
+    creado_por: Mapped[int | None] = mapped_column(Integer, ForeignKey("usuarios.id"), nullable=True)
+    creado_en: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    iniciado_en: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # latido del worker que la procesa (ver services.cargas.recuperar_colgadas)
+    actualizado_en: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    terminado_en: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+# --- Evidencias (almacén direccionado por contenido, ver services.evidencias) ---
+class Evidencia(Base):
+    __tablename__ = "evidencias"
+    # "<sha256>.<ext>"; es lo que guardan registros.archivo_*
+    clave: Mapped[str] = mapped_column(String(80), primary_key=True)
+    refcount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    tamano: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    nombre_original: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    creado_en: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+# --- Resumen semanal (agregado incremental de registros, ver services.resumen_semanal) ---
+class ResumenSemanal(Base):
+    __tablename__ = "resumen_semanal"
+    __table_args__ = (Index("idx_rs_user_semana", "creado_por", "semana"),
+                      Index("idx_rs_semana", "semana"))
+    # año de captura (creado_en); semana 0 = registros sin semana
+    anio: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    semana: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    creado_por: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    tipo_convenio_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    boca_cobranza_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    registros: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    suma_pago_inicial: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    suma_pago_semanal: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
 
 # --- Registros ---
 class Registro(Base):
     __tablename__ = "registros"
+    # índices compuestos para la paginación por cursor del listado
+    __table_args__ = (
+        Index("idx_reg_user_id", "creado_por", "id"),
+        Index("idx_reg_user_semana_id", "creado_por", "semana", "id"),
+        Index("idx_reg_semana_id", "semana", "id"),
+        Index("idx_reg_fecha_promesa", "fecha_promesa", "id"),
+        Index("idx_reg_tc_id", "tipo_convenio_id", "id"),
+        Index("idx_reg_bc_id", "boca_cobranza_id", "id"),
+        Index("idx_reg_cu_norm", "cliente_unico_norm", "id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     cliente_unico: Mapped[str] = mapped_column(String(100), index=True, nullable=False)
+    # UPPER(TRIM(cliente_unico)); lo usa el filtro por cliente del listado
+    cliente_unico_norm: Mapped[str] = mapped_column(
+        String(100),
+        nullable=False,
+        default=lambda ctx: normalizar_cliente_unico(ctx.get_current_parameters().get("cliente_unico")),
+    )
 
     # snapshot (opcionales)
     nombre_cte_snap: Mapped[str | None] = mapped_column(String(255), nullable=True)
@@ -74,9 +157,23 @@ class Registro(Base):
     creado_por: Mapped[int] = mapped_column(Integer, ForeignKey("usuarios.id"), nullable=False)
     creado_en:  Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
-    # relaciones con eager loading por defecto
-    tipo_convenio: Mapped["TipoConvenio"] = relationship("TipoConvenio", lazy="selectin")
-    boca_cobranza: Mapped["BocaCobranza"] = relationship("BocaCobranza", lazy="selectin")
+    # relaciones perezosas: las vistas leen proyecciones con los nombres de
+    # catálogo ya unidos (blueprints/registros/services.py), así que cargar un
+    # Registro completo (p. ej. al actualizar) no dispara consultas extra
+    tipo_convenio: Mapped["TipoConvenio"] = relationship("TipoConvenio", lazy="select")
+    boca_cobranza: Mapped["BocaCobranza"] = relationship("BocaCobranza", lazy="select")
 
     # opcional: saber quién creó
-    creador: Mapped["Usuario"] = relationship("Usuario", lazy="selectin")
+    creador: Mapped["Usuario"] = relationship("Usuario", lazy="select")
+
+# --- Bitácora de cambios de registros (la escribe services.bitacora en segundo plano) ---
+class BitacoraRegistro(Base):
+    __tablename__ = "bitacora_registro"
+    __table_args__ = (Index("idx_bit_reg", "registro_id"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    registro_id: Mapped[int] = mapped_column(Integer, ForeignKey("registros.id"), nullable=False)
+    accion: Mapped[str] = mapped_column(String(50), nullable=False)  # CREAR | EDITAR
+    # {"campo": [antes, después], ...}
+    cambios_json: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    hecho_por: Mapped[int | None] = mapped_column(Integer, ForeignKey("usuarios.id"), nullable=True)
+    hecho_en: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -1,41 +1,50 @@
 # scripts/apply_schema.py
+"""
+Aplica las migraciones pendientes de sql/migraciones (las mismas que corre la
+app al arrancar; útil con AUTO_MIGRAR=0 o antes de un deploy).
+
+    python scripts/apply_schema.py            # aplica pendientes
+    python scripts/apply_schema.py --estado   # sólo muestra aplicadas / pendientes
+"""
+import argparse
 import os
+import sys
+
 from dotenv import load_dotenv
-import pymysql
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 load_dotenv()
 
-conn = pymysql.connect(
-    host=os.getenv("DB_HOST"),
-    port=int(os.getenv("DB_PORT", "4000")),
-    user=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASSWORD"),
-    database=os.getenv("DB_NAME"),
-    ssl={"ca": os.getenv("DB_SSL_CA")},
-    autocommit=False,
-)
-
-def split_sql(sql_text: str):
-    # Split simple por ';' cuidando líneas en blanco y comentarios básicos.
-    # Esto funciona bien para DDL sencillo (CREATE TABLE, INDEX, etc.).
-    stmts, buff = [], []
-    for line in sql_text.splitlines():
-        l = line.strip()
-        if not l or l.startswith("--"):
-            continue
-        buff.append(line)
-        if l.endswith(";"):
-            stmts.append("\n".join(buff).rstrip(" ;\n\r\t"))
-            buff = []
-    if buff:
-        stmts.append("\n".join(buff).rstrip(" ;\n\r\t"))
-    return [s for s in stmts if s]
-
-with conn.cursor() as cur:
-    with open("sql/init_schema.sql", "r", encoding="utf-8") as f:
-        sql = f.read()
-    for stmt in split_sql(sql):
-        cur.execute(stmt)
-conn.commit()
-conn.close()
-print("Schema aplicado OK (sentencia por sentencia).")
+from db import engine  # noqa: E402
+from services import migraciones  # noqa: E402
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--estado", action="store_true", help="no aplica nada, sólo lista")
+    args = p.parse_args()
+
+    todas = migraciones.listar_migraciones()
+    with engine.connect() as conn:
+        if args.estado:
+            actual = migraciones.version_actual(conn) or 0
+            for m in todas:
+                marca = "aplicada " if m.version <= actual else "pendiente"
+                print(f"  [{marca}] {m.version:04d}_{m.nombre}")
+            return 0
+
+        migraciones._tomar_candado(conn)
+        try:
+            aplicadas = migraciones.migrar(conn, todas)
+        finally:
+            migraciones._soltar_candado(conn)
+            conn.commit()
+    if aplicadas:
+        print("Migraciones aplicadas:", ", ".join(f"{v:04d}" for v in aplicadas))
+    else:
+        print("Esquema al día.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
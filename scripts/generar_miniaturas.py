@@ -0,0 +1,26 @@
+# scripts/generar_miniaturas.py
+"""Genera copia web y miniatura de las evidencias existentes que aún no las tienen."""
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from config import Config  # noqa: E402
+from services.evidencias import Image, generar_faltantes  # noqa: E402
+
+
+def main():
+    if Image is None:
+        print("Pillow no está instalado (pip install Pillow).")
+        return 1
+    base = Config.UPLOAD_FOLDER
+    n = generar_faltantes(base)
+    print(f"✅ Derivados generados para {n} imágenes en {base}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
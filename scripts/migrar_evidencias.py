@@ -0,0 +1,180 @@
+# scripts/migrar_evidencias.py
+"""
+Migra las evidencias planas de UPLOAD_FOLDER (`uuid_nombre.ext`) al almacén por
+contenido (objetos/ab/cd/<sha256>.<ext>) y recalcula los conteos de referencias.
+
+    python scripts/migrar_evidencias.py --dry-run   # sólo muestra qué haría
+    python scripts/migrar_evidencias.py             # migra
+    python scripts/migrar_evidencias.py --gc        # borra objetos sin referencias
+
+--gc borra los objetos que ningún registro referencia y que nadie ha subido
+ni reutilizado en las últimas --gracia-horas (24 por defecto): una subida
+idéntica en curso renueva el mtime del objeto antes de referenciarlo, así que
+se puede correr con capturas en curso (p. ej. con un cron diario).
+
+Orden seguro: copia al almacén -> actualiza registros y refcounts en una sola
+transacción -> sólo tras el commit borra los archivos planos. Si algo falla
+antes del commit, los archivos originales siguen intactos.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from collections import Counter
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from sqlalchemy import delete, select, update  # noqa: E402
+
+from config import Config  # noqa: E402
+from db import SessionLocal  # noqa: E402
+from models import Evidencia, Registro  # noqa: E402
+from services import evidencias  # noqa: E402
+
+COLUMNAS = ("archivo_convenio", "archivo_pago", "archivo_gestion")
+
+
+def _ext(nombre: str) -> str:
+    return nombre.rsplit(".", 1)[-1].lower() if "." in nombre else "bin"
+
+
+def _nombre_original(nombre: str) -> str:
+    # "uuid_nombre.ext" -> "nombre.ext"
+    prefijo, _, resto = nombre.partition("_")
+    return resto if len(prefijo) == 32 and resto else nombre
+
+
+def recalcular_refcounts(db) -> Counter:
+    """Refcount = referencias reales en registros.archivo_* (las claves sin uso quedan en 0)."""
+    refs: Counter = Counter()
+    for col in COLUMNAS:
+        columna = getattr(Registro, col)
+        for (valor,) in db.execute(select(columna).where(columna.is_not(None))):
+            if evidencias.es_clave(valor):
+                refs[valor] += 1
+    existentes = {c: e for c, e in ((e.clave, e) for e in db.scalars(select(Evidencia)))}
+    for clave, n in refs.items():
+        if clave in existentes:
+            existentes[clave].refcount = n
+        else:
+            db.add(Evidencia(clave=clave, refcount=n))
+    for clave, e in existentes.items():
+        if clave not in refs:
+            e.refcount = 0
+    return refs
+
+
+def migrar(base: str, dry_run: bool) -> None:
+    planos = [
+        e.name for e in os.scandir(base)
+        if e.is_file() and not e.name.startswith(".") and not evidencias.es_clave(e.name)
+    ]
+    print(f"Archivos planos: {len(planos)}")
+
+    mapa: dict[str, str] = {}
+    tamanos: dict[str, int] = {}
+    nuevos = 0
+    for nombre in planos:
+        origen = os.path.join(base, nombre)
+        if dry_run:
+            with open(origen, "rb") as fh:
+                h = hashlib.sha256()
+                for chunk in iter(lambda: fh.read(evidencias.CHUNK), b""):
+                    h.update(chunk)
+            clave = f"{h.hexdigest()}.{_ext(nombre)}"
+            nuevo = clave not in mapa.values() and not os.path.exists(evidencias.ruta(base, clave))
+            tamano = os.path.getsize(origen)
+        else:
+            with open(origen, "rb") as fh:
+                clave, nuevo, tamano = evidencias.guardar_contenido(base, fh, _ext(nombre))
+        mapa[nombre] = clave
+        tamanos[clave] = tamano
+        nuevos += int(nuevo)
+
+    unicos = len(set(mapa.values()))
+    print(f"Contenidos distintos: {unicos} (duplicados: {len(mapa) - unicos}, objetos nuevos: {nuevos})")
+    if dry_run:
+        for viejo, clave in sorted(mapa.items()):
+            print(f"  {viejo} -> {clave}")
+        return
+
+    with SessionLocal() as db:
+        for viejo, clave in mapa.items():
+            for col in COLUMNAS:
+                columna = getattr(Registro, col)
+                db.execute(update(Registro).where(columna == viejo).values({col: clave}))
+        refs = recalcular_refcounts(db)
+        db.flush()
+        for viejo, clave in mapa.items():
+            e = db.get(Evidencia, clave)
+            if e is not None:
+                e.tamano = e.tamano or tamanos.get(clave)
+                e.nombre_original = e.nombre_original or _nombre_original(viejo)[:255]
+        db.commit()
+    print(f"Registros actualizados; claves con referencias: {len(refs)}")
+
+    # sólo ahora se borran los planos (y sus derivados viejos) ...
+    for viejo in mapa:
+        evidencias.borrar_fisico(base, viejo)
+    # ... y se generan derivados de los objetos nuevos
+    if evidencias.Image is not None:
+        print(f"Derivados generados: {evidencias.generar_faltantes(base)}")
+
+
+def gc(base: str, dry_run: bool, gracia_horas: float = 24) -> None:
+    """Borra objetos sin referencias fuera del periodo de gracia y temporales huérfanos."""
+    limite = time.time() - gracia_horas * 3600
+    with SessionLocal() as db:
+        refs = recalcular_refcounts(db)
+        candidatos = [n for n in evidencias.iter_evidencias(base) if evidencias.es_clave(n) and n not in refs]
+        print(f"Objetos sin referencias: {len(candidatos)}")
+        if dry_run:
+            for n in candidatos:
+                print("  ", n)
+            db.rollback()
+            return
+        db.commit()
+
+    borrados = []
+    for n in candidatos:
+        if evidencias.recolectar(base, n, limite):
+            borrados.append(n)
+    print(f"Borrados: {len(borrados)} (los demás están dentro del periodo de gracia)")
+    if borrados:
+        with SessionLocal() as db:
+            db.execute(
+                delete(Evidencia).where(Evidencia.clave.in_(borrados), Evidencia.refcount == 0)
+            )
+            db.commit()
+
+    # temporales de subidas interrumpidas (las recientes pueden estar en curso)
+    tmp_dir = os.path.join(base, evidencias.TMP)
+    if os.path.isdir(tmp_dir):
+        limite_tmp = time.time() - 3600
+        for entry in os.scandir(tmp_dir):
+            if entry.is_file() and entry.stat().st_mtime < limite_tmp:
+                os.remove(entry.path)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--gc", action="store_true", help="sólo recolectar objetos sin referencias")
+    p.add_argument("--gracia-horas", type=float, default=24,
+                   help="con --gc: no borrar objetos subidos o reutilizados hace menos de esto")
+    args = p.parse_args()
+
+    base = Config.UPLOAD_FOLDER
+    if args.gc:
+        gc(base, args.dry_run, args.gracia_horas)
+    else:
+        migrar(base, args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
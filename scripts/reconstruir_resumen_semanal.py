@@ -0,0 +1,33 @@
+# scripts/reconstruir_resumen_semanal.py
+"""
+Recalcula resumen_semanal desde registros (un DELETE + INSERT ... SELECT en
+una sola transacción).
+
+    python scripts/reconstruir_resumen_semanal.py
+
+Conviene correrlo con poca captura en curso: una alta que llegue a la mitad
+puede quedar contada dos veces o ninguna; volver a correrlo lo corrige.
+"""
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from db import engine  # noqa: E402
+from services.resumen_semanal import reconstruir  # noqa: E402
+
+
+def main():
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        filas = reconstruir(conn)
+    print(f"resumen_semanal: {filas} grupos en {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,46 +1,137 @@
 # services/base_general_loader.py
-import pandas as pd
-from db import SessionLocal
+"""
+Carga de base_general desde .xlsx.
+
+Se lee con openpyxl en modo read_only (streaming: una fila a la vez, sin armar
+el modelo de objetos del libro) y se escribe por lotes con el upsert del
+dialecto, así que la memoria queda acotada por el tamaño del lote y no por el
+del archivo.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from openpyxl import load_workbook
+from sqlalchemy import select
+
+from db import engine
 from models import BaseGeneral
+from services.cliente_index import cliente_index
+from services.nombre_index import nombre_index
+from services.csv_ingest import hash_contenido
+from services.upsert import build_upsert, batch_rows
+from services.versiones import BASE_GENERAL, incrementar_version
+from utils.claves import normalizar_cliente_unico
+
+COLUMNS = ["CLIENTE_UNICO", "NOMBRE_CTE", "GERENCIA", "PRODUCTO", "FIDIAPAGO", "GESTION_DESC"]
+
+
+def _celda(value) -> str:
+    """Valor de celda como texto (mismo criterio que read_excel(dtype=str))."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # 12345.0 -> "12345"
+    return str(value).strip()
+
+
+def iter_xlsx_rows(file_like):
+    """
+    Itera las filas de la primera hoja como dicts con claves en minúsculas
+    (COLUMNS + cliente_unico_norm). La primera fila es encabezado; las
+    columnas se ubican por nombre. Lanza ValueError si falta alguna.
+    """
+    wb = load_workbook(file_like, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = [_celda(h).upper() for h in next(rows, ())]
+        missing = set(COLUMNS) - set(header)
+        if missing:
+            raise ValueError(f"Faltan columnas: {', '.join(sorted(missing))}")
+        # si una columna se repite, gana la última (como en el DataFrame)
+        pos = {name: i for i, name in enumerate(header)}
+        idx = [(c.lower(), pos[c]) for c in COLUMNS]
+
+        for raw in rows:
+            if not raw or all(v is None for v in raw):
+                continue  # filas vacías (read_only suele traer algunas al final)
+            row = {col: _celda(raw[i]) if i < len(raw) else "" for col, i in idx}
+            row["cliente_unico"] = normalizar_cliente_unico(row["cliente_unico"])
+            row["cliente_unico_norm"] = row["cliente_unico"]
+            yield row
+    finally:
+        wb.close()
+
 
 def load_base_general_xlsx(file_like) -> dict:
     """
     Lee un .xlsx desde un BytesIO o ruta y upsert a base_general.
-    Devuelve: {"inserted": X, "updated": Y, "skipped": Z}
+    Devuelve: {"inserted": X, "updated": Y, "unchanged": U, "skipped": Z}
+    (updated = existentes cuyo contenido cambió; unchanged = idénticas, no se reescriben)
+    (skipped = filas sin cliente_unico + repetidas dentro del archivo; gana la última)
+    Los conteos se hacen por lote para que la memoria no crezca con el archivo:
+    una clave repetida en lotes distintos cuenta en cada uno (no entra en skipped).
     """
-    df = pd.read_excel(file_like, dtype=str).fillna("")
-    cols = {"CLIENTE_UNICO", "NOMBRE_CTE", "GERENCIA", "PRODUCTO", "FIDIAPAGO", "GESTION_DESC"}
-    missing = cols - set(df.columns.str.upper())
-    if missing:
-        raise ValueError(f"Faltan columnas: {', '.join(sorted(missing))}")
-
-    inserted = updated = skipped = 0
-    with SessionLocal() as db:
-        for _, row in df.iterrows():
-            cu = str(row["CLIENTE_UNICO"]).strip()
-            if not cu:
-                skipped += 1
+    table = BaseGeneral.__table__
+    update_cols = [c.lower() for c in COLUMNS if c != "CLIENTE_UNICO"] + ["hash_contenido", "actualizado_en"]
+    now = datetime.utcnow()
+
+    con_clave = sin_clave = escritas = 0
+    inserted = updated = unchanged = 0
+
+    with engine.begin() as conn:
+        dialect = conn.dialect.name
+        # filas por lote: una consulta de existentes + un INSERT multi-fila por lote
+        chunk = batch_rows(dialect, len(COLUMNS) + 3)
+
+        def flush(batch: dict[str, dict]) -> None:
+            nonlocal escritas, inserted, updated, unchanged
+            keys = list(batch)
+            escritas += len(keys)
+            existing = dict(
+                conn.execute(
+                    select(table.c.cliente_unico_norm, table.c.hash_contenido)
+                    .where(table.c.cliente_unico_norm.in_(keys))
+                ).all()
+            )
+            # sólo se escriben filas nuevas o cuyo contenido cambió
+            to_write = []
+            for k in keys:
+                r = batch[k]
+                if k not in existing:
+                    inserted += 1
+                elif existing[k] != r["hash_contenido"]:
+                    updated += 1
+                else:
+                    unchanged += 1
+                    continue
+                to_write.append(r)
+
+            if to_write:
+                conn.execute(build_upsert(dialect, table, to_write, update_cols))
+
+        batch: dict[str, dict] = {}
+        for row in iter_xlsx_rows(file_like):
+            key = row["cliente_unico_norm"]
+            if not key:
+                sin_clave += 1
                 continue
-            item = db.query(BaseGeneral).filter(BaseGeneral.cliente_unico == cu).first()
-            if not item:
-                item = BaseGeneral(
-                    cliente_unico=cu,
-                    nombre_cte=row["NOMBRE_CTE"],
-                    gerencia=row["GERENCIA"],
-                    producto=row["PRODUCTO"],
-                    fidiapago=row["FIDIAPAGO"],
-                    gestion_desc=row["GESTION_DESC"],
-                )
-                db.add(item)
-                inserted += 1
-            else:
-                # upsert “suave”
-                item.nombre_cte = row["NOMBRE_CTE"]
-                item.gerencia = row["GERENCIA"]
-                item.producto = row["PRODUCTO"]
-                item.fidiapago = row["FIDIAPAGO"]
-                item.gestion_desc = row["GESTION_DESC"]
-                updated += 1
-        db.commit()
-
-    return {"inserted": inserted, "updated": updated, "skipped": skipped}
+            con_clave += 1
+            row["hash_contenido"] = hash_contenido(row)
+            row["actualizado_en"] = now
+            # dict por clave => dedup dentro del lote (última gana)
+            batch.pop(key, None)
+            batch[key] = row
+            if len(batch) >= chunk:
+                flush(batch)
+                batch = {}
+        if batch:
+            flush(batch)
+        # misma transacción que la carga: los demás workers reconstruyen sus índices
+        incrementar_version(conn, BASE_GENERAL)
+
+    cliente_index.rebuild_async()
+    nombre_index.rebuild_async()
+    skipped = sin_clave + (con_clave - escritas)
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "skipped": skipped}
@@ -0,0 +1,170 @@
+# services/bitacora.py
+"""
+Bitácora de cambios de registros (tabla bitacora_registro).
+
+crear/actualizar calculan el diff de campos en la petición y lo dejan en una
+cola en memoria tras el commit; un hilo por proceso la vacía con INSERT por
+lotes (hasta BITACORA_LOTE filas o cada BITACORA_INTERVALO segundos). Así la
+bitácora no agrega una ida y vuelta a la BD en cada guardado.
+
+La cola está acotada (BITACORA_MAX_PENDIENTES): si la BD no da abasto, los
+cambios nuevos se descartan con un [WARN] en lugar de crecer sin límite o
+frenar las capturas. Al terminar el proceso (atexit) se escribe lo pendiente.
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from config import Config
+from db import engine
+from models import BitacoraRegistro
+
+# Campos de Registro que se auditan (los *_snap se derivan de cliente_unico)
+CAMPOS = (
+    "cliente_unico",
+    "tipo_convenio_id",
+    "boca_cobranza_id",
+    "fecha_promesa",
+    "telefono",
+    "semana",
+    "pago_inicial",
+    "pago_semanal",
+    "duracion_semanas",
+    "notas",
+    "archivo_convenio",
+    "archivo_pago",
+    "archivo_gestion",
+)
+
+_cola: queue.Queue = queue.Queue(maxsize=Config.BITACORA_MAX_PENDIENTES)
+_hilo: threading.Thread | None = None
+_hilo_pid: int | None = None
+_hilo_lock = threading.Lock()
+_parar = threading.Event()
+_descartados = 0
+
+
+def _valor(v):
+    """Valor serializable a JSON (fechas ISO, Decimal como texto)."""
+    if isinstance(v, (date, datetime)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    return v
+
+
+def snapshot(registro) -> dict:
+    return {campo: _valor(getattr(registro, campo)) for campo in CAMPOS}
+
+
+def diff(antes: dict | None, despues: dict) -> dict:
+    """{campo: [antes, después]} sólo con lo que cambió (antes=None: alta)."""
+    antes = antes or {}
+    return {
+        campo: [antes.get(campo), valor]
+        for campo, valor in despues.items()
+        if antes.get(campo) != valor
+    }
+
+
+# ---------------------------------------------------------------------------
+# Cola + escritor en segundo plano
+# ---------------------------------------------------------------------------
+def _get_hilo() -> None:
+    """Hilo escritor por proceso (se recrea tras un fork de gunicorn --preload)."""
+    global _hilo, _hilo_pid
+    with _hilo_lock:
+        if _hilo is None or _hilo_pid != os.getpid() or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_escritor, name="bitacora", daemon=True)
+            _hilo_pid = os.getpid()
+            _hilo.start()
+
+
+def registrar(registro_id: int, accion: str, cambios: dict | None, hecho_por: int | None) -> None:
+    """Encola un cambio ya confirmado. No bloquea ni toca la BD."""
+    global _descartados
+    if accion == "EDITAR" and not cambios:
+        return
+    fila = {
+        "registro_id": registro_id,
+        "accion": accion,
+        "cambios_json": cambios or None,
+        "hecho_por": hecho_por,
+        "hecho_en": datetime.utcnow(),
+    }
+    _get_hilo()
+    try:
+        _cola.put_nowait(fila)
+    except queue.Full:
+        _descartados += 1
+        if _descartados == 1 or _descartados % 1000 == 0:
+            print(f"[WARN] Bitácora llena; cambios descartados: {_descartados}")
+
+
+def _tomar_lote(espera: float) -> list[dict]:
+    """Junta hasta BITACORA_LOTE filas, esperando a lo más `espera` segundos por la primera."""
+    try:
+        lote = [_cola.get(timeout=espera)]
+    except queue.Empty:
+        return []
+    limite = time.monotonic() + Config.BITACORA_INTERVALO
+    while len(lote) < Config.BITACORA_LOTE:
+        restante = limite - time.monotonic()
+        if restante <= 0 or _parar.is_set():
+            break
+        try:
+            lote.append(_cola.get(timeout=restante))
+        except queue.Empty:
+            break
+    return lote
+
+
+def _escribir(lote: list[dict]) -> None:
+    for intento in range(2):
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(BitacoraRegistro.__table__), lote)
+            return
+        except Exception as exc:
+            if intento:
+                print(f"[WARN] No se pudieron escribir {len(lote)} cambios de la bitácora:", exc)
+            else:
+                time.sleep(1)
+
+
+def _escritor() -> None:
+    while not _parar.is_set():
+        lote = _tomar_lote(espera=1.0)
+        if lote:
+            _escribir(lote)
+    vaciar()
+
+
+def vaciar() -> None:
+    """Escribe en el hilo actual todo lo que haya en la cola."""
+    while True:
+        lote = []
+        while len(lote) < Config.BITACORA_LOTE:
+            try:
+                lote.append(_cola.get_nowait())
+            except queue.Empty:
+                break
+        if not lote:
+            return
+        _escribir(lote)
+
+
+@atexit.register
+def _al_salir() -> None:
+    _parar.set()
+    if _hilo is not None and _hilo_pid == os.getpid() and _hilo.is_alive():
+        _hilo.join(timeout=10)
+    vaciar()
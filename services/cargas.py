@@ -0,0 +1,272 @@
+# services/cargas.py
+"""
+Cola de cargas de base_general.
+
+La petición HTTP sólo guarda el CSV y registra una fila en `cargas_base`;
+un pool de hilos por proceso (CARGAS_WORKERS, por defecto 1) la procesa en
+segundo plano y va guardando el avance. Cualquier worker de gunicorn puede
+consultar el estado porque vive en la BD.
+
+Mientras corre, la carga actualiza `actualizado_en` (latido) cada
+CARGAS_LATIDO_SEGUNDOS desde un hilo aparte, así que late aunque el camino
+LOAD DATA tarde minutos en una sola sentencia. Si el proceso muere (deploy,
+OOM, reinicio del worker) la carga queda 'procesando' sin latido: al arrancar,
+o al consultar su estado, las que llevan más de CARGAS_COLGADA_SEGUNDOS sin
+latir vuelven a 'pendiente' y se reencolan; si el CSV temporal ya no existe
+se marcan como error.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+
+from config import Config
+from db import SessionLocal
+from models import CargaBase
+from services.cliente_index import cliente_index
+from services.nombre_index import nombre_index
+from services.csv_ingest import cargar_base_general_csv
+from services.versiones import BASE_GENERAL, publicar
+
+# segundos mínimos entre escrituras de avance
+PROGRESS_EVERY = 1.0
+
+_executor: ThreadPoolExecutor | None = None
+_executor_pid: int | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool por proceso (se recrea tras un fork de gunicorn --preload)."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.CARGAS_WORKERS, thread_name_prefix="carga-base"
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _contar_lineas(path: str) -> int:
+    """Filas de datos aproximadas (líneas - encabezado), leyendo en bloques."""
+    n = 0
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            n += block.count(b"\n")
+    return max(0, n - 1)
+
+
+def encolar_carga(path: str, mode: str, user_id: int | None, nombre_original: str | None = None) -> int:
+    """Registra la carga y la manda al pool. Devuelve el id de la carga."""
+    with SessionLocal() as db:
+        carga = CargaBase(
+            archivo=path,
+            nombre_original=nombre_original,
+            modo=mode,
+            estado="pendiente",
+            total_estimado=_contar_lineas(path),
+            creado_por=user_id,
+        )
+        db.add(carga)
+        db.commit()
+        carga_id = carga.id
+
+    _get_executor().submit(ejecutar_carga, carga_id)
+    return carga_id
+
+
+def _tomar(carga_id: int) -> CargaBase | None:
+    """Marca la carga como 'procesando' sólo si sigue pendiente (un solo worker la toma)."""
+    with SessionLocal() as db:
+        res = db.execute(
+            update(CargaBase)
+            .where(CargaBase.id == carga_id, CargaBase.estado == "pendiente")
+            .values(estado="procesando", iniciado_en=datetime.utcnow(), actualizado_en=datetime.utcnow())
+        )
+        db.commit()
+        if not res.rowcount:
+            return None
+        return db.get(CargaBase, carga_id)
+
+
+def _actualizar(carga_id: int, **values) -> None:
+    with SessionLocal() as db:
+        db.execute(update(CargaBase).where(CargaBase.id == carga_id).values(**values))
+        db.commit()
+
+
+def _latir(carga_id: int, parar: threading.Event) -> None:
+    while not parar.wait(Config.CARGAS_LATIDO_SEGUNDOS):
+        try:
+            _actualizar(carga_id, actualizado_en=datetime.utcnow())
+        except Exception as exc:
+            print(f"[WARN] No se pudo registrar el latido de la carga {carga_id}:", exc)
+
+
+def ejecutar_carga(carga_id: int) -> None:
+    carga = _tomar(carga_id)
+    if carga is None:
+        return
+
+    t0 = time.time()
+    ultimo = 0.0
+    parar = threading.Event()
+    threading.Thread(
+        target=_latir, args=(carga_id, parar), name=f"carga-latido-{carga_id}", daemon=True
+    ).start()
+
+    def on_progress(filas: int) -> None:
+        nonlocal ultimo
+        now = time.monotonic()
+        if now - ultimo >= PROGRESS_EVERY:
+            ultimo = now
+            _actualizar(carga_id, procesadas=filas, actualizado_en=datetime.utcnow())
+
+    try:
+        stats = cargar_base_general_csv(carga.archivo, carga.modo, on_progress=on_progress)
+
+        dt = time.time() - t0
+        _actualizar(
+            carga_id,
+            estado="terminado",
+            procesadas=stats["total"],
+            insertados=stats["insertados"],
+            actualizados=stats["actualizados"],
+            sin_cambios=stats["sin_cambios"],
+            mensaje=(
+                f"CSV cargado: {stats['total']} filas (dedup únicas: {stats['unicos']}). "
+                f"Nuevos: {stats['insertados']} | Cambiados: {stats['actualizados']} | "
+                f"Sin cambios: {stats['sin_cambios']}. "
+                f"Tiempo: {dt:.1f}s"
+            ),
+            terminado_en=datetime.utcnow(),
+        )
+    except Exception as e:
+        _actualizar(
+            carga_id,
+            estado="error",
+            mensaje=f"Error al procesar CSV: {e}",
+            terminado_en=datetime.utcnow(),
+        )
+    finally:
+        parar.set()
+        try:
+            os.remove(carga.archivo)
+        except Exception:
+            pass
+        # también si falló: el motor por lotes confirma lote por lote
+        publicar(BASE_GENERAL)
+        cliente_index.rebuild_async()
+        nombre_index.rebuild_async()
+
+
+def _ultimo_latido():
+    return func.coalesce(CargaBase.actualizado_en, CargaBase.iniciado_en, CargaBase.creado_en)
+
+
+def colgada(carga: CargaBase) -> bool:
+    """¿La carga está 'procesando' pero su worker dejó de latir?"""
+    if carga.estado != "procesando":
+        return False
+    latido = carga.actualizado_en or carga.iniciado_en or carga.creado_en
+    return latido is None or datetime.utcnow() - latido > timedelta(seconds=Config.CARGAS_COLGADA_SEGUNDOS)
+
+
+def _recuperar_colgadas() -> list[int]:
+    """
+    Cargas 'procesando' sin latido reciente: vuelven a 'pendiente' si su CSV
+    sigue en disco (devuelve esos ids) o pasan a 'error' si ya no existe.
+    """
+    limite = datetime.utcnow() - timedelta(seconds=Config.CARGAS_COLGADA_SEGUNDOS)
+    recuperadas = []
+    with SessionLocal() as db:
+        colgadas = (
+            db.query(CargaBase.id, CargaBase.archivo)
+            .filter(CargaBase.estado == "procesando", _ultimo_latido() < limite)
+            .all()
+        )
+        for carga_id, archivo in colgadas:
+            if os.path.exists(archivo):
+                valores = {"estado": "pendiente", "procesadas": 0}
+            else:
+                valores = {
+                    "estado": "error",
+                    "mensaje": "La carga se interrumpió (reinicio del servidor) y el archivo "
+                               "temporal ya no existe; vuelve a subirla.",
+                    "terminado_en": datetime.utcnow(),
+                }
+            # mismo filtro en el UPDATE: si otro worker ya la recuperó, no se toca
+            res = db.execute(
+                update(CargaBase)
+                .where(CargaBase.id == carga_id, CargaBase.estado == "procesando", _ultimo_latido() < limite)
+                .values(**valores)
+            )
+            if res.rowcount and valores["estado"] == "pendiente":
+                recuperadas.append(carga_id)
+            if res.rowcount:
+                print(f"[WARN] Carga {carga_id} sin latido: pasa a '{valores['estado']}'")
+        db.commit()
+    return recuperadas
+
+
+def recuperar_colgadas() -> None:
+    """Recupera las cargas huérfanas y reencola las que se pueden reintentar."""
+    try:
+        ids = _recuperar_colgadas()
+    except Exception as exc:
+        print("[WARN] No se pudieron revisar las cargas en proceso:", exc)
+        return
+    for cid in ids:
+        _get_executor().submit(ejecutar_carga, cid)
+
+
+def reanudar_pendientes() -> None:
+    """
+    Reencola cargas que quedaron pendientes (p. ej. reinicio del worker que las
+    recibió) y las que quedaron 'procesando' sin latido.
+    """
+    try:
+        _recuperar_colgadas()
+    except Exception as exc:
+        print("[WARN] No se pudieron revisar las cargas en proceso:", exc)
+    try:
+        with SessionLocal() as db:
+            ids = [
+                cid
+                for (cid,) in db.query(CargaBase.id)
+                .filter(CargaBase.estado == "pendiente")
+                .order_by(CargaBase.id.asc())
+            ]
+    except Exception as exc:
+        print("[WARN] No se pudieron leer las cargas pendientes:", exc)
+        return
+    for cid in ids:
+        _get_executor().submit(ejecutar_carga, cid)
+
+
+def carga_a_dict(carga: CargaBase) -> dict:
+    porcentaje = None
+    if carga.total_estimado:
+        porcentaje = min(100, int(carga.procesadas * 100 / carga.total_estimado))
+    if carga.estado == "terminado":
+        porcentaje = 100
+    return {
+        "id": carga.id,
+        "nombre": carga.nombre_original or "",
+        "modo": carga.modo,
+        "estado": carga.estado,
+        "procesadas": carga.procesadas,
+        "total_estimado": carga.total_estimado,
+        "porcentaje": porcentaje,
+        "insertados": carga.insertados,
+        "actualizados": carga.actualizados,
+        "sin_cambios": carga.sin_cambios,
+        "mensaje": carga.mensaje or "",
+        "creado_en": carga.creado_en.isoformat(sep=" ", timespec="seconds") if carga.creado_en else "",
+    }
@@ -0,0 +1,114 @@
+# services/catalogos_cache.py
+"""
+Caché por proceso de los catálogos activos (TipoConvenio / BocaCobranza).
+
+Los catálogos cambian pocas veces al mes, así que los formularios se sirven
+desde memoria. Cada guardado en admin incrementa la versión en la tabla
+`cache_versiones`; los workers comparan su versión contra la BD como máximo
+cada CATALOGO_CACHE_CHECK segundos y recargan sólo si cambió.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import namedtuple
+
+from markupsafe import Markup, escape
+
+from config import Config
+from db import SessionLocal
+from models import TipoConvenio, BocaCobranza
+from services.versiones import incrementar_version, leer_version
+
+CatalogoItem = namedtuple("CatalogoItem", "id nombre")
+
+VERSION_KEY = "catalogos"
+
+
+def build_select_options(items, selected_id, placeholder="Selecciona una opción") -> Markup:
+    placeholder_selected = selected_id in (None, "")
+    options: list[str] = [
+        f'<option value="" disabled{" selected" if placeholder_selected else ""}>{escape(placeholder)}</option>'
+    ]
+    for item in items:
+        value = escape(str(getattr(item, "id", "")))
+        label = escape(getattr(item, "nombre", ""))
+        selected = " selected" if selected_id == getattr(item, "id", None) else ""
+        options.append(f'<option value="{value}"{selected}>{label}</option>')
+    return Markup("\n".join(options))
+
+
+class CatalogoSnapshot:
+    """Catálogos cargados en una versión dada + <option> ya renderizados."""
+
+    def __init__(self, version, tipos, bocas):
+        self.version = version
+        self.tipos: list[CatalogoItem] = tipos
+        self.bocas: list[CatalogoItem] = bocas
+        self._options: dict[tuple[str, int | None], Markup] = {}
+
+    def opciones(self, catalogo: str, selected_id: int | None = None) -> Markup:
+        key = (catalogo, selected_id)
+        markup = self._options.get(key)
+        if markup is None:
+            markup = build_select_options(getattr(self, catalogo), selected_id)
+            self._options[key] = markup
+        return markup
+
+
+def _read_version(db) -> int | None:
+    """Versión publicada en la BD; None si la tabla aún no existe."""
+    return leer_version(db, VERSION_KEY)
+
+
+def _load_items(db, model) -> list[CatalogoItem]:
+    rows = (
+        db.query(model.id, model.nombre)
+        .filter(model.activo == 1)
+        .order_by(model.nombre.asc())
+        .all()
+    )
+    return [CatalogoItem(id_, nombre) for id_, nombre in rows]
+
+
+class CatalogoCache:
+    def __init__(self, check_interval: int = 30):
+        self.check_interval = check_interval
+        self._snap: CatalogoSnapshot | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> CatalogoSnapshot:
+        snap = self._snap
+        if snap is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snap
+
+        with self._lock:
+            snap = self._snap
+            if snap is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return snap
+            with SessionLocal() as db:
+                version = _read_version(db)
+                # sin tabla de versiones => se recarga en cada intervalo
+                if snap is None or version is None or version != snap.version:
+                    snap = CatalogoSnapshot(
+                        version,
+                        _load_items(db, TipoConvenio),
+                        _load_items(db, BocaCobranza),
+                    )
+            self._snap = snap
+            self._checked_at = time.monotonic()
+            return snap
+
+    def bump(self, db) -> None:
+        """
+        Incrementa la versión dentro de la transacción de `db`. El llamador hace
+        commit y después llama a invalidate() para recargar en este worker.
+        """
+        incrementar_version(db, VERSION_KEY)
+
+    def invalidate(self) -> None:
+        self._snap = None
+
+
+catalogo_cache = CatalogoCache(check_interval=Config.CATALOGO_CACHE_CHECK)
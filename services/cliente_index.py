@@ -0,0 +1,73 @@
+# services/cliente_index.py
+"""
+Índice en memoria (arreglo ordenado + bisect) de base_general.cliente_unico_norm
+para el autocomplete (el prefijo se normaliza igual, así que no distingue
+mayúsculas ni espacios). Se construye en segundo plano al arrancar cada worker
+y se reconstruye tras cada carga de la base; los demás workers revisan la
+versión `base_general` como máximo cada CLIENTE_INDEX_CHECK segundos
+(ver services.indice_base).
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+
+from config import Config
+from models import BaseGeneral
+from services.indice_base import IndiceBaseGeneral
+from services.lecturas import session_lectura
+from services.versiones import BASE_GENERAL, leer_version
+from utils.claves import normalizar_cliente_unico
+
+
+class ClienteIndex(IndiceBaseGeneral):
+    def __init__(self, check_interval: int = 30):
+        super().__init__(check_interval, nombre_hilo="cliente-index", etiqueta="clientes")
+        # (claves normalizadas ordenadas, cliente_unico y nombres paralelos)
+        self._data: tuple[list[str], list[str], list[str]] | None = None
+
+    def __len__(self) -> int:
+        data = self._data
+        return len(data[0]) if data else 0
+
+    def rebuild(self) -> int:
+        """Lee base_general completa y publica el índice nuevo. Devuelve # de claves."""
+        entries: list[tuple[str, str, str]] = []
+        with session_lectura() as db:
+            # la versión se lee antes que los datos: una carga a media lectura
+            # deja la versión vieja y la siguiente revisión vuelve a construir
+            version = leer_version(db, BASE_GENERAL)
+            q = (
+                db.query(BaseGeneral.cliente_unico_norm, BaseGeneral.cliente_unico, BaseGeneral.nombre_cte)
+                .execution_options(yield_per=10_000)
+            )
+            for norm, cu, nombre in q:
+                if norm:
+                    entries.append((norm, cu, nombre or ""))
+        entries.sort()
+        keys = [e[0] for e in entries]
+        cus = [e[1] for e in entries]
+        names = [e[2] for e in entries]
+        self._data = (keys, cus, names)
+        self._version = version
+        return len(keys)
+
+    def search(self, prefix: str, limit: int = 10) -> list[tuple[str, str]] | None:
+        """
+        Hasta `limit` pares (cliente_unico, nombre_cte) que empiezan con `prefix`,
+        en orden. Devuelve None si el índice aún no está listo (usar la BD).
+        """
+        self.ensure_fresh()
+        data = self._data
+        if data is None:
+            return None
+        keys, cus, names = data
+        prefix = normalizar_cliente_unico(prefix)
+        out: list[tuple[str, str]] = []
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and len(out) < limit and keys[i].startswith(prefix):
+            out.append((cus[i], names[i]))
+            i += 1
+        return out
+
+
+cliente_index = ClienteIndex(check_interval=Config.CLIENTE_INDEX_CHECK)
@@ -0,0 +1,338 @@
+# services/csv_ingest.py
+"""
+Carga del CSV diario de base_general.
+
+Dos caminos:
+  1) LOAD DATA LOCAL INFILE → staging → UPSERT (MySQL/TiDB, si el servidor lo permite)
+  2) Motor portable: lee el CSV por streaming y hace INSERT multi-fila por lotes
+     con el upsert del dialecto (MySQL/TiDB, SQLite, Postgres)
+
+`cargar_base_general_csv` intenta (1) y cae a (2) automáticamente.
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError
+
+from db import engine
+from models import BaseGeneral
+from services.upsert import build_upsert, batch_rows
+from utils.claves import normalizar_cliente_unico
+
+CSV_COLUMNS = ["cliente_unico", "nombre_cte", "gerencia", "producto", "fidiapago", "gestion_desc"]
+HASH_COLUMNS = CSV_COLUMNS[1:]
+
+# Equivalente SQL de hash_contenido() sobre el alias `d`
+HASH_SQL = "MD5(CONCAT_WS(CHAR(31), {}))".format(
+    ", ".join(f"IFNULL(d.{col}, '')" for col in HASH_COLUMNS)
+)
+
+SNIFF_BYTES = 64 * 1024
+
+
+class LoadDataUnavailable(Exception):
+    """El servidor no acepta LOAD DATA LOCAL INFILE (o no hay tabla de staging)."""
+
+
+# ---------------------------------------------------------------------------
+# Detección de formato
+# ---------------------------------------------------------------------------
+def detect_format(path: str) -> tuple[str, str]:
+    """
+    Devuelve (encoding, terminador de línea) a partir de los primeros bytes.
+    UTF-8 (con o sin BOM) si decodifica; si no, cp1252 (CSV de Excel en Windows).
+    """
+    with open(path, "rb") as fh:
+        sample = fh.read(SNIFF_BYTES)
+
+    line_end = "\r\n" if b"\r\n" in sample else "\n"
+    return detect_encoding(sample), line_end
+
+
+def detect_encoding(sample: bytes) -> str:
+    """UTF-8 (con o sin BOM) si la muestra decodifica; si no, cp1252."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False: tolera un carácter multibyte cortado al final de la muestra
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def hash_contenido(row: dict) -> str:
+    """
+    MD5 del contenido (sin la clave) para detectar cambios. Debe coincidir con
+    HASH_SQL: columnas en orden, separadas por 0x1F, NULL/vacío => ''.
+    """
+    data = "\x1f".join(row.get(col) or "" for col in HASH_COLUMNS)
+    return hashlib.md5(data.encode("utf-8")).hexdigest()
+
+
+def _clean(value: str | None) -> str | None:
+    value = (value or "").strip()
+    return value or None
+
+
+def iter_csv_rows(path: str, encoding: str | None = None):
+    """
+    Itera las filas de datos normalizadas (dicts) sin cargar el archivo completo.
+    Columnas por posición (ver CSV_COLUMNS); la primera línea es encabezado.
+    cliente_unico se normaliza a MAYÚSCULAS sin espacios (y se copia a
+    cliente_unico_norm); el resto de vacíos => None.
+    """
+    if encoding is None:
+        encoding, _ = detect_format(path)
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as fh:
+        reader = csv.reader(fh)
+        next(reader, None)  # encabezados
+        for raw in reader:
+            if not raw:
+                continue
+            raw = (raw + [""] * len(CSV_COLUMNS))[: len(CSV_COLUMNS)]
+            row = {col: _clean(val) for col, val in zip(CSV_COLUMNS, raw)}
+            row["cliente_unico"] = normalizar_cliente_unico(row["cliente_unico"])
+            row["cliente_unico_norm"] = row["cliente_unico"]
+            yield row
+
+
+# ---------------------------------------------------------------------------
+# (2) Motor portable por lotes
+# ---------------------------------------------------------------------------
+def ingest_csv_batches(path: str, mode: str = "upsert", on_progress=None) -> dict:
+    """
+    Carga el CSV con INSERT multi-fila del dialecto en uso.
+    mode: "upsert" (inserta y actualiza) | "insert" (sólo nuevos).
+    Sólo se escriben filas nuevas o cuyo hash de contenido cambió.
+    Filas repetidas por cliente_unico: gana la última (igual que el camino LOAD DATA).
+    Los conteos se hacen por lote (memoria acotada al lote, no al archivo): una
+    clave repetida en lotes distintos cuenta una vez en cada uno, así que
+    "unicos" y los demás conteos son aproximados si el archivo trae repetidas.
+    Cada lote se confirma en su propia transacción (bloqueos cortos y transacciones
+    acotadas en TiDB); si la carga falla a la mitad, volver a correrla es seguro.
+    on_progress(filas_leidas) se llama tras confirmar cada lote.
+    """
+    table = BaseGeneral.__table__
+    update_cols = [] if mode == "insert" else HASH_COLUMNS + ["hash_contenido", "actualizado_en"]
+    now = datetime.utcnow()
+
+    total = omitidas = unicos = insertados = actualizados = sin_cambios = 0
+
+    with engine.connect() as conn:
+        dialect = conn.dialect.name
+        size = batch_rows(dialect, len(CSV_COLUMNS) + 3)
+
+        def flush(batch: dict[str, dict]) -> None:
+            nonlocal unicos, insertados, actualizados, sin_cambios
+            keys = list(batch)
+            unicos += len(keys)
+            existentes = dict(
+                conn.execute(
+                    select(table.c.cliente_unico_norm, table.c.hash_contenido)
+                    .where(table.c.cliente_unico_norm.in_(keys))
+                ).all()
+            )
+            rows = []
+            for k in keys:
+                row = batch[k]
+                if k not in existentes:
+                    insertados += 1
+                    rows.append(row)
+                elif existentes[k] != row["hash_contenido"]:
+                    actualizados += 1
+                    if mode != "insert":
+                        rows.append(row)
+                else:
+                    sin_cambios += 1
+
+            if rows:
+                conn.execute(build_upsert(dialect, table, rows, update_cols))
+            conn.commit()
+
+        batch: dict[str, dict] = {}
+        for row in iter_csv_rows(path):
+            total += 1
+            key = row["cliente_unico_norm"]
+            if not key:
+                omitidas += 1
+                continue
+            row["hash_contenido"] = hash_contenido(row)
+            row["actualizado_en"] = now
+            # dict por clave => dedup dentro del lote (última gana)
+            batch.pop(key, None)
+            batch[key] = row
+            if len(batch) >= size:
+                flush(batch)
+                batch = {}
+                if on_progress:
+                    on_progress(total)
+        if batch:
+            flush(batch)
+        if on_progress:
+            on_progress(total)
+
+    if mode == "insert":
+        # en modo "sólo nuevos" las existentes no se tocan
+        sin_cambios += actualizados
+        actualizados = 0
+    return {
+        "total": total,
+        "unicos": unicos,
+        "insertados": insertados,
+        "actualizados": actualizados,
+        "sin_cambios": sin_cambios,
+        "omitidas": omitidas,
+        "metodo": "lotes",
+    }
+
+
+# ---------------------------------------------------------------------------
+# (1) LOAD DATA LOCAL INFILE → staging (MySQL/TiDB)
+# ---------------------------------------------------------------------------
+def ingest_csv_load_data(path: str, mode: str = "upsert") -> dict:
+    """
+    Camino rápido para MySQL/TiDB. Requisitos previos (una sola vez en la BD):
+      - base_general: índices UNIQUE(cliente_unico) y UNIQUE(cliente_unico_norm)
+      - base_general_tmp: SIN índices UNIQUE
+    Lanza LoadDataUnavailable si el servidor no lo permite.
+    """
+    encoding, line_end = detect_format(path)
+    charset = "utf8mb4" if encoding.startswith("utf-8") else "latin1"
+
+    with engine.begin() as conn:
+        # 1) Limpia staging + 2) carga rápida. Cualquier error aquí => motor portable.
+        try:
+            conn.execute(text("TRUNCATE TABLE base_general_tmp"))
+            conn.exec_driver_sql(
+                f"""
+                LOAD DATA LOCAL INFILE %s
+                INTO TABLE base_general_tmp
+                CHARACTER SET {charset}
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+                LINES  TERMINATED BY %s
+                IGNORE 1 LINES
+                (@cliente_unico,@nombre_cte,@gerencia,@producto,@fidiapago,@gestion_desc)
+                SET
+                  cliente_unico = TRIM(@cliente_unico),
+                  nombre_cte    = NULLIF(TRIM(@nombre_cte),''),
+                  gerencia      = NULLIF(TRIM(@gerencia),''),
+                  producto      = NULLIF(TRIM(@producto),''),
+                  fidiapago     = NULLIF(TRIM(@fidiapago),''),
+                  gestion_desc  = NULLIF(TRIM(@gestion_desc),''),
+                  actualizado_en = NOW();
+                """,
+                (path, line_end),
+            )
+        except DBAPIError as exc:
+            raise LoadDataUnavailable(str(exc.orig or exc)) from exc
+
+        total_tmp = conn.execute(text("SELECT COUNT(*) FROM base_general_tmp")).scalar_one()
+
+        # 3) Subconsulta "dedup": última fila por clave normalizada + hash de contenido
+        dedup_subq = f"""
+          SELECT d.id, d.cliente_unico_norm, d.nombre_cte, d.gerencia, d.producto,
+                 d.fidiapago, d.gestion_desc, {HASH_SQL} AS hash_contenido
+          FROM (
+            SELECT s.*,
+                   UPPER(TRIM(s.cliente_unico)) AS cliente_unico_norm,
+                   ROW_NUMBER() OVER (
+                     PARTITION BY UPPER(TRIM(s.cliente_unico))
+                     ORDER BY s.id DESC
+                   ) AS rn
+            FROM base_general_tmp s
+          ) d
+          WHERE d.rn = 1
+        """
+        # el lado destino se resuelve con uq_bg_cu_norm (index seek, no full scan)
+        join_destino = """
+          LEFT JOIN base_general t
+            ON t.cliente_unico_norm = d.cliente_unico_norm
+        """
+
+        # Conteo deduplicado
+        dedup = conn.execute(text(f"SELECT COUNT(*) FROM ({dedup_subq}) AS dd")).scalar_one()
+
+        # Conteo de NUEVOS y CAMBIADOS (dedup LEFT JOIN destino, comparando hash)
+        nuevos, cambiados = conn.execute(
+            text(f"""
+              SELECT COALESCE(SUM(t.id IS NULL), 0),
+                     COALESCE(SUM(t.id IS NOT NULL
+                                  AND NOT (t.hash_contenido <=> d.hash_contenido)), 0)
+              FROM ({dedup_subq}) AS d
+              {join_destino}
+            """)
+        ).one()
+        nuevos, cambiados = int(nuevos), int(cambiados)
+
+        # 4) Inserta/Actualiza destino (normalizando cliente_unico al entrar).
+        #    Sólo filas nuevas o con hash distinto: las idénticas no se reescriben.
+        if mode == "insert":
+            res = conn.execute(
+                text(f"""
+                  INSERT INTO base_general
+                    (cliente_unico, cliente_unico_norm, nombre_cte, gerencia, producto,
+                     fidiapago, gestion_desc, hash_contenido)
+                  SELECT d.cliente_unico_norm, d.cliente_unico_norm,
+                         d.nombre_cte, d.gerencia, d.producto, d.fidiapago, d.gestion_desc,
+                         d.hash_contenido
+                  FROM ({dedup_subq}) AS d
+                  {join_destino}
+                  WHERE t.id IS NULL
+                """)
+            )
+            insertados = res.rowcount or nuevos
+            actualizados = 0
+        else:  # upsert
+            conn.execute(
+                text(f"""
+                  INSERT INTO base_general
+                    (cliente_unico, cliente_unico_norm, nombre_cte, gerencia, producto,
+                     fidiapago, gestion_desc, hash_contenido)
+                  SELECT d.cliente_unico_norm, d.cliente_unico_norm,
+                         d.nombre_cte, d.gerencia, d.producto, d.fidiapago, d.gestion_desc,
+                         d.hash_contenido
+                  FROM ({dedup_subq}) AS d
+                  {join_destino}
+                  WHERE t.id IS NULL
+                     OR NOT (t.hash_contenido <=> d.hash_contenido)
+                  ON DUPLICATE KEY UPDATE
+                    nombre_cte = VALUES(nombre_cte),
+                    gerencia   = VALUES(gerencia),
+                    producto   = VALUES(producto),
+                    fidiapago  = VALUES(fidiapago),
+                    gestion_desc = VALUES(gestion_desc),
+                    hash_contenido = VALUES(hash_contenido),
+                    actualizado_en = NOW()
+                """)
+            )
+            insertados = nuevos
+            actualizados = cambiados
+
+    return {
+        "total": int(total_tmp),
+        "unicos": int(dedup),
+        "insertados": int(insertados),
+        "actualizados": int(actualizados),
+        "sin_cambios": max(0, int(dedup) - int(insertados) - int(actualizados)),
+        "omitidas": 0,
+        "metodo": "load_data",
+    }
+
+
+def cargar_base_general_csv(path: str, mode: str = "upsert", on_progress=None) -> dict:
+    """Usa LOAD DATA cuando el backend es MySQL/TiDB y lo permite; si no, el motor por lotes."""
+    if engine.dialect.name in ("mysql", "mariadb"):
+        try:
+            stats = ingest_csv_load_data(path, mode)
+            if on_progress:
+                on_progress(stats["total"])
+            return stats
+        except LoadDataUnavailable as exc:
+            print("[WARN] LOAD DATA no disponible, usando carga por lotes:", exc)
+    return ingest_csv_batches(path, mode, on_progress=on_progress)
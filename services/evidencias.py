@@ -0,0 +1,292 @@
+# services/evidencias.py
+"""
+Almacenamiento de evidencias (comprobantes, fotos, PDFs).
+
+Almacén direccionado por contenido: cada archivo se guarda una sola vez como
+`<sha256>.<ext>` bajo UPLOAD_FOLDER/objetos/ab/cd/ (dos niveles de 256
+carpetas), y la tabla `evidencias` lleva cuántos registros lo referencian.
+El mismo comprobante subido tres veces ocupa disco una vez. Un objeto que se
+queda sin referencias NO se borra en la petición (otra subida del mismo
+contenido pudo encontrarlo y estar por confirmar su referencia): lo recoge
+`scripts/migrar_evidencias.py --gc`, que sólo borra objetos sin referencias en
+registros y sin tocar (mtime) durante el periodo de gracia; cada subida que
+reutiliza un objeto le renueva el mtime. Así también se recogen los objetos de
+peticiones que fallaron después de escribirlos. Los nombres antiguos
+(`uuid_nombre` en la raíz de UPLOAD_FOLDER) se siguen sirviendo hasta
+migrarlos; esos sí se borran tras el commit (cada uno es de un solo registro).
+
+Para las imágenes se generan además, fuera de la petición:
+  - copia web:  UPLOAD_FOLDER/_web/...<clave>.jpg     (lado mayor EVIDENCIA_WEB_MAX)
+  - miniatura:  UPLOAD_FOLDER/_thumbs/...<clave>.jpg  (lado mayor EVIDENCIA_THUMB_MAX)
+Pillow es opcional: sin él no se generan derivados y get_file sirve el original.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from db import SessionLocal
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - depende del entorno
+    Image = ImageOps = None
+
+EXTENSIONES_IMAGEN = {"jpg", "jpeg", "png"}
+
+OBJETOS = "objetos"
+TMP = "_tmp"
+CHUNK = 1024 * 1024
+CLAVE_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,10}$")
+
+# variante -> (subcarpeta, lado mayor)
+VARIANTES = {
+    "web": ("_web", Config.EVIDENCIA_WEB_MAX),
+    "thumb": ("_thumbs", Config.EVIDENCIA_THUMB_MAX),
+}
+
+_executor: ThreadPoolExecutor | None = None
+_executor_pid: int | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool por proceso (se recrea tras un fork de gunicorn --preload)."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="evidencias")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+# ---------------------------------------------------------------------------
+# Rutas
+# ---------------------------------------------------------------------------
+def es_clave(nombre: str | None) -> bool:
+    """True si `nombre` es una clave del almacén (`<sha256>.<ext>`)."""
+    return bool(nombre) and CLAVE_RE.match(nombre) is not None
+
+
+def _fanout(nombre: str) -> list[str]:
+    return [nombre[:2], nombre[2:4]] if es_clave(nombre) else []
+
+
+def ruta(base_dir: str, nombre: str) -> str:
+    """Ruta física de una evidencia (clave del almacén o nombre antiguo en la raíz)."""
+    if es_clave(nombre):
+        return os.path.join(base_dir, OBJETOS, *_fanout(nombre), nombre)
+    return os.path.join(base_dir, nombre)
+
+
+def ruta_variante(base_dir: str, fname: str, variante: str) -> str:
+    carpeta, _ = VARIANTES[variante]
+    return os.path.join(base_dir, carpeta, *_fanout(fname), f"{fname}.jpg")
+
+
+def es_imagen(fname: str | None) -> bool:
+    return bool(fname) and fname.rsplit(".", 1)[-1].lower() in EXTENSIONES_IMAGEN
+
+
+# ---------------------------------------------------------------------------
+# Escritura / referencias
+# ---------------------------------------------------------------------------
+def guardar_contenido(base_dir: str, stream, ext: str) -> tuple[str, bool, int]:
+    """
+    Copia `stream` al almacén calculando su SHA-256 en el camino.
+    Devuelve (clave, nuevo, bytes); nuevo=False si el contenido ya existía
+    (se le renueva el mtime para que el GC no lo tome por abandonado).
+    """
+    tmp_dir = os.path.join(base_dir, TMP)
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp = os.path.join(tmp_dir, uuid.uuid4().hex)
+    h = hashlib.sha256()
+    tamano = 0
+    try:
+        with open(tmp, "wb") as out:
+            for chunk in iter(lambda: stream.read(CHUNK), b""):
+                h.update(chunk)
+                out.write(chunk)
+                tamano += len(chunk)
+        clave = f"{h.hexdigest()}.{ext.lower()}"
+        destino = ruta(base_dir, clave)
+        try:
+            os.utime(destino)
+            return clave, False, tamano
+        except FileNotFoundError:
+            pass  # no existe (o el GC lo acaba de apartar): se materializa
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(tmp, destino)  # atómico: nunca se ve un objeto a medias
+        return clave, True, tamano
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def referenciar(db, clave: str, tamano: int | None = None, nombre_original: str | None = None) -> None:
+    """Suma una referencia a `clave` dentro de la transacción de `db`."""
+    params = {"k": clave, "t": tamano, "n": (nombre_original or "")[:255] or None}
+    for _ in range(2):
+        try:
+            with db.begin_nested():
+                res = db.execute(
+                    text("UPDATE evidencias SET refcount = refcount + 1 WHERE clave = :k"), params
+                )
+                if not res.rowcount:
+                    db.execute(
+                        text(
+                            "INSERT INTO evidencias (clave, refcount, tamano, nombre_original, creado_en) "
+                            "VALUES (:k, 1, :t, :n, CURRENT_TIMESTAMP)"
+                        ),
+                        params,
+                    )
+            return
+        except IntegrityError:
+            # otra petición insertó la misma clave a la vez: reintenta con UPDATE
+            continue
+    raise RuntimeError(f"No se pudo registrar la evidencia {clave}")
+
+
+def liberar(db, base_dir: str, nombre: str | None) -> None:
+    """
+    Quita una referencia a `nombre` dentro de la transacción de `db`. Los
+    objetos del almacén sin referencias los borra el GC (ver docstring del
+    módulo); un nombre antiguo se borra cuando `db` haga commit.
+    """
+    if not nombre:
+        return
+    if es_clave(nombre):
+        db.execute(
+            text("UPDATE evidencias SET refcount = refcount - 1 WHERE clave = :k AND refcount > 0"),
+            {"k": nombre},
+        )
+        return
+    db.info.setdefault("evidencias_borrar", []).append((base_dir, nombre))
+
+
+def borrar_fisico(base_dir: str, nombre: str) -> None:
+    for path in [ruta(base_dir, nombre)] + [ruta_variante(base_dir, nombre, v) for v in VARIANTES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def recolectar(base_dir: str, clave: str, limite: float) -> bool:
+    """
+    Borra el objeto `clave` (y sus derivados) si su mtime es anterior a
+    `limite`. Lo aparta primero con un rename atómico y revisa el mtime ya
+    apartado: si una subida lo renovó a la vez se devuelve a su lugar (y si
+    ésta no lo encontró, ya lo materializó de nuevo). True si se borró.
+    """
+    destino = ruta(base_dir, clave)
+    try:
+        if os.stat(destino).st_mtime >= limite:
+            return False
+        tmp_dir = os.path.join(base_dir, TMP)
+        os.makedirs(tmp_dir, exist_ok=True)
+        apartado = os.path.join(tmp_dir, f"gc-{uuid.uuid4().hex}")
+        os.replace(destino, apartado)
+    except FileNotFoundError:
+        return False
+    if os.stat(apartado).st_mtime >= limite:
+        if os.path.exists(destino):
+            os.remove(apartado)
+        else:
+            os.replace(apartado, destino)
+        return False
+    os.remove(apartado)
+    borrar_fisico(base_dir, clave)  # derivados
+    return True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _borrar_tras_commit(session) -> None:
+    for base_dir, nombre in session.info.pop("evidencias_borrar", None) or ():
+        borrar_fisico(base_dir, nombre)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_tras_rollback(session) -> None:
+    session.info.pop("evidencias_borrar", None)
+
+
+# ---------------------------------------------------------------------------
+# Derivados (copia web + miniatura)
+# ---------------------------------------------------------------------------
+def generar_derivados(base_dir: str, fname: str) -> bool:
+    """Genera (o regenera) copia web y miniatura de `fname`. True si se generaron."""
+    if Image is None or not es_imagen(fname):
+        return False
+    origen = ruta(base_dir, fname)
+    with Image.open(origen) as img:
+        img = ImageOps.exif_transpose(img)  # fotos de celular giradas por EXIF
+        if img.mode in ("RGBA", "LA", "P"):
+            # capturas PNG con transparencia: fondo blanco
+            img = img.convert("RGBA")
+            fondo = Image.new("RGB", img.size, (255, 255, 255))
+            fondo.paste(img, mask=img.getchannel("A"))
+            img = fondo
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        for variante, (_, lado) in VARIANTES.items():
+            destino = ruta_variante(base_dir, fname, variante)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            copia = img.copy()
+            copia.thumbnail((lado, lado), Image.LANCZOS)  # nunca agranda
+            tmp = destino + ".tmp"
+            copia.save(tmp, "JPEG", quality=Config.EVIDENCIA_JPEG_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp, destino)  # los lectores nunca ven un archivo a medias
+    return True
+
+
+def _generar_bg(base_dir: str, fname: str) -> None:
+    try:
+        generar_derivados(base_dir, fname)
+    except Exception as exc:
+        print(f"[WARN] No se pudieron generar derivados de {fname}:", exc)
+
+
+def encolar_derivados(base_dir: str, fname: str | None) -> None:
+    """Programa la generación en segundo plano (no bloquea la petición)."""
+    if Image is None or not es_imagen(fname):
+        return
+    _get_executor().submit(_generar_bg, base_dir, fname)
+
+
+def iter_evidencias(base_dir: str):
+    """Nombres de todas las evidencias: antiguas en la raíz y objetos del almacén."""
+    for entry in os.scandir(base_dir):
+        if entry.is_file() and not entry.name.startswith("."):
+            yield entry.name
+    raiz = os.path.join(base_dir, OBJETOS)
+    if os.path.isdir(raiz):
+        for dirpath, _, files in os.walk(raiz):
+            for name in files:
+                if es_clave(name):
+                    yield name
+
+
+def generar_faltantes(base_dir: str) -> int:
+    """Genera derivados de las imágenes existentes que aún no los tienen. Devuelve cuántas."""
+    n = 0
+    for nombre in iter_evidencias(base_dir):
+        if not es_imagen(nombre):
+            continue
+        if all(os.path.exists(ruta_variante(base_dir, nombre, v)) for v in VARIANTES):
+            continue
+        try:
+            if generar_derivados(base_dir, nombre):
+                n += 1
+        except Exception as exc:
+            print(f"[WARN] No se pudieron generar derivados de {nombre}:", exc)
+    return n
@@ -0,0 +1,97 @@
+# services/indice_base.py
+"""
+Base de los índices en memoria de base_general (cliente_index, nombre_index).
+
+Cada worker construye su copia en segundo plano al arrancar y tras cada carga
+de la base. Las cargas incrementan la versión `base_general` en
+cache_versiones; los demás workers la revisan como máximo cada
+`check_interval` segundos y reconstruyen sólo si cambió.
+
+Las subclases implementan `rebuild()` (lee la base, publica `_data` con un
+solo swap y guarda en `_version` la versión leída *antes* que los datos) y
+`search()` (llama a `ensure_fresh()` y devuelve None mientras `_data` sea None).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from services.lecturas import session_lectura
+from services.versiones import BASE_GENERAL, leer_version
+
+
+class IndiceBaseGeneral:
+    def __init__(self, check_interval: int = 30, activo: bool = True, *,
+                 nombre_hilo: str, etiqueta: str):
+        self.check_interval = check_interval
+        self.activo = activo
+        self.nombre_hilo = nombre_hilo
+        # para los avisos: "No se pudo construir el índice de <etiqueta>"
+        self.etiqueta = etiqueta
+        # estructura del índice; se reemplaza completa => swap atómico
+        self._data = None
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._building_pid: int | None = None
+        # alguien pidió reconstruir mientras había una en curso
+        self._pendiente = False
+
+    @property
+    def ready(self) -> bool:
+        return self._data is not None
+
+    def rebuild(self) -> int:
+        raise NotImplementedError
+
+    def _cambio(self) -> bool:
+        """¿La versión de base_general en la BD difiere de la del índice?"""
+        if self._data is None:
+            return True
+        with session_lectura() as db:
+            version = leer_version(db, BASE_GENERAL)
+        # sin tabla de versiones => se reconstruye en cada revisión
+        return version is None or version != self._version
+
+    def _rebuild_bg(self, si_cambio: bool) -> None:
+        while True:
+            try:
+                if not si_cambio or self._cambio():
+                    self.rebuild()
+            except Exception as exc:
+                print(f"[WARN] No se pudo construir el índice de {self.etiqueta}:", exc)
+            with self._lock:
+                if not self._pendiente:
+                    self._building_pid = None
+                    return
+                # una carga terminó durante esta construcción: otra vuelta
+                self._pendiente = False
+            si_cambio = False
+
+    def rebuild_async(self, si_cambio: bool = False) -> None:
+        """
+        Lanza una reconstrucción en segundo plano (una a la vez por proceso).
+        Si ya hay una en curso, se encola otra al terminar (salvo si_cambio=True:
+        la revisión periódica no hace falta repetirla).
+        """
+        if not self.activo:
+            return
+        pid = os.getpid()
+        with self._lock:
+            # tras un fork (gunicorn --preload) el hilo del padre no existe en el hijo
+            if self._building_pid == pid:
+                if not si_cambio:
+                    self._pendiente = True
+                return
+            self._building_pid = pid
+            self._pendiente = False
+        threading.Thread(
+            target=self._rebuild_bg, args=(si_cambio,), name=self.nombre_hilo, daemon=True
+        ).start()
+
+    def ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if self._data is None or now - self._checked_at > self.check_interval:
+            self._checked_at = now
+            self.rebuild_async(si_cambio=True)
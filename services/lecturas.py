@@ -0,0 +1,45 @@
+# services/lecturas.py
+"""
+Ruteo de lecturas a la réplica (SQLALCHEMY_REPLICA_URI).
+
+Las vistas de sólo lectura abren `session_lectura()` en lugar de
+`SessionLocal()`. Va a la réplica salvo que:
+  - no haya réplica configurada, o
+  - el usuario haya escrito hace menos de REPLICA_RYW_SEGUNDOS (se marca con
+    `marcar_escritura()` tras el commit), para que vea lo que acaba de guardar
+    aunque la réplica vaya atrasada. La marca vive en la cookie de sesión, así
+    que vale en cualquier worker.
+
+Para probar en local basta con dos archivos SQLite:
+    SQLALCHEMY_DATABASE_URI=sqlite:///principal.db SQLALCHEMY_REPLICA_URI=sqlite:///replica.db
+"""
+from __future__ import annotations
+
+import time
+
+from flask import has_request_context, session
+
+from config import Config
+from db import ReplicaSessionLocal, SessionLocal, replica_engine
+
+ESCRITURA_KEY = "_escritura_ts"
+
+
+def marcar_escritura() -> None:
+    """Las lecturas de este usuario irán a la principal durante REPLICA_RYW_SEGUNDOS."""
+    if replica_engine is not None and has_request_context():
+        session[ESCRITURA_KEY] = time.time()
+
+
+def escritura_reciente() -> bool:
+    if not has_request_context():
+        return False
+    ts = session.get(ESCRITURA_KEY)
+    return bool(ts) and time.time() - ts < Config.REPLICA_RYW_SEGUNDOS
+
+
+def session_lectura():
+    """Sesión para consultas de sólo lectura (réplica si aplica)."""
+    if replica_engine is None or escritura_reciente():
+        return SessionLocal()
+    return ReplicaSessionLocal()
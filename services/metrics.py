@@ -0,0 +1,219 @@
+# services/metrics.py
+"""
+Instrumentación mínima expuesta en /metrics (formato de texto de Prometheus).
+
+- Latencia por endpoint (histograma) y peticiones por código de estado.
+- Sentencias SQL y tiempo en BD por petición (eventos del engine).
+- Espera por un lugar libre en cada pool (principal y réplica) y uso de
+  overflow. La espera la mide db.PoolMedido y excluye abrir conexiones DBAPI
+  nuevas (handshake TLS), así que refleja sólo la contención del pool.
+
+Las métricas viven en memoria de cada proceso: con varios workers de gunicorn
+cada scrape ve el worker que atendió la petición (etiqueta `pid`).
+En respuestas por streaming (export_semana) la latencia cubre hasta que se
+entrega el primer chunk, no la descarga completa.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+from db import observar_espera_pool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# endpoint al que se atribuyen las sentencias fuera de una petición (hilos de fondo)
+BACKGROUND = "(background)"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # último = +Inf
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.n += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: dict[str, tuple[str, dict[tuple, Histogram], tuple]] = {}
+        self.counters: dict[str, tuple[str, dict[tuple, float]]] = {}
+
+    def histogram(self, name: str, help_: str, buckets) -> None:
+        self.histograms[name] = (help_, {}, tuple(buckets))
+
+    def counter(self, name: str, help_: str) -> None:
+        self.counters[name] = (help_, {})
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        _, series, buckets = self.histograms[name]
+        with self._lock:
+            h = series.get(labels)
+            if h is None:
+                h = series[labels] = Histogram(buckets)
+            h.observe(value)
+
+    def inc(self, name: str, labels: tuple, value: float = 1.0) -> None:
+        _, series = self.counters[name]
+        with self._lock:
+            series[labels] = series.get(labels, 0.0) + value
+
+    def render(self) -> list[str]:
+        lines: list[str] = []
+        with self._lock:
+            for name, (help_, series) in self.counters.items():
+                lines.append(f"# HELP {name} {help_}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(labels)} {value:g}")
+            for name, (help_, series, buckets) in self.histograms.items():
+                lines.append(f"# HELP {name} {help_}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, h in sorted(series.items()):
+                    acc = 0
+                    for bound, count in zip(buckets + (float("inf"),), h.counts):
+                        acc += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {acc}")
+                    lines.append(f"{name}_sum{_labels(labels)} {h.total:.6f}")
+                    lines.append(f"{name}_count{_labels(labels)} {h.n}")
+        return lines
+
+
+def _labels(pairs: tuple) -> str:
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+registry.histogram(
+    "http_request_duration_seconds", "Latencia de peticiones por endpoint.", LATENCY_BUCKETS
+)
+registry.counter("http_requests_total", "Peticiones por endpoint, método y estado.")
+registry.histogram(
+    "sql_statements_per_request", "Sentencias SQL ejecutadas por petición.", SQL_COUNT_BUCKETS
+)
+registry.histogram(
+    "sql_duration_per_request_seconds", "Tiempo en BD por petición.", LATENCY_BUCKETS
+)
+registry.counter("sql_statements_total", "Sentencias SQL por endpoint.")
+registry.counter("sql_duration_seconds_total", "Tiempo acumulado en BD por endpoint.")
+registry.histogram(
+    "db_pool_slot_wait_seconds",
+    "Espera por un lugar libre en el pool (sin contar la apertura de conexiones nuevas).",
+    POOL_WAIT_BUCKETS,
+)
+
+# Contadores SQL de la petición en curso (uno por hilo)
+_local = threading.local()
+
+
+def _instrument_engine(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_metrics_t0")
+        if not starts:
+            return
+        dt = time.perf_counter() - starts.pop()
+        if getattr(_local, "active", False):
+            _local.sql_count += 1
+            _local.sql_time += dt
+        else:
+            registry.inc("sql_statements_total", (("endpoint", BACKGROUND),))
+            registry.inc("sql_duration_seconds_total", (("endpoint", BACKGROUND),), dt)
+
+
+def _observar_espera(nombre: str, segundos: float) -> None:
+    registry.observe("db_pool_slot_wait_seconds", (("engine", nombre),), segundos)
+
+
+def _pool_gauges(engines: dict) -> list[str]:
+    lines: list[str] = []
+    gauges = {
+        "db_pool_size": ("Tamaño configurado del pool.", "size"),
+        "db_pool_checked_out": ("Conexiones prestadas en este momento.", "checkedout"),
+        "db_pool_checked_in": ("Conexiones libres en el pool.", "checkedin"),
+        "db_pool_overflow": ("Conexiones de overflow en uso (negativo = sin abrir).", "overflow"),
+        "db_pool_max_overflow": ("Overflow máximo configurado.", "_max_overflow"),
+    }
+    for name, (help_, attr) in gauges.items():
+        lines.append(f"# HELP {name} {help_}")
+        lines.append(f"# TYPE {name} gauge")
+        for nombre, engine in engines.items():
+            value = getattr(engine.pool, attr, None)
+            if value is None:
+                continue
+            if callable(value):
+                value = value()
+            lines.append(f"{name}{_labels((('engine', nombre),))} {value}")
+    return lines
+
+
+def init_metrics(app, engine, replica=None) -> None:
+    """Registra los hooks de petición, los eventos de los engines y la ruta /metrics."""
+    engines = {"principal": engine}
+    if replica is not None:
+        engines["replica"] = replica
+    for eng in engines.values():
+        _instrument_engine(eng)
+    observar_espera_pool(_observar_espera)
+    token = app.config.get("METRICS_TOKEN")
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_t0 = time.perf_counter()
+        _local.active = True
+        _local.sql_count = 0
+        _local.sql_time = 0.0
+
+    @app.after_request
+    def _metrics_end(response):
+        t0 = g.pop("_metrics_t0", None)
+        if t0 is None or request.endpoint == "metrics":
+            _local.active = False
+            return response
+        endpoint = request.endpoint or "(sin_ruta)"
+        labels = (("endpoint", endpoint), ("method", request.method))
+        registry.observe("http_request_duration_seconds", labels, time.perf_counter() - t0)
+        registry.inc("http_requests_total", labels + (("status", response.status_code),))
+
+        sql_labels = (("endpoint", endpoint),)
+        registry.observe("sql_statements_per_request", sql_labels, _local.sql_count)
+        registry.observe("sql_duration_per_request_seconds", sql_labels, _local.sql_time)
+        registry.inc("sql_statements_total", sql_labels, _local.sql_count)
+        registry.inc("sql_duration_seconds_total", sql_labels, _local.sql_time)
+        _local.active = False
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return Response("forbidden\n", status=403, mimetype="text/plain")
+        lines = registry.render() + _pool_gauges(engines)
+        lines.append("# HELP process_pid Proceso que respondió este scrape.")
+        lines.append("# TYPE process_pid gauge")
+        lines.append(f'process_pid{{pid="{os.getpid()}"}} 1')
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,272 @@
+# services/migraciones.py
+"""
+Migraciones versionadas del esquema.
+
+Los archivos viven en sql/migraciones/NNNN_nombre.sql (TiDB/MySQL) y se
+aplican en orden; cada uno aplicado queda en `schema_version`.
+
+Al arrancar, `aplicar_migraciones()` hace una sola consulta (MAX(version)) y,
+si la base ya está al día, termina ahí: sin inspect() ni get_columns. Si hay
+pendientes, toma un candado consultivo (GET_LOCK / pg_advisory_lock) para que
+sólo un worker de gunicorn migre; los demás esperan y al obtenerlo ven que ya
+no queda nada.
+
+Los archivos SQL están escritos para TiDB/MySQL. En SQLite/Postgres (desarrollo
+local, Render) el esquema sale de los modelos: create_all crea las tablas que
+falten y, si la base ya tenía tablas, se agregan con ALTER TABLE ADD COLUMN /
+CREATE INDEX las columnas e índices de los modelos que aún no existen (con su
+relleno, p. ej. cliente_unico_norm, y resumen_semanal se recalcula si se acaba
+de crear). Sólo entonces las migraciones se marcan como aplicadas; si falta una
+columna NOT NULL sin forma de rellenarla, se detiene con un error claro.
+
+Nota: en MySQL el DDL hace commit implícito; si una migración falla a medias,
+no se registra y se reintenta completa en el siguiente arranque, por eso las
+sentencias usan IF NOT EXISTS.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import Config
+from db import Base, engine
+
+MIGRACIONES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "migraciones")
+ARCHIVO_RE = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+LOCK_NAME = "sistema_registros_migraciones"
+LOCK_PG_KEY = 7_301_942_017  # clave fija para pg_advisory_lock
+LOCK_TIMEOUT = 300
+
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+  version     INT          NOT NULL PRIMARY KEY,
+  nombre      VARCHAR(200) NOT NULL,
+  checksum    CHAR(64)     NOT NULL,
+  aplicado_en TIMESTAMP    DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class Migracion:
+    __slots__ = ("version", "nombre", "path")
+
+    def __init__(self, version: int, nombre: str, path: str):
+        self.version = version
+        self.nombre = nombre
+        self.path = path
+
+    def sql(self) -> str:
+        with open(self.path, "r", encoding="utf-8") as fh:
+            return fh.read()
+
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql().encode("utf-8")).hexdigest()
+
+
+def listar_migraciones(directorio: str = MIGRACIONES_DIR) -> list[Migracion]:
+    out = []
+    for name in sorted(os.listdir(directorio)):
+        m = ARCHIVO_RE.match(name)
+        if m:
+            out.append(Migracion(int(m.group(1)), m.group(2), os.path.join(directorio, name)))
+    versiones = [m.version for m in out]
+    if len(set(versiones)) != len(versiones):
+        raise RuntimeError("Hay dos migraciones con el mismo número en sql/migraciones")
+    return out
+
+
+def split_sql(sql_text: str) -> list[str]:
+    # Split simple por ';' cuidando líneas en blanco y comentarios básicos.
+    # Esto funciona bien para DDL sencillo (CREATE TABLE, INDEX, etc.).
+    stmts, buff = [], []
+    for line in sql_text.splitlines():
+        l = line.strip()
+        if not l or l.startswith("--"):
+            continue
+        buff.append(line)
+        if l.endswith(";"):
+            stmts.append("\n".join(buff).rstrip(" ;\n\r\t"))
+            buff = []
+    if buff:
+        stmts.append("\n".join(buff).rstrip(" ;\n\r\t"))
+    return [s for s in stmts if s]
+
+
+def version_actual(conn) -> int | None:
+    """MAX(version) aplicada; None si aún no existe schema_version."""
+    try:
+        return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+    except SQLAlchemyError:
+        conn.rollback()
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Candado consultivo (un solo worker migra)
+# ---------------------------------------------------------------------------
+def _tomar_candado(conn) -> None:
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        ok = conn.execute(
+            text("SELECT GET_LOCK(:n, :t)"), {"n": LOCK_NAME, "t": LOCK_TIMEOUT}
+        ).scalar()
+        if ok != 1:
+            raise RuntimeError("No se obtuvo el candado de migraciones (¿otro proceso migrando?)")
+    elif dialect == "postgresql":
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": LOCK_PG_KEY})
+    # SQLite: un solo proceso escribe a la vez; no hace falta
+
+
+def _soltar_candado(conn) -> None:
+    dialect = conn.dialect.name
+    try:
+        if dialect == "mysql":
+            conn.execute(text("SELECT RELEASE_LOCK(:n)"), {"n": LOCK_NAME})
+        elif dialect == "postgresql":
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_PG_KEY})
+    except SQLAlchemyError as exc:
+        print("[WARN] No se pudo liberar el candado de migraciones:", exc)
+
+
+def _registrar(conn, m: Migracion) -> None:
+    conn.execute(
+        text("INSERT INTO schema_version (version, nombre, checksum) VALUES (:v, :n, :c)"),
+        {"v": m.version, "n": m.nombre, "c": m.checksum()},
+    )
+
+
+def _verificar_checksums(conn, migraciones: list[Migracion]) -> None:
+    aplicadas = dict(conn.execute(text("SELECT version, checksum FROM schema_version")).all())
+    for m in migraciones:
+        if m.version in aplicadas and aplicadas[m.version] != m.checksum():
+            print(f"[WARN] La migración {m.version:04d}_{m.nombre} cambió después de aplicarse")
+
+
+# ---------------------------------------------------------------------------
+# SQLite/Postgres: esquema desde los modelos
+# ---------------------------------------------------------------------------
+# Relleno de columnas NOT NULL agregadas a tablas con datos (equivalente de las
+# migraciones MySQL que las introdujeron)
+RELLENOS = {
+    ("base_general", "cliente_unico_norm"): (
+        "UPDATE base_general SET cliente_unico_norm = UPPER(TRIM(cliente_unico)) "
+        "WHERE cliente_unico_norm IS NULL"
+    ),
+    ("registros", "cliente_unico_norm"): (
+        "UPDATE registros SET cliente_unico_norm = UPPER(TRIM(cliente_unico)) "
+        "WHERE cliente_unico_norm IS NULL"
+    ),
+}
+
+
+def _agregar_columnas(conn, tabla) -> None:
+    """ALTER TABLE ADD COLUMN de las columnas del modelo que faltan en `tabla`."""
+    q = conn.dialect.identifier_preparer.quote
+    existentes = {c["name"] for c in inspect(conn).get_columns(tabla.name)}
+    for col in tabla.columns:
+        if col.name in existentes:
+            continue
+        relleno = RELLENOS.get((tabla.name, col.name))
+        if not col.nullable and relleno is None:
+            raise RuntimeError(
+                f"Falta la columna NOT NULL {tabla.name}.{col.name} y no hay cómo rellenarla; "
+                "agrégala a mano y vuelve a arrancar"
+            )
+        # se agrega como NULL (SQLite no puede agregar NOT NULL sin default); el relleno la completa
+        tipo = col.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {q(tabla.name)} ADD COLUMN {q(col.name)} {tipo}"))
+        if relleno:
+            conn.execute(text(relleno))
+            if conn.dialect.name == "postgresql" and not col.nullable:
+                conn.execute(text(f"ALTER TABLE {q(tabla.name)} ALTER COLUMN {q(col.name)} SET NOT NULL"))
+        if col.unique:
+            # unique=True es una restricción de la tabla: create_all no la agrega a una existente
+            nombre = f"uq_{tabla.name}_{col.name}"
+            conn.execute(text(f"CREATE UNIQUE INDEX {q(nombre)} ON {q(tabla.name)} ({q(col.name)})"))
+
+
+def _crear_indices(conn, tabla) -> None:
+    insp = inspect(conn)
+    existentes = {i["name"] for i in insp.get_indexes(tabla.name)}
+    existentes |= {u["name"] for u in insp.get_unique_constraints(tabla.name)}
+    for indice in tabla.indexes:
+        if indice.name not in existentes:
+            indice.create(conn)
+
+
+def _esquema_desde_modelos(conn) -> None:
+    import models  # noqa: F401  (registra las tablas en Base.metadata)
+    from services import resumen_semanal
+
+    previas = set(inspect(conn).get_table_names()) & set(Base.metadata.tables)
+    Base.metadata.create_all(conn)  # tablas nuevas, con sus índices
+    if not previas:
+        return  # base vacía: create_all ya dejó el esquema completo
+    for nombre in sorted(previas):
+        tabla = Base.metadata.tables[nombre]
+        _agregar_columnas(conn, tabla)
+        _crear_indices(conn, tabla)
+    if "resumen_semanal" not in previas:
+        # igual que 0009: se llena con los registros existentes
+        resumen_semanal.reconstruir(conn)
+
+
+def migrar(conn, migraciones: list[Migracion] | None = None) -> list[int]:
+    """Aplica las pendientes sobre `conn` (con el candado ya tomado). Devuelve las versiones aplicadas."""
+    migraciones = migraciones if migraciones is not None else listar_migraciones()
+    conn.execute(text(SCHEMA_VERSION_DDL))
+    conn.commit()
+
+    actual = version_actual(conn) or 0
+    _verificar_checksums(conn, migraciones)
+    pendientes = [m for m in migraciones if m.version > actual]
+    if not pendientes:
+        return []
+
+    aplicadas = []
+    if conn.dialect.name != "mysql":
+        # Desarrollo (SQLite/Postgres): los modelos son la fuente del esquema
+        try:
+            _esquema_desde_modelos(conn)
+            for m in pendientes:
+                _registrar(conn, m)
+                aplicadas.append(m.version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return aplicadas
+
+    for m in pendientes:
+        for stmt in split_sql(m.sql()):
+            conn.execute(text(stmt))
+        _registrar(conn, m)
+        conn.commit()
+        aplicadas.append(m.version)
+    return aplicadas
+
+
+def aplicar_migraciones() -> None:
+    """Punto de entrada del arranque: camino rápido si el esquema ya está al día."""
+    if not Config.AUTO_MIGRAR:
+        return
+    try:
+        migraciones = listar_migraciones()
+        ultima = migraciones[-1].version if migraciones else 0
+        with engine.connect() as conn:
+            if version_actual(conn) == ultima:
+                return  # camino rápido: una consulta y listo
+
+            _tomar_candado(conn)
+            try:
+                # otro worker pudo haber migrado mientras esperábamos el candado
+                migrar(conn, migraciones)
+            finally:
+                _soltar_candado(conn)
+                conn.commit()
+    except (SQLAlchemyError, RuntimeError, OSError) as exc:
+        print("[WARN] No se pudieron aplicar las migraciones:", exc)
@@ -0,0 +1,167 @@
+# services/nombre_index.py
+"""
+Búsqueda por nombre (nombre_cte y gerencia) con índice invertido de trigramas
+en memoria, para cuando el agente conoce el nombre del cliente y no su
+cliente_unico.
+
+- Normalización: sin acentos, minúsculas, sólo letras/dígitos ("MARÍA  López"
+  -> "maria lopez"); la consulta se normaliza igual.
+- Índice: trigrama -> ids de fila (array('I') ordenado). Cada palabra se
+  rellena con espacios (" ma", "mar", ..., "ia ") para premiar inicios y
+  finales de palabra.
+- Consulta: se recorren primero los trigramas más raros (con un tope de
+  entradas leídas, así una búsqueda de dos letras no recorre millones de
+  filas), se toman los mejores candidatos y se re-puntúan contra el texto
+  real: cobertura de trigramas (tolera errores de dedo y búsquedas en medio
+  del nombre) + bonos por subcadena exacta e inicio de palabra. nombre_cte
+  pesa más que gerencia.
+
+Igual que cliente_index (ver services.indice_base): se construye en segundo
+plano al arrancar y tras cada carga de la base; los demás workers revisan la
+versión `base_general` de cache_versiones como máximo cada NOMBRE_INDEX_CHECK
+segundos y reconstruyen sólo si cambió (leer la base completa cuesta segundos
+de CPU con el GIL tomado). Se lee de la réplica si la hay. Cada worker tiene su
+copia. Con NOMBRE_INDEX=0 no se construye y la búsqueda usa la BD (prefijo).
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from array import array
+from collections import Counter
+
+from config import Config
+from models import BaseGeneral
+from services.indice_base import IndiceBaseGeneral
+from services.lecturas import session_lectura
+from services.versiones import BASE_GENERAL, leer_version
+
+# entradas de posting que se leen como máximo por consulta
+PRESUPUESTO = 200_000
+# candidatos que pasan a la re-puntuación fina
+CANDIDATOS = 300
+PESO_GERENCIA = 0.6
+
+_NO_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar(texto: str | None) -> str:
+    """Minúsculas, sin acentos ni signos, espacios simples."""
+    if not texto:
+        return ""
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(ch for ch in texto if not unicodedata.combining(ch))
+    return _NO_ALNUM.sub(" ", texto.lower()).strip()
+
+
+def trigramas(normalizado: str, parcial: bool = False) -> set[str]:
+    """
+    Trigramas de cada palabra rellena con espacios. Con parcial=True la última
+    palabra no se cierra (el agente aún la está escribiendo: "juan pe" debe
+    encontrar "JUAN PEREZ").
+    """
+    out: set[str] = set()
+    palabras = normalizado.split()
+    for n, palabra in enumerate(palabras, 1):
+        p = f" {palabra}" if parcial and n == len(palabras) else f" {palabra} "
+        for i in range(len(p) - 2):
+            out.add(p[i:i + 3])
+    return out
+
+
+def _puntuar(qnorm: str, qtri: set[str], texto: str | None) -> float:
+    norm = normalizar(texto)
+    if not norm:
+        return 0.0
+    cobertura = len(qtri & trigramas(norm)) / len(qtri)
+    bono = 0.0
+    pos = norm.find(qnorm)
+    if pos >= 0:
+        bono = 0.5 if pos == 0 or norm[pos - 1] == " " else 0.25
+    return cobertura + bono
+
+
+class NombreIndex(IndiceBaseGeneral):
+    def __init__(self, check_interval: int = 30, activo: bool = True):
+        super().__init__(check_interval, activo, nombre_hilo="nombre-index", etiqueta="nombres")
+        # (postings, cliente_unico, nombre_cte, gerencia) por id de fila
+        self._data: tuple[dict[str, array], list[str], list[str], list[str]] | None = None
+
+    def __len__(self) -> int:
+        data = self._data
+        return len(data[1]) if data else 0
+
+    def rebuild(self) -> int:
+        """Lee base_general completa y publica el índice nuevo. Devuelve # de filas."""
+        postings: dict[str, array] = {}
+        cus: list[str] = []
+        nombres: list[str] = []
+        gerencias: list[str] = []
+        with session_lectura() as db:
+            # la versión antes que los datos (ver cliente_index.rebuild)
+            version = leer_version(db, BASE_GENERAL)
+            q = (
+                db.query(BaseGeneral.cliente_unico, BaseGeneral.nombre_cte, BaseGeneral.gerencia)
+                .order_by(BaseGeneral.cliente_unico_norm)
+                .execution_options(yield_per=10_000)
+            )
+            for cu, nombre, gerencia in q:
+                tris = trigramas(normalizar(nombre)) | trigramas(normalizar(gerencia))
+                if not tris:
+                    continue
+                doc = len(cus)
+                cus.append(cu)
+                nombres.append(nombre or "")
+                gerencias.append(gerencia or "")
+                for t in tris:
+                    lista = postings.get(t)
+                    if lista is None:
+                        lista = postings[t] = array("I")
+                    lista.append(doc)  # ids crecientes => cada lista queda ordenada
+        self._data = (postings, cus, nombres, gerencias)
+        self._version = version
+        return len(cus)
+
+    def search(self, term: str, limit: int = 10) -> list[tuple[str, str, str, float]] | None:
+        """
+        Hasta `limit` tuplas (cliente_unico, nombre_cte, gerencia, puntaje), de
+        mejor a peor. Devuelve None si el índice aún no está listo (usar la BD).
+        """
+        self.ensure_fresh()
+        data = self._data
+        if data is None:
+            return None
+        postings, cus, nombres, gerencias = data
+        qnorm = normalizar(term)
+        qtri = trigramas(qnorm, parcial=not term.endswith(" "))
+        if not qtri:
+            return []
+
+        # votos por fila, empezando por los trigramas más selectivos
+        listas = sorted((postings.get(t, ()) for t in qtri), key=len)
+        votos: Counter = Counter()
+        leidas = 0
+        for lista in listas:
+            if not lista:
+                continue
+            if leidas and leidas + len(lista) > PRESUPUESTO:
+                break
+            votos.update(lista[:PRESUPUESTO])
+            leidas += min(len(lista), PRESUPUESTO)
+
+        ranking = []
+        for doc, _ in votos.most_common(CANDIDATOS):
+            puntaje = max(
+                _puntuar(qnorm, qtri, nombres[doc]),
+                PESO_GERENCIA * _puntuar(qnorm, qtri, gerencias[doc]),
+            )
+            ranking.append((-puntaje, len(nombres[doc]), doc))
+        ranking.sort()
+        return [
+            (cus[doc], nombres[doc], gerencias[doc], round(-neg, 3))
+            for neg, _, doc in ranking[:limit]
+            if neg < 0
+        ]
+
+
+nombre_index = NombreIndex(check_interval=Config.NOMBRE_INDEX_CHECK, activo=Config.NOMBRE_INDEX)
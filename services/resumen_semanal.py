@@ -0,0 +1,131 @@
+# services/resumen_semanal.py
+"""
+Resumen semanal incremental (tabla resumen_semanal).
+
+Una fila por (año de captura, semana, agente, tipo de convenio, boca de
+cobranza) con el conteo de registros y las sumas de pago_inicial/pago_semanal.
+crear/actualizar la ajustan en la misma transacción que el registro:
+
+    antes = resumen_semanal.aporte(registro)    # antes de tocar los campos
+    ... cambios ...
+    resumen_semanal.mover(db, antes, resumen_semanal.aporte(registro))
+
+Un alta es mover(db, None, aporte). Los ajustes son UPDATE con incrementos,
+así que dos capturas simultáneas en el mismo grupo no se pisan.
+
+Si algo escribe en registros por fuera (cargas masivas, SQL a mano), el
+resumen se recalcula con: python scripts/reconstruir_resumen_semanal.py
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from sqlalchemy import and_, delete, extract, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import Registro, ResumenSemanal
+
+_t = ResumenSemanal.__table__
+_PK = ("anio", "semana", "creado_por", "tipo_convenio_id", "boca_cobranza_id")
+
+
+def aporte(registro: Registro) -> tuple[tuple, Decimal, Decimal]:
+    """(clave del grupo, pago_inicial, pago_semanal) con que `registro` suma al resumen."""
+    clave = (
+        registro.creado_en.year if registro.creado_en else 0,
+        registro.semana or 0,
+        registro.creado_por,
+        registro.tipo_convenio_id,
+        registro.boca_cobranza_id,
+    )
+    return clave, Decimal(registro.pago_inicial or 0), Decimal(registro.pago_semanal or 0)
+
+
+def _where(clave: tuple):
+    return and_(*(_t.c[col] == val for col, val in zip(_PK, clave)))
+
+
+def _sumar(db, clave: tuple, n: int, inicial: Decimal, semanal: Decimal) -> None:
+    if not n and not inicial and not semanal:
+        return
+    for _ in range(2):
+        try:
+            with db.begin_nested():
+                res = db.execute(
+                    update(_t)
+                    .where(_where(clave))
+                    .values(
+                        registros=_t.c.registros + n,
+                        suma_pago_inicial=_t.c.suma_pago_inicial + inicial,
+                        suma_pago_semanal=_t.c.suma_pago_semanal + semanal,
+                    )
+                )
+                if not res.rowcount:
+                    db.execute(
+                        insert(_t).values(
+                            **dict(zip(_PK, clave)),
+                            registros=n,
+                            suma_pago_inicial=inicial,
+                            suma_pago_semanal=semanal,
+                        )
+                    )
+            break
+        except IntegrityError:
+            # otra petición creó el mismo grupo a la vez: reintenta con UPDATE
+            continue
+    else:
+        raise RuntimeError(f"No se pudo actualizar resumen_semanal {clave}")
+    if n < 0:
+        db.execute(delete(_t).where(_where(clave), _t.c.registros <= 0))
+
+
+def mover(db, antes: tuple | None, despues: tuple | None) -> None:
+    """Aplica al resumen el paso de `antes` a `despues` (None = no existía / ya no existe)."""
+    if antes and despues and antes[0] == despues[0]:
+        # mismo grupo: sólo cambian las sumas
+        _sumar(db, despues[0], 0, despues[1] - antes[1], despues[2] - antes[2])
+        return
+    if antes:
+        _sumar(db, antes[0], -1, -antes[1], -antes[2])
+    if despues:
+        _sumar(db, despues[0], 1, despues[1], despues[2])
+
+
+def sumar_altas(db, registros) -> None:
+    """Altas en bloque (importación): un solo ajuste por grupo en lugar de uno por registro."""
+    grupos: dict[tuple, list] = {}
+    for registro in registros:
+        clave, inicial, semanal = aporte(registro)
+        g = grupos.setdefault(clave, [0, Decimal(0), Decimal(0)])
+        g[0] += 1
+        g[1] += inicial
+        g[2] += semanal
+    for clave, (n, inicial, semanal) in grupos.items():
+        _sumar(db, clave, n, inicial, semanal)
+
+
+def reconstruir(conn) -> int:
+    """Recalcula todo el resumen desde registros (en la transacción de `conn`). Devuelve filas."""
+    r = Registro.__table__
+    anio = func.coalesce(extract("year", r.c.creado_en), 0)
+    semana = func.coalesce(r.c.semana, 0)
+    grupos = (
+        select(
+            anio,
+            semana,
+            r.c.creado_por,
+            r.c.tipo_convenio_id,
+            r.c.boca_cobranza_id,
+            func.count(),
+            func.coalesce(func.sum(r.c.pago_inicial), 0),
+            func.coalesce(func.sum(r.c.pago_semanal), 0),
+        )
+        .group_by(anio, semana, r.c.creado_por, r.c.tipo_convenio_id, r.c.boca_cobranza_id)
+    )
+    conn.execute(delete(_t))
+    conn.execute(
+        insert(_t).from_select(
+            list(_PK) + ["registros", "suma_pago_inicial", "suma_pago_semanal"], grupos
+        )
+    )
+    return conn.execute(select(func.count()).select_from(_t)).scalar_one()
@@ -0,0 +1,50 @@
+# services/upsert.py
+"""INSERT multi-fila con "upsert" portable entre los backends soportados."""
+from __future__ import annotations
+
+# Límite de parámetros enlazados por sentencia según el dialecto
+# (SQLite antiguo: 999; Postgres: 65535; MySQL/TiDB lo limita max_allowed_packet).
+MAX_PARAMS = {
+    "sqlite": 999,
+    "postgresql": 65535,
+    "mysql": 65535,
+    "mariadb": 65535,
+}
+MAX_ROWS = 1000
+
+
+def batch_rows(dialect_name: str, ncols: int) -> int:
+    """Filas por INSERT multi-fila para no rebasar el límite de parámetros del dialecto."""
+    return max(1, min(MAX_ROWS, MAX_PARAMS.get(dialect_name, 999) // max(1, ncols)))
+
+
+def build_upsert(dialect_name: str, table, rows: list[dict], update_cols: list[str],
+                 key_cols: tuple[str, ...] = ("cliente_unico_norm",)):
+    """
+    INSERT multi-fila que actualiza `update_cols` si la clave única ya existe.
+    MySQL/TiDB: ON DUPLICATE KEY UPDATE; SQLite/Postgres: ON CONFLICT DO UPDATE.
+    Con update_cols vacío, las filas existentes se dejan intactas.
+    """
+    if dialect_name in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(table).values(rows)
+        if not update_cols:
+            return stmt.prefix_with("IGNORE")
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_cols})
+
+    if dialect_name in ("sqlite", "postgresql"):
+        if dialect_name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        stmt = insert(table).values(rows)
+        if not update_cols:
+            return stmt.on_conflict_do_nothing(index_elements=list(key_cols))
+        return stmt.on_conflict_do_update(
+            index_elements=list(key_cols),
+            set_={c: stmt.excluded[c] for c in update_cols},
+        )
+
+    raise ValueError(f"Dialecto no soportado para upsert: {dialect_name}")
@@ -0,0 +1,56 @@
+# services/versiones.py
+"""
+Contadores de versión en la tabla `cache_versiones` (clave -> entero).
+
+Quien cambia datos que otros workers tienen en memoria incrementa la clave;
+cada worker compara su versión contra la BD de vez en cuando y recarga sólo
+si cambió (catálogos, índices de base_general).
+"""
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import SessionLocal
+
+# base_general (la incrementan las cargas; la leen cliente_index y nombre_index)
+BASE_GENERAL = "base_general"
+
+
+def leer_version(db, clave: str) -> int | None:
+    """Versión publicada en la BD; None si la tabla aún no existe."""
+    try:
+        return db.execute(
+            text("SELECT version FROM cache_versiones WHERE clave = :k"),
+            {"k": clave},
+        ).scalar_one_or_none() or 0
+    except SQLAlchemyError:
+        db.rollback()
+        return None
+
+
+def incrementar_version(db, clave: str) -> None:
+    """Incrementa la versión dentro de la transacción de `db` (sesión o conexión)."""
+    try:
+        with db.begin_nested():
+            res = db.execute(
+                text("UPDATE cache_versiones SET version = version + 1 WHERE clave = :k"),
+                {"k": clave},
+            )
+            if not res.rowcount:
+                db.execute(
+                    text("INSERT INTO cache_versiones (clave, version) VALUES (:k, 1)"),
+                    {"k": clave},
+                )
+    except SQLAlchemyError as exc:
+        print(f"[WARN] No se pudo publicar la versión de {clave}:", exc)
+
+
+def publicar(clave: str) -> None:
+    """Incrementa la versión en su propia transacción (tras una carga ya confirmada)."""
+    try:
+        with SessionLocal() as db:
+            incrementar_version(db, clave)
+            db.commit()
+    except SQLAlchemyError as exc:
+        print(f"[WARN] No se pudo publicar la versión de {clave}:", exc)
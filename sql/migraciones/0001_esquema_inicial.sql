@@ -1,5 +1,8 @@
 -- =====================================================================
--- Esquema limpio y consistente para sistema_registros (TiDB/MySQL)
+-- 0001: esquema base de sistema_registros (TiDB/MySQL)
+-- Lo aplica services.migraciones; en una base existente no hace nada
+-- (IF NOT EXISTS) y las migraciones siguientes completan lo que falte.
+-- No se edita: los cambios nuevos van en un archivo NNNN_*.sql nuevo.
 -- Tipos unificados: TODAS las PK/FK son BIGINT
 -- Collation/charset: utf8mb4_bin para comparaciones exactas
 -- =====================================================================
@@ -10,20 +13,10 @@
 --   COLLATE utf8mb4_bin;
 -- USE sistema_registros;
 
--- ---------------------------------------------------------------------
--- Limpieza (en orden de dependencias)
--- ---------------------------------------------------------------------
-DROP TABLE IF EXISTS bitacora_registro;
-DROP TABLE IF EXISTS registros;
-DROP TABLE IF EXISTS base_general;
-DROP TABLE IF EXISTS bocas_cobranza;
-DROP TABLE IF EXISTS tipo_convenio;
-DROP TABLE IF EXISTS usuarios;
-
 -- ---------------------------------------------------------------------
 -- Usuarios
 -- ---------------------------------------------------------------------
-CREATE TABLE usuarios (
+CREATE TABLE IF NOT EXISTS usuarios (
   id            BIGINT NOT NULL AUTO_INCREMENT,
   username      VARCHAR(100) NOT NULL,
   password_hash VARCHAR(255) NOT NULL,
@@ -37,7 +30,7 @@ CREATE TABLE usuarios (
 -- ---------------------------------------------------------------------
 -- Catálogo: tipo_convenio
 -- ---------------------------------------------------------------------
-CREATE TABLE tipo_convenio (
+CREATE TABLE IF NOT EXISTS tipo_convenio (
   id        BIGINT NOT NULL AUTO_INCREMENT,
   nombre    VARCHAR(100) NOT NULL,
   activo    TINYINT(1) DEFAULT '1',
@@ -49,7 +42,7 @@ CREATE TABLE tipo_convenio (
 -- ---------------------------------------------------------------------
 -- Catálogo: bocas_cobranza
 -- ---------------------------------------------------------------------
-CREATE TABLE bocas_cobranza (
+CREATE TABLE IF NOT EXISTS bocas_cobranza (
   id        BIGINT NOT NULL AUTO_INCREMENT,
   nombre    VARCHAR(100) NOT NULL,
   activo    TINYINT(1) DEFAULT '1',
@@ -58,29 +51,78 @@ CREATE TABLE bocas_cobranza (
   UNIQUE KEY uq_boca_nombre (nombre)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
 
+-- ---------------------------------------------------------------------
+-- Versiones de cachés en memoria (se incrementa al guardar catálogos)
+-- ---------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS cache_versiones (
+  clave   VARCHAR(50) NOT NULL,
+  version BIGINT      NOT NULL DEFAULT '0',
+  PRIMARY KEY (clave) /*T![clustered_index] CLUSTERED*/
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
+
 -- ---------------------------------------------------------------------
 -- Base diaria de referencia (para búsqueda/autocomplete y snapshots)
 -- ---------------------------------------------------------------------
-CREATE TABLE base_general (
+CREATE TABLE IF NOT EXISTS base_general (
   id             BIGINT NOT NULL AUTO_INCREMENT,
   cliente_unico  VARCHAR(100) NOT NULL,
+  cliente_unico_norm VARCHAR(100) NOT NULL,  -- UPPER(TRIM(cliente_unico)); clave de búsquedas/joins
   nombre_cte     VARCHAR(255),
   gerencia       VARCHAR(255),
   producto       VARCHAR(255),
   fidiapago      VARCHAR(255),
   gestion_desc   TEXT,
+  hash_contenido CHAR(32) DEFAULT NULL,  -- MD5 del contenido; sólo se reescriben filas que cambian
   actualizado_en DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (id) /*T![clustered_index] CLUSTERED*/,
   UNIQUE KEY uq_bg_cliente_unico (cliente_unico),
+  UNIQUE KEY uq_bg_cu_norm (cliente_unico_norm),
   KEY idx_bg_nombre (nombre_cte),
   KEY idx_bg_gerencia (gerencia),
   KEY idx_bg_producto (producto)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
 
+-- ---------------------------------------------------------------------
+-- Cargas de base_general encoladas (se procesan en segundo plano)
+-- ---------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS cargas_base (
+  id              BIGINT NOT NULL AUTO_INCREMENT,
+  archivo         VARCHAR(500) NOT NULL,   -- ruta temporal del CSV en el servidor
+  nombre_original VARCHAR(255) DEFAULT NULL,
+  modo            VARCHAR(20)  NOT NULL DEFAULT 'upsert',
+  estado          VARCHAR(20)  NOT NULL DEFAULT 'pendiente', -- pendiente/procesando/terminado/error
+  total_estimado  INT DEFAULT NULL,
+  procesadas      INT NOT NULL DEFAULT '0',
+  insertados      INT DEFAULT NULL,
+  actualizados    INT DEFAULT NULL,
+  sin_cambios     INT DEFAULT NULL,
+  mensaje         TEXT DEFAULT NULL,
+  creado_por      BIGINT DEFAULT NULL,
+  creado_en       DATETIME DEFAULT CURRENT_TIMESTAMP,
+  iniciado_en     DATETIME DEFAULT NULL,
+  terminado_en    DATETIME DEFAULT NULL,
+  PRIMARY KEY (id) /*T![clustered_index] CLUSTERED*/,
+  KEY idx_cargas_estado (estado),
+  CONSTRAINT fk_cargas_user
+    FOREIGN KEY (creado_por) REFERENCES usuarios (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
+
+-- ---------------------------------------------------------------------
+-- Evidencias: almacén por contenido (UPLOAD_FOLDER/objetos/ab/cd/<clave>)
+-- ---------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS evidencias (
+  clave           VARCHAR(80)  NOT NULL,   -- "<sha256>.<ext>", lo que guardan registros.archivo_*
+  refcount        INT          NOT NULL DEFAULT '0',
+  tamano          INT          DEFAULT NULL,
+  nombre_original VARCHAR(255) DEFAULT NULL,
+  creado_en       DATETIME     DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (clave) /*T![clustered_index] CLUSTERED*/
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
+
 -- ---------------------------------------------------------------------
 -- Registros operativos (con snapshot de campos críticos)
 -- ---------------------------------------------------------------------
-CREATE TABLE registros (
+CREATE TABLE IF NOT EXISTS registros (
   id                 BIGINT NOT NULL AUTO_INCREMENT,
   cliente_unico      VARCHAR(100) NOT NULL,
 
@@ -122,6 +164,14 @@ CREATE TABLE registros (
   KEY fk_user (creado_por),
   KEY idx_reg_semana_anio (anio, semana),
 
+  -- Paginación por cursor (keyset) del listado: filtro + ORDER BY id
+  KEY idx_reg_user_id (creado_por, id),
+  KEY idx_reg_user_semana_id (creado_por, semana, id),
+  KEY idx_reg_semana_id (semana, id),
+  KEY idx_reg_fecha_promesa (fecha_promesa, id),
+  KEY idx_reg_tc_id (tipo_convenio_id, id),
+  KEY idx_reg_bc_id (boca_cobranza_id, id),
+
   CONSTRAINT fk_tc
     FOREIGN KEY (tipo_convenio_id) REFERENCES tipo_convenio (id),
   CONSTRAINT fk_bc
@@ -133,7 +183,7 @@ CREATE TABLE registros (
 -- ---------------------------------------------------------------------
 -- Bitácora (opcional, simple): guarda JSON de cambios por registro
 -- ---------------------------------------------------------------------
-CREATE TABLE bitacora_registro (
+CREATE TABLE IF NOT EXISTS bitacora_registro (
   id           BIGINT NOT NULL AUTO_INCREMENT,
   registro_id  BIGINT NOT NULL,
   accion       VARCHAR(50) NOT NULL,    -- 'CREAR','EDITAR','ELIMINAR'
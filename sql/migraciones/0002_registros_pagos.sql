@@ -1,5 +1,5 @@
 -- Ajustes incrementales para agregar columnas de pagos al catálogo de registros.
--- Ejecuta este script sobre una base existente que aún no tenga los campos.
+-- Idempotente: en bases creadas con 0001 no cambia nada.
 ALTER TABLE registros
   ADD COLUMN IF NOT EXISTS pago_inicial DECIMAL(12,2) NULL;
 ALTER TABLE registros
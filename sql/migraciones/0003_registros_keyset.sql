@@ -0,0 +1,8 @@
+-- Índices compuestos para la paginación por cursor (keyset) y filtros del listado de registros.
+-- Idempotente: en bases creadas con 0001 no cambia nada.
+CREATE INDEX IF NOT EXISTS idx_reg_user_id ON registros (creado_por, id);
+CREATE INDEX IF NOT EXISTS idx_reg_user_semana_id ON registros (creado_por, semana, id);
+CREATE INDEX IF NOT EXISTS idx_reg_semana_id ON registros (semana, id);
+CREATE INDEX IF NOT EXISTS idx_reg_fecha_promesa ON registros (fecha_promesa, id);
+CREATE INDEX IF NOT EXISTS idx_reg_tc_id ON registros (tipo_convenio_id, id);
+CREATE INDEX IF NOT EXISTS idx_reg_bc_id ON registros (boca_cobranza_id, id);
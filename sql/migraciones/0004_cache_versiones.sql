@@ -0,0 +1,9 @@
+-- Tabla de versiones para la caché de catálogos en memoria.
+-- Idempotente: en bases creadas con 0001 no cambia nada.
+CREATE TABLE IF NOT EXISTS cache_versiones (
+  clave   VARCHAR(50) NOT NULL,
+  version BIGINT      NOT NULL DEFAULT '0',
+  PRIMARY KEY (clave)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
+INSERT INTO cache_versiones (clave, version) VALUES ('catalogos', 0)
+ON DUPLICATE KEY UPDATE clave = VALUES(clave);
@@ -0,0 +1,20 @@
+-- Tabla de cargas de base_general procesadas en segundo plano.
+-- Idempotente: en bases creadas con 0001 no cambia nada.
+CREATE TABLE IF NOT EXISTS cargas_base (
+  id              BIGINT NOT NULL AUTO_INCREMENT,
+  archivo         VARCHAR(500) NOT NULL,
+  nombre_original VARCHAR(255) DEFAULT NULL,
+  modo            VARCHAR(20)  NOT NULL DEFAULT 'upsert',
+  estado          VARCHAR(20)  NOT NULL DEFAULT 'pendiente',
+  total_estimado  INT DEFAULT NULL,
+  procesadas      INT NOT NULL DEFAULT '0',
+  insertados      INT DEFAULT NULL,
+  actualizados    INT DEFAULT NULL,
+  mensaje         TEXT DEFAULT NULL,
+  creado_por      BIGINT DEFAULT NULL,
+  creado_en       DATETIME DEFAULT CURRENT_TIMESTAMP,
+  iniciado_en     DATETIME DEFAULT NULL,
+  terminado_en    DATETIME DEFAULT NULL,
+  PRIMARY KEY (id),
+  KEY idx_cargas_estado (estado)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
@@ -0,0 +1,7 @@
+-- Hash de contenido por fila de base_general para escribir sólo filas nuevas o cambiadas,
+-- y conteo de "sin cambios" en el historial de cargas.
+-- Idempotente: en bases creadas con 0001 no cambia nada.
+ALTER TABLE base_general
+  ADD COLUMN IF NOT EXISTS hash_contenido CHAR(32) NULL;
+ALTER TABLE cargas_base
+  ADD COLUMN IF NOT EXISTS sin_cambios INT NULL;
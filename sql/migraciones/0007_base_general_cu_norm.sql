@@ -0,0 +1,12 @@
+-- Clave normalizada de cliente_unico (UPPER(TRIM(...))) con índice único, para que las
+-- búsquedas y los joins de la carga diaria sean index seeks en lugar de full scans.
+-- Idempotente: en bases creadas con 0001 no cambia nada.
+-- Si el índice único falla, hay clientes duplicados por mayúsculas/espacios: depúralos antes.
+ALTER TABLE base_general
+  ADD COLUMN IF NOT EXISTS cliente_unico_norm VARCHAR(100) NULL;
+UPDATE base_general
+  SET cliente_unico_norm = UPPER(TRIM(cliente_unico))
+  WHERE cliente_unico_norm IS NULL;
+ALTER TABLE base_general
+  MODIFY COLUMN cliente_unico_norm VARCHAR(100) NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_bg_cu_norm ON base_general (cliente_unico_norm);
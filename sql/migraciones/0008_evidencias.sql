@@ -0,0 +1,11 @@
+-- Almacén de evidencias por contenido (SHA-256) con conteo de referencias.
+-- Idempotente: en bases creadas con 0001 no cambia nada.
+-- Después migra los archivos con: python scripts/migrar_evidencias.py
+CREATE TABLE IF NOT EXISTS evidencias (
+  clave           VARCHAR(80)  NOT NULL,
+  refcount        INT          NOT NULL DEFAULT '0',
+  tamano          INT          DEFAULT NULL,
+  nombre_original VARCHAR(255) DEFAULT NULL,
+  creado_en       DATETIME     DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (clave)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
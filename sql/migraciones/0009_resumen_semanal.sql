@@ -0,0 +1,28 @@
+-- Resumen semanal: conteos y sumas de registros por
+-- (año de captura, semana, agente, tipo de convenio, boca de cobranza).
+-- Lo mantienen crear/actualizar en la misma transacción (services.resumen_semanal).
+-- Se llena aquí con lo existente; para recalcularlo: python scripts/reconstruir_resumen_semanal.py
+CREATE TABLE IF NOT EXISTS resumen_semanal (
+  anio              INT           NOT NULL,
+  semana            INT           NOT NULL,
+  creado_por        BIGINT        NOT NULL,
+  tipo_convenio_id  BIGINT        NOT NULL,
+  boca_cobranza_id  BIGINT        NOT NULL,
+  registros         INT           NOT NULL DEFAULT '0',
+  suma_pago_inicial DECIMAL(14,2) NOT NULL DEFAULT '0.00',
+  suma_pago_semanal DECIMAL(14,2) NOT NULL DEFAULT '0.00',
+  PRIMARY KEY (anio, semana, creado_por, tipo_convenio_id, boca_cobranza_id),
+  KEY idx_rs_user_semana (creado_por, semana),
+  KEY idx_rs_semana (semana)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
+INSERT INTO resumen_semanal
+  (anio, semana, creado_por, tipo_convenio_id, boca_cobranza_id,
+   registros, suma_pago_inicial, suma_pago_semanal)
+SELECT COALESCE(YEAR(creado_en), 0), COALESCE(semana, 0), creado_por, tipo_convenio_id, boca_cobranza_id,
+       COUNT(*), COALESCE(SUM(pago_inicial), 0), COALESCE(SUM(pago_semanal), 0)
+FROM registros
+GROUP BY COALESCE(YEAR(creado_en), 0), COALESCE(semana, 0), creado_por, tipo_convenio_id, boca_cobranza_id
+ON DUPLICATE KEY UPDATE
+  registros = VALUES(registros),
+  suma_pago_inicial = VALUES(suma_pago_inicial),
+  suma_pago_semanal = VALUES(suma_pago_semanal);
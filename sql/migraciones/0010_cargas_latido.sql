@@ -0,0 +1,6 @@
+-- Latido de las cargas en proceso: el worker que la procesa lo actualiza cada
+-- CARGAS_LATIDO_SEGUNDOS; una carga 'procesando' sin latido reciente quedó
+-- huérfana (reinicio/OOM del worker) y se reencola al arrancar (services.cargas).
+-- Idempotente.
+ALTER TABLE cargas_base
+  ADD COLUMN IF NOT EXISTS actualizado_en DATETIME NULL;
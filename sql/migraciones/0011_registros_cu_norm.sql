@@ -0,0 +1,12 @@
+-- Clave normalizada de cliente_unico (UPPER(TRIM(...))) también en registros, para
+-- que el filtro por cliente del listado encuentre registros cuyo cliente_unico se
+-- copió con minúsculas o espacios de la base, sin perder el index seek.
+-- Idempotente.
+ALTER TABLE registros
+  ADD COLUMN IF NOT EXISTS cliente_unico_norm VARCHAR(100) NULL;
+UPDATE registros
+  SET cliente_unico_norm = UPPER(TRIM(cliente_unico))
+  WHERE cliente_unico_norm IS NULL;
+ALTER TABLE registros
+  MODIFY COLUMN cliente_unico_norm VARCHAR(100) NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_reg_cu_norm ON registros (cliente_unico_norm, id);
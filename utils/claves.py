@@ -0,0 +1,11 @@
+# utils/claves.py
+
+
+def normalizar_cliente_unico(value: str | None) -> str:
+    """
+    Forma canónica de cliente_unico (sin espacios al inicio/fin, en MAYÚSCULAS).
+    Es la que se guarda en base_general.cliente_unico_norm y la que usan todas las
+    búsquedas y joins, para que sean index seeks sobre uq_bg_cu_norm.
+    Equivale a UPPER(TRIM(x)) en SQL.
+    """
+    return (value or "").strip().upper()